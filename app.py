@@ -20,6 +20,7 @@ from routes.notifications import notifications_bp
 from routes.users import users_bp  # Import the users blueprint
 from routes.attendance import attendance_bp  # Import the attendance blueprint
 from routes.faculty_events import faculty_events_bp
+from scheduler.eligibility import EligibilityIndex
 
 # Google Gemini AI imports
 import google.generativeai as genai
@@ -411,12 +412,38 @@ def init_db():
             semester INTEGER,
             fitness_score REAL,
             generated_by INTEGER,
+            stop_reason TEXT,
+            generations_run INTEGER,
+            profile TEXT,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (department_id) REFERENCES departments (id),
             FOREIGN KEY (generated_by) REFERENCES users (id)
         )
     ''')
     
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            submitted_by INTEGER,
+            progress TEXT,
+            timetable_id INTEGER,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER DEFAULT 0,
+            cancel_requested INTEGER DEFAULT 0,
+            stop_requested INTEGER DEFAULT 0,
+            worker_pid INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME,
+            finished_at DATETIME,
+            heartbeat_at DATETIME,
+            FOREIGN KEY (submitted_by) REFERENCES users (id),
+            FOREIGN KEY (timetable_id) REFERENCES timetables (id)
+        )
+    ''')
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS timetable_slots (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -1919,207 +1946,6 @@ def faculty_attendance_records():
     
     return render_template('faculty_attendance_records.html', attendance_records=attendance_records)
 
-# Genetic Algorithm Implementation
-class EnhancedGeneticTimetable:
-    def __init__(self, department_id, semester, population_size=50, mutation_rate=0.1, generations=100):
-        self.department_id = department_id
-        self.semester = semester
-        self.population_size = population_size
-        self.mutation_rate = mutation_rate
-        self.generations = generations
-        
-        # Load data from database
-        self.load_data()
-        
-        # Define time slots and days
-        self.days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-        self.time_slots = ['9:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-1:00', 
-                           '2:00-3:00', '3:00-4:00', '4:00-5:00']
-    
-    def load_data(self):
-        conn = sqlite3.connect('timetable.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Load batches
-        cursor.execute('SELECT * FROM batches WHERE department_id = ? AND semester = ?', 
-                      (self.department_id, self.semester))
-        self.batches = cursor.fetchall()
-        
-        # Load subjects
-        cursor.execute('SELECT * FROM subjects WHERE department_id = ?', (self.department_id,))
-        self.subjects = cursor.fetchall()
-        
-        # Load faculty
-        cursor.execute('SELECT * FROM faculty WHERE department_id = ?', (self.department_id,))
-        self.faculty = cursor.fetchall()
-        
-        # Load faculty subjects
-        cursor.execute('SELECT * FROM faculty_subjects')
-        self.faculty_subjects = cursor.fetchall()
-        
-        # Load classrooms
-        cursor.execute('SELECT * FROM classrooms WHERE department_id = ?', (self.department_id,))
-        self.classrooms = cursor.fetchall()
-        
-        conn.close()
-    
-    def create_chromosome(self):
-        """Create a random timetable (chromosome)"""
-        chromosome = {}
-        
-        for batch in self.batches:
-            batch_id = batch['id']
-            chromosome[batch_id] = {}
-            
-            for day in self.days:
-                chromosome[batch_id][day] = {}
-                
-                for time_slot in self.time_slots:
-                    # Randomly select a subject, faculty, and classroom
-                    subject = random.choice(self.subjects)
-                    faculty = self.get_available_faculty(subject['id'])
-                    classroom = random.choice(self.classrooms)
-                    
-                    chromosome[batch_id][day][time_slot] = {
-                        'subject_id': subject['id'],
-                        'faculty_id': faculty['id'] if faculty else None,
-                        'classroom_id': classroom['id']
-                    }
-        
-        return chromosome
-    
-    def get_available_faculty(self, subject_id):
-        """Get faculty who can teach the given subject"""
-        available_faculty = []
-        for fs in self.faculty_subjects:
-            if fs['subject_id'] == subject_id:
-                for f in self.faculty:
-                    if f['id'] == fs['faculty_id']:
-                        available_faculty.append(f)
-        
-        return random.choice(available_faculty) if available_faculty else None
-    
-    def calculate_fitness(self, chromosome):
-        """Calculate fitness score for a timetable"""
-        fitness = 100  # Start with a perfect score
-        
-        # Check for faculty clashes
-        faculty_schedule = {}
-        for batch_id, days in chromosome.items():
-            for day, time_slots in days.items():
-                for time_slot, slot_data in time_slots.items():
-                    faculty_id = slot_data['faculty_id']
-                    if faculty_id:
-                        key = (faculty_id, day, time_slot)
-                        if key in faculty_schedule:
-                            fitness -= 10  # Penalize faculty clashes
-                        else:
-                            faculty_schedule[key] = True
-        
-        # Check for classroom clashes
-        classroom_schedule = {}
-        for batch_id, days in chromosome.items():
-            for day, time_slots in days.items():
-                for time_slot, slot_data in time_slots.items():
-                    classroom_id = slot_data['classroom_id']
-                    key = (classroom_id, day, time_slot)
-                    if key in classroom_schedule:
-                        fitness -= 10  # Penalize classroom clashes
-                    else:
-                        classroom_schedule[key] = True
-        
-        # Check if subjects meet their required classes per week
-        for batch_id, days in chromosome.items():
-            subject_count = {}
-            for day, time_slots in days.items():
-                for time_slot, slot_data in time_slots.items():
-                    subject_id = slot_data['subject_id']
-                    subject_count[subject_id] = subject_count.get(subject_id, 0) + 1
-            
-            for subject_id, count in subject_count.items():
-                # Find the subject to get required classes
-                subject = next((s for s in self.subjects if s['id'] == subject_id), None)
-                if subject and count != subject['classes_per_week']:
-                    fitness -= 5  # Penalize for not meeting required classes
-        
-        return max(fitness, 0)  # Ensure fitness is not negative
-    
-    def crossover(self, parent1, parent2):
-        """Perform crossover between two parents to create a child"""
-        child = {}
-        
-        for batch_id in parent1:
-            child[batch_id] = {}
-            
-            for day in parent1[batch_id]:
-                child[batch_id][day] = {}
-                
-                for time_slot in parent1[batch_id][day]:
-                    # Randomly select gene from either parent
-                    if random.random() < 0.5:
-                        child[batch_id][day][time_slot] = parent1[batch_id][day][time_slot]
-                    else:
-                        child[batch_id][day][time_slot] = parent2[batch_id][day][time_slot]
-        
-        return child
-    
-    def mutate(self, chromosome):
-        """Apply mutation to a chromosome"""
-        for batch_id in chromosome:
-            for day in chromosome[batch_id]:
-                for time_slot in chromosome[batch_id][day]:
-                    if random.random() < self.mutation_rate:
-                        # Mutate this time slot
-                        subject = random.choice(self.subjects)
-                        faculty = self.get_available_faculty(subject['id'])
-                        classroom = random.choice(self.classrooms)
-                        
-                        chromosome[batch_id][day][time_slot] = {
-                            'subject_id': subject['id'],
-                            'faculty_id': faculty['id'] if faculty else None,
-                            'classroom_id': classroom['id']
-                        }
-        
-        return chromosome
-    
-    def evolve(self):
-        """Run the genetic algorithm to evolve a population"""
-        population = [self.create_chromosome() for _ in range(self.population_size)]
-        
-        for generation in range(self.generations):
-            # Calculate fitness for each chromosome
-            fitness_scores = [self.calculate_fitness(chromosome) for chromosome in population]
-            
-            # Select parents based on fitness (tournament selection)
-            parents = []
-            for _ in range(self.population_size):
-                tournament_size = 3
-                tournament = random.sample(list(zip(population, fitness_scores)), tournament_size)
-                winner = max(tournament, key=lambda x: x[1])[0]
-                parents.append(winner)
-            
-            # Create new generation through crossover and mutation
-            new_population = []
-            for i in range(0, self.population_size, 2):
-                parent1 = parents[i]
-                parent2 = parents[i+1] if i+1 < len(parents) else parents[0]
-                
-                child1 = self.crossover(parent1, parent2)
-                child2 = self.crossover(parent2, parent1)
-                
-                child1 = self.mutate(child1)
-                child2 = self.mutate(child2)
-                
-                new_population.extend([child1, child2])
-            
-            population = new_population[:self.population_size]
-        
-        # Return the best chromosome
-        fitness_scores = [self.calculate_fitness(chromosome) for chromosome in population]
-        best_index = fitness_scores.index(max(fitness_scores))
-        return population[best_index], fitness_scores[best_index]
-
 # Routes
 @app.route('/')
 def index():
@@ -3240,12 +3066,22 @@ def edit_timetable(id):
     if request.method == 'POST':
         # Get data from the submitted form
         timetable_name = request.form['name']
+        slots = json.loads(request.form.get('slots_json', '[]'))
+        
+        # Reject faculty assigned to subjects they are not registered to teach
+        eligibility = EligibilityIndex.from_database()
+        ineligible = [slot for slot in slots
+                      if slot.get('faculty_id') and slot.get('subject_id')
+                      and not eligibility.can_teach(int(slot['faculty_id']), int(slot['subject_id']))]
+        if ineligible:
+            conn.close()
+            flash(f'{len(ineligible)} slot(s) assign faculty who cannot teach the subject.', 'error')
+            return redirect(url_for('edit_timetable', id=id))
         
         # Delete existing slots for this timetable
         cursor.execute('DELETE FROM timetable_slots WHERE timetable_id = ?', (id,))
 
         # Process the new slots from the form
-        slots = json.loads(request.form.get('slots_json', '[]'))
         for slot in slots:
             cursor.execute(
                 "INSERT INTO timetable_slots (timetable_id, batch_id, day, time_slot, subject_id, faculty_id, classroom_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
@@ -0,0 +1,114 @@
+# benchmarks/instances.py - Seeded synthetic scheduling instances for benchmarking
+import random
+import sqlite3
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+TIME_SLOTS = ['9:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-1:00', '1:00-2:00', '2:00-3:00', '3:00-4:00']
+LUNCH_BREAK = '12:00-1:00'
+
+# Named problem sizes with the GA budget and search time limit (seconds) each is benchmarked with
+SCALES = {
+    'small': {'batches': 5, 'population_size': 50, 'generations': 100, 'time_limit': 10},
+    'medium': {'batches': 50, 'population_size': 30, 'generations': 30, 'time_limit': 30},
+    'large': {'batches': 500, 'population_size': 10, 'generations': 5, 'time_limit': 60}
+}
+
+
+def generate_instance(num_batches, seed=0, batches_per_department=5, subjects_per_department=6,
+                      faculty_per_batch=2, classrooms_per_batch=2, lab_fraction=0.3,
+                      fixed_slots_per_batch=0.2, eligible_faculty=6):
+    """Build a random but reproducible institution.
+
+    Batches are grouped into departments, each with its own subjects, faculty,
+    classrooms and faculty/subject eligibility. Returns a dict of the rows the
+    engines read (subjects, faculty, classrooms, batches), the eligible
+    (faculty_id, subject_id) pairs, average monthly leaves per faculty member
+    and the constraints dict.
+
+    The default staffing and rooms are generous enough for a clash-free
+    timetable teaching every class to exist, so engine scores are comparable;
+    lower them for harder, possibly infeasible instances.
+    """
+    rng = random.Random(seed)
+    num_departments = max(1, -(-num_batches // batches_per_department))
+    subjects, faculty, classrooms, batches = [], [], [], []
+
+    for department_id in range(1, num_departments + 1):
+        department_batches = min(batches_per_department, num_batches - len(batches))
+        for k in range(department_batches):
+            batches.append({'id': len(batches) + 1, 'name': f'D{department_id}-B{k + 1}',
+                            'department_id': department_id, 'semester': 1, 'strength': rng.randint(20, 70)})
+        for k in range(subjects_per_department):
+            subject_id = len(subjects) + 1
+            subjects.append({'id': subject_id, 'name': f'Subject {subject_id}', 'code': f'S{subject_id}',
+                             'department_id': department_id,
+                             'subject_type': 'LAB' if rng.random() < lab_fraction else 'THEORY',
+                             'classes_per_week': rng.randint(1, 4)})
+        for _ in range(max(1, round(department_batches * faculty_per_batch))):
+            faculty_id = len(faculty) + 1
+            faculty.append({'id': faculty_id, 'name': f'Faculty {faculty_id}', 'employee_id': f'E{faculty_id}',
+                            'department_id': department_id, 'max_hours_per_day': rng.choice([2, 3, 4, 8])})
+        rooms = max(2, round(department_batches * classrooms_per_batch))
+        for k in range(rooms):
+            classroom_id = len(classrooms) + 1
+            # At least one lab and one lecture room per department
+            room_type = 'LAB' if k == 0 or (k > 1 and rng.random() < lab_fraction) else 'CLASSROOM'
+            classrooms.append({'id': classroom_id, 'name': f'Room {classroom_id}', 'capacity': rng.randint(30, 80),
+                               'type': room_type, 'department_id': department_id})
+
+    pairs = set()
+    for subject in subjects:
+        department_faculty = [f for f in faculty if f['department_id'] == subject['department_id']]
+        for f in rng.sample(department_faculty, min(eligible_faculty, len(department_faculty))):
+            pairs.add((f['id'], subject['id']))
+    leaves = {f['id']: rng.choice([0, 0.5, 1.5, 3]) for f in faculty}
+
+    teaching_slots = [s for s in TIME_SLOTS if s != LUNCH_BREAK]
+    fixed_slots = []
+    for _ in range(round(num_batches * fixed_slots_per_batch)):
+        batch = rng.choice(batches)
+        department_subjects = [s for s in subjects if s['department_id'] == batch['department_id']]
+        fixed_slots.append({'batch_id': batch['id'], 'day': rng.choice(DAYS), 'time_slot': rng.choice(teaching_slots),
+                            'subject_id': rng.choice(department_subjects)['id']})
+
+    constraints = {
+        'days': DAYS,
+        'time_slots': TIME_SLOTS,
+        'lunch_break': LUNCH_BREAK,
+        'max_classes_per_day': 6,
+        'max_hours_per_faculty': 8,
+        'max_classes_per_day_per_batch': 6,
+        'fixed_slots': fixed_slots
+    }
+    return {'subjects': subjects, 'faculty': faculty, 'classrooms': classrooms, 'batches': batches,
+            'faculty_subjects': sorted(pairs), 'faculty_leaves': leaves, 'constraints': constraints}
+
+
+def write_database(instance, path):
+    """Store an instance in the tables the engines load from"""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.executescript('''
+        CREATE TABLE subjects (id INTEGER PRIMARY KEY, name TEXT, code TEXT, department_id INTEGER,
+                               subject_type TEXT, classes_per_week INTEGER);
+        CREATE TABLE faculty (id INTEGER PRIMARY KEY, name TEXT, employee_id TEXT, department_id INTEGER,
+                              max_hours_per_day INTEGER);
+        CREATE TABLE classrooms (id INTEGER PRIMARY KEY, name TEXT, capacity INTEGER, type TEXT,
+                                 department_id INTEGER);
+        CREATE TABLE batches (id INTEGER PRIMARY KEY, name TEXT, department_id INTEGER, semester INTEGER,
+                              strength INTEGER);
+        CREATE TABLE faculty_subjects (id INTEGER PRIMARY KEY AUTOINCREMENT, faculty_id INTEGER, subject_id INTEGER);
+        CREATE TABLE faculty_leaves (id INTEGER PRIMARY KEY AUTOINCREMENT, faculty_id INTEGER,
+                                     avg_leaves_per_month REAL);
+    ''')
+    for table in ('subjects', 'faculty', 'classrooms', 'batches'):
+        rows = instance[table]
+        columns = list(rows[0])
+        cursor.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                           [tuple(row[c] for c in columns) for row in rows])
+    cursor.executemany('INSERT INTO faculty_subjects (faculty_id, subject_id) VALUES (?, ?)',
+                       instance['faculty_subjects'])
+    cursor.executemany('INSERT INTO faculty_leaves (faculty_id, avg_leaves_per_month) VALUES (?, ?)',
+                       list(instance['faculty_leaves'].items()))
+    conn.commit()
+    conn.close()
@@ -0,0 +1,385 @@
+# benchmarks/run.py - Benchmark the timetable engines on synthetic instances
+"""Benchmark GeneticTimetable, EnhancedGeneticTimetable, the constraint programming,
+simulated annealing and multi-objective (NSGA-II) engines and the legacy app.py engine.
+
+    python -m benchmarks.run --scales small medium --output results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --fail-on-regression
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --engines enhanced cp --eligible-faculty 2 --faculty-per-batch 1.5 --classrooms-per-batch 0.8
+
+Every (scale, engine) case runs with fixed seeds in a fresh process working
+in a directory whose timetable.db holds the instance, so peak memory is per
+case and the engines load data exactly as they do in the app. All results
+are scored by one EnhancedGeneticTimetable on the instance ("score" and
+"hard_violations"), since the engines' own fitness scales differ, and
+"score_per_cpu_second" sets that score against the CPU time the case used.
+The fitness ignores classes a timetable leaves out altogether, so
+"unscheduled_classes" counts them and the score charges each like a
+subject_distribution deviation; the default instances can be taught in
+full without clashes. A case whose engine fails records its "error" (or
+"skipped" when an import is missing), and an engine the baseline measured
+failing or dropping classes counts as a regression.
+The constraint programming engine reports search nodes as its generations,
+the annealing engine moves.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+import numpy as np
+from benchmarks.instances import SCALES, generate_instance, write_database
+from scheduler.problem import SUBJECT
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+ENGINES = ('base', 'enhanced', 'cp', 'annealing', 'pareto', 'legacy')
+
+
+class PhaseTimer:
+    """Cumulative wall time per GA phase, collected by wrapping one engine's methods"""
+
+    def __init__(self):
+        self.phases = {}
+
+    def wrap(self, engine, method, phase):
+        function = getattr(engine, method)
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.phases[phase] = self.phases.get(phase, 0) + time.perf_counter() - started
+
+        setattr(engine, method, timed)
+
+
+class FeasibilityTracker:
+    """Time until the best timetable first satisfies every hard constraint.
+
+    Checks run only when the best fitness improves, and their own time is
+    left out of both the reported time and the run's elapsed time.
+    """
+
+    def __init__(self, judge):
+        self.judge = judge
+        self.started = time.perf_counter()
+        self.overhead = 0
+        self.best = -1
+        self.time_to_feasible = None
+
+    def observe(self, timetable, fitness):
+        if self.time_to_feasible is not None or fitness <= self.best:
+            return
+        self.best = fitness
+        checked = time.perf_counter()
+        if self.judge.hard_constraints_satisfied(timetable):
+            self.time_to_feasible = checked - self.started - self.overhead
+        self.overhead += time.perf_counter() - checked
+
+    def elapsed(self):
+        return time.perf_counter() - self.started - self.overhead
+
+    def track_population(self, engine):
+        """Observe the best of every population evaluate_population scores"""
+        evaluate = engine.evaluate_population
+
+        def observed(population):
+            scores = evaluate(population)
+            best = int(np.argmax(scores))
+            self.observe(population[best], scores[best])
+            return scores
+
+        engine.evaluate_population = observed
+
+
+def instance_engine(engine_class, instance):
+    return engine_class(instance['subjects'], instance['faculty'], instance['classrooms'], instance['batches'],
+                        dict(instance['constraints']))
+
+
+def run_base(instance, settings, judge, timer, tracker):
+    from genetic_algorithm import GeneticTimetable
+    engine = instance_engine(GeneticTimetable, instance)
+    for method, phase in (('initialize_population', 'initialization'), ('evaluate_population', 'evaluation'),
+                          ('tournament_selection', 'selection'), ('crossover_pairs', 'crossover'),
+                          ('mutate', 'mutation')):
+        timer.wrap(engine, method, phase)
+    tracker.track_population(engine)
+    timetable, fitness = engine.run(settings['population_size'], settings['generations'])
+    return timetable, fitness, settings['generations']
+
+
+def run_enhanced(instance, settings, judge, timer, tracker):
+    from genetic_algorithm import EnhancedGeneticTimetable
+    engine = instance_engine(EnhancedGeneticTimetable, instance)
+    engine.population_size = settings['population_size']
+    engine.generations = settings['generations']
+    engine.time_limit = engine.stagnation_generations = None
+    for method, phase in (('initial_population', 'initialization'), ('evaluate_population', 'evaluation'),
+                          ('elite_indices', 'selection'), ('tournament_selection', 'selection'),
+                          ('crossover_pairs', 'crossover'), ('mutate', 'mutation'), ('repair', 'local_search')):
+        timer.wrap(engine, method, phase)
+    tracker.track_population(engine)
+    timetable, fitness, run_stats = engine.run()
+    return timetable, fitness, run_stats['generations']
+
+
+def run_cp(instance, settings, judge, timer, tracker):
+    """Its time-to-feasible is only known once the search and the polish are done"""
+    from scheduler.cp import ConstraintTimetable
+    engine = instance_engine(ConstraintTimetable, instance)
+    engine.time_limit = settings['time_limit']
+    for method, phase in (('build_sessions', 'initialization'), ('repair', 'local_search')):
+        timer.wrap(engine, method, phase)
+    timetable, fitness, run_stats = engine.run()
+    tracker.observe(timetable, fitness)
+    print(f"Search {run_stats['stop_reason']}: {run_stats['placed']}/{run_stats['sessions']} sessions placed, "
+          f"{len(run_stats['unplaced'])} unplaceable")
+    return timetable, fitness, run_stats['nodes']
+
+
+def run_annealing(instance, settings, judge, timer, tracker):
+    from scheduler.annealing import AnnealingTimetable
+    engine = instance_engine(AnnealingTimetable, instance)
+    engine.time_limit = settings['time_limit']
+    for method, phase in (('initial_population', 'initialization'), ('proposal', 'mutation'),
+                          ('energy', 'evaluation'), ('repair', 'local_search')):
+        timer.wrap(engine, method, phase)
+    timetable, fitness, run_stats = engine.run()
+    tracker.observe(timetable, fitness)
+    return timetable, fitness, run_stats['iterations']
+
+
+def run_pareto(instance, settings, judge, timer, tracker):
+    """Scored on its best timetable, the other trade-offs of its front are not.
+
+    Its time-to-feasible is only known once the run and the polish are done.
+    """
+    from scheduler.pareto import ParetoTimetable
+    engine = instance_engine(ParetoTimetable, instance)
+    engine.population_size = settings['population_size']
+    engine.generations = settings['generations']
+    engine.time_limit = engine.stagnation_generations = None
+    for method, phase in (('initial_population', 'initialization'), ('objectives', 'evaluation'),
+                          ('survivors', 'selection'), ('crowded_tournament', 'selection'),
+                          ('crossover_pairs', 'crossover'), ('mutate', 'mutation'), ('repair', 'local_search')):
+        timer.wrap(engine, method, phase)
+    timetable, fitness, run_stats = engine.run()
+    tracker.observe(timetable, fitness)
+    return timetable, fitness, run_stats['generations']
+
+
+def run_legacy(instance, settings, judge, timer, tracker):
+    """The app.py engine solves one department/semester at a time, so departments run in turn.
+
+    Its time-to-feasible is only known once every department is done.
+    """
+    from scheduler.legacy import EnhancedGeneticTimetable
+    merged, fitness = {}, []
+    for department_id in sorted({b['department_id'] for b in instance['batches']}):
+        engine = EnhancedGeneticTimetable(department_id, 1, settings['population_size'], 0.1,
+                                              settings['generations'])
+        for method, phase in (('create_chromosome', 'initialization'), ('calculate_fitness', 'evaluation'),
+                              ('crossover', 'crossover'), ('mutate', 'mutation')):
+            timer.wrap(engine, method, phase)
+        chromosome, department_fitness = engine.evolve()
+        merged.update(chromosome)
+        fitness.append(department_fitness)
+    timetable = judge.problem.encode(merged)
+    tracker.observe(timetable, 1)
+    return timetable, float(np.mean(fitness)), settings['generations'] * len(fitness)
+
+
+RUNNERS = {'base': run_base, 'enhanced': run_enhanced, 'cp': run_cp, 'annealing': run_annealing,
+           'pareto': run_pareto, 'legacy': run_legacy}
+
+
+def run_case(scale, engine_name, instance, settings, seed, directory):
+    """Run one engine on one instance; executed in a fresh worker process"""
+    os.chdir(directory)
+    from genetic_algorithm import EnhancedGeneticTimetable
+    result = {'scale': scale, 'engine': engine_name, 'seed': seed, 'batches': len(instance['batches'])}
+    random.seed(seed)
+    np.random.seed(seed)
+    # The judge keeps the theory synchronization check, which engines sharing theory genes drop
+    judge = instance_engine(EnhancedGeneticTimetable,
+                            dict(instance, constraints=dict(instance['constraints'], shared_theory_genes=False)))
+    timer = PhaseTimer()
+    tracker = FeasibilityTracker(judge)
+    cpu_started = time.process_time()
+    try:
+        # Engine progress goes to stderr so a report on stdout stays valid JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            timetable, fitness, generations = RUNNERS[engine_name](instance, settings, judge, timer, tracker)
+    except ImportError as e:
+        result['skipped'] = f'{type(e).__name__}: {e}'
+        return result
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+        traceback.print_exc()
+        return result
+    elapsed = tracker.elapsed()
+    cpu_seconds = time.process_time() - cpu_started
+
+    violations = judge.evaluator.violations(timetable)
+    result.update({
+        'generations': int(generations),
+        'elapsed': round(elapsed, 4),
+        'generations_per_second': round(generations / elapsed, 3) if elapsed else None,
+        'time_to_feasible': None if tracker.time_to_feasible is None else round(tracker.time_to_feasible, 4),
+        'fitness': float(fitness),
+        'unscheduled_classes': unscheduled_classes(judge.problem, timetable),
+        'cpu_seconds': round(cpu_seconds, 4),
+        'hard_violations': {check: int(violations[check][0]) for check in judge.HARD_CONSTRAINTS
+                            if check in violations},
+        'phases': {phase: round(seconds, 4) for phase, seconds in sorted(timer.phases.items())},
+        'peak_memory_mb': None
+    })
+    # Every class left out costs what a class too few of a taught subject does
+    missing_penalty = dict(judge.fitness_weights)['subject_distribution'] * result['unscheduled_classes']
+    result['score'] = float(max(0, judge.calculate_fitness(timetable) - missing_penalty))
+    result['score_per_cpu_second'] = round(result['score'] / cpu_seconds, 3) if cpu_seconds else None
+    result['phases']['other'] = round(max(0, elapsed - sum(timer.phases.values())), 4)
+    if resource:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        unit = 1 if sys.platform == 'darwin' else 1024
+        result['peak_memory_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2 ** 20, 1)
+    return result
+
+
+def unscheduled_classes(problem, timetable):
+    """Weekly classes of their department's subjects that batches are not given at all"""
+    subjects = timetable[..., SUBJECT]
+    subject_departments = np.array([s['department_id'] for s in problem.subjects])
+    missing = 0
+    for b, batch in enumerate(problem.batches):
+        taught = np.bincount(subjects[b][subjects[b] >= 0], minlength=problem.num_subjects)
+        required = np.where(subject_departments == batch['department_id'], problem.subject_classes_per_week, 0)
+        missing += int(np.maximum(required - taught, 0).sum())
+    return missing
+
+
+def measured(result):
+    return 'skipped' not in result and 'error' not in result
+
+
+def compare(results, baseline, tolerance):
+    """Per-case changes against a baseline run; a metric worse by more than tolerance is a regression"""
+    previous = {(r['scale'], r['engine']): r for r in baseline['results'] if measured(r)}
+    comparison = []
+    for result in results:
+        old = previous.get((result['scale'], result['engine']))
+        if old is None:
+            continue
+        if not measured(result):
+            comparison.append({'scale': result['scale'], 'engine': result['engine'], 'changes': {},
+                               'regressions': ['unavailable']})
+            continue
+        regressions = []
+        if old['generations_per_second'] and \
+                result['generations_per_second'] < old['generations_per_second'] * (1 - tolerance):
+            regressions.append('generations_per_second')
+        if old['peak_memory_mb'] and result['peak_memory_mb'] and \
+                result['peak_memory_mb'] > old['peak_memory_mb'] * (1 + tolerance):
+            regressions.append('peak_memory_mb')
+        if result['score'] < old['score'] * (1 - tolerance):
+            regressions.append('score')
+        if result['unscheduled_classes'] > old.get('unscheduled_classes', 0):
+            regressions.append('unscheduled_classes')
+        if old['time_to_feasible'] is not None and (
+                result['time_to_feasible'] is None or result['time_to_feasible'] > old['time_to_feasible'] * (1 + tolerance)):
+            regressions.append('time_to_feasible')
+        comparison.append({
+            'scale': result['scale'],
+            'engine': result['engine'],
+            'changes': {metric: {'baseline': old.get(metric), 'current': result[metric]}
+                        for metric in ('generations_per_second', 'time_to_feasible', 'score', 'unscheduled_classes',
+                                       'peak_memory_mb')},
+            'regressions': regressions
+        })
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the timetable genetic algorithms')
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES))
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--population-size', type=int, help='Override the per-scale population size')
+    parser.add_argument('--generations', type=int, help='Override the per-scale generation count')
+    # Scarcer staffing and rooms than the defaults make harder, possibly infeasible instances
+    parser.add_argument('--eligible-faculty', type=int, help='Faculty able to teach each subject')
+    parser.add_argument('--faculty-per-batch', type=float, help='Faculty members per batch')
+    parser.add_argument('--classrooms-per-batch', type=float, help='Classrooms per batch')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='Compare against a previously saved report')
+    parser.add_argument('--save-baseline', help='Also write the report to this path as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Relative change allowed before a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for scale in args.scales:
+        settings = dict(SCALES[scale])
+        if args.population_size:
+            settings['population_size'] = args.population_size
+        if args.generations:
+            settings['generations'] = args.generations
+        options = {option: getattr(args, option) for option in
+                   ('eligible_faculty', 'faculty_per_batch', 'classrooms_per_batch') if getattr(args, option)}
+        instance = generate_instance(settings['batches'], seed=args.seed, **options)
+        with tempfile.TemporaryDirectory() as directory:
+            write_database(instance, os.path.join(directory, 'timetable.db'))
+            for engine_name in args.engines:
+                print(f"Benchmarking {engine_name} on {scale} ({settings['batches']} batches)...", file=sys.stderr)
+                # A fresh process per case keeps peak memory and module state independent
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_case, (scale, engine_name, instance, settings, args.seed, directory))
+                results.append(result)
+                print(f"  {result.get('skipped') or result.get('error') or result}", file=sys.stderr)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'results': results
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'] = compare(results, json.load(f), args.tolerance)
+        for row in report['comparison']:
+            if row['regressions']:
+                print(f"Regression in {row['engine']} on {row['scale']}: {', '.join(row['regressions'])}",
+                      file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(text)
+
+    regressed = any(row['regressions'] for row in report.get('comparison', []))
+    return 1 if args.fail_on_regression and regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -24,6 +24,32 @@ class Config:
     GA_MUTATION_RATE = float(os.environ.get('GA_MUTATION_RATE') or 0.1)
     GA_CROSSOVER_RATE = float(os.environ.get('GA_CROSSOVER_RATE') or 0.8)
     GA_ELITE_SIZE = int(os.environ.get('GA_ELITE_SIZE') or 5)
+    GA_ENGINE = os.environ.get('GA_ENGINE') or 'genetic'  # default engine: genetic, cp, annealing or pareto
+    GA_ISLANDS = int(os.environ.get('GA_ISLANDS') or 1)  # 1 = single process; island runs cannot be resumed
+    GA_MIGRATION_INTERVAL = int(os.environ.get('GA_MIGRATION_INTERVAL') or 25)
+    GA_MIGRATION_SIZE = int(os.environ.get('GA_MIGRATION_SIZE') or 2)
+    GA_MIGRATION_TOPOLOGY = os.environ.get('GA_MIGRATION_TOPOLOGY') or 'ring'  # ring or full
+    GA_TIME_LIMIT = float(os.environ.get('GA_TIME_LIMIT') or 120)  # seconds, 0 = no limit
+    GA_STAGNATION_GENERATIONS = int(os.environ.get('GA_STAGNATION_GENERATIONS') or 150)  # 0 = never
+    GA_STOP_ON_HARD_CONSTRAINTS = os.environ.get('GA_STOP_ON_HARD_CONSTRAINTS') or 'False'
+    GA_FITNESS_CACHE_SIZE = int(os.environ.get('GA_FITNESS_CACHE_SIZE') or 4096)  # 0 = disabled
+    GA_LOCAL_SEARCH_TIME = float(os.environ.get('GA_LOCAL_SEARCH_TIME') or 5)  # seconds of final repair, 0 = off
+    GA_MEMETIC_TOP_K = int(os.environ.get('GA_MEMETIC_TOP_K') or 0)  # individuals repaired per generation
+    GA_FACULTY_BALANCING = os.environ.get('GA_FACULTY_BALANCING') or 'True'  # min-cost flow re-staffing of the best
+    GA_CHECKPOINT_DIR = os.environ.get('GA_CHECKPOINT_DIR') or 'checkpoints'
+    GA_CHECKPOINT_INTERVAL = int(os.environ.get('GA_CHECKPOINT_INTERVAL') or 50)  # generations, single-process runs
+    GA_DEPARTMENT_PROCESSES = int(os.environ.get('GA_DEPARTMENT_PROCESSES') or 0)  # generate-all pool, 0 = CPU count
+    GA_RECONCILE_TIME = float(os.environ.get('GA_RECONCILE_TIME') or 30)  # seconds of cross-department repair
+    GA_ANNEALING_SCHEDULE = os.environ.get('GA_ANNEALING_SCHEDULE') or 'exponential'  # or linear, logarithmic
+    GA_ANNEALING_REHEATS = int(os.environ.get('GA_ANNEALING_REHEATS') or 2)  # restarts from the best, cooler
+    GA_PARETO_FRONT_SIZE = int(os.environ.get('GA_PARETO_FRONT_SIZE') or 5)  # timetables a pareto run saves
+    GA_PROFILE = os.environ.get('GA_PROFILE') or 'False'  # record phase/constraint timings per run
+    GA_JOB_WORKERS = int(os.environ.get('GA_JOB_WORKERS') or 2)  # generation jobs running at once
+    GA_JOBS_PER_USER = int(os.environ.get('GA_JOBS_PER_USER') or 2)  # queued + running jobs per admin
+    GA_JOB_MAX_ATTEMPTS = int(os.environ.get('GA_JOB_MAX_ATTEMPTS') or 3)  # runs before a crashing job fails
+    GA_JOB_NICENESS = int(os.environ.get('GA_JOB_NICENESS') or 10)  # scheduling priority drop of job workers
+    GA_JOB_HEARTBEAT_TIMEOUT = float(os.environ.get('GA_JOB_HEARTBEAT_TIMEOUT') or 60)  # seconds before requeue
+    GA_EVENTS_STREAM_SECONDS = float(os.environ.get('GA_EVENTS_STREAM_SECONDS') or 30)  # progress stream reopens
     
     # Notification config
     NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS') or 30)
@@ -1,11 +1,38 @@
 # genetic_algorithm.py
+import os
 import random
 import numpy as np
-from copy import deepcopy
 import sqlite3
+from scheduler.problem import ProblemInstance, SUBJECT, FACULTY, CLASSROOM, EMPTY, UNKNOWN
+from scheduler.fitness import PopulationEvaluator
+from scheduler.delta import DeltaEvaluator
+from scheduler.eligibility import EligibilityIndex
+from scheduler.islands import run_islands
+from scheduler.termination import Termination, GENERATIONS
+from scheduler.cache import FitnessCache
+from scheduler.occupancy import OccupancyIndex
+from scheduler.local_search import TabuSearch
+from scheduler.checkpoint import save_checkpoint, load_checkpoint, restore_random_state, CHECKPOINT_ERRORS
+from scheduler.profiling import Profiler
+from scheduler.rooms import RoomAssigner
+from scheduler.workload import FacultyAssigner
 
 class GeneticTimetable:
-    def __init__(self, subjects, faculty, classrooms, batches, constraints):
+    # Penalty per violation of each check_* method, in the order they are summed
+    FITNESS_WEIGHTS = [
+        ('faculty_conflicts', 50),
+        ('classroom_conflicts', 50),
+        ('workload_violations', 30),
+        ('time_preferences', 20),
+        ('consecutive_classes', 25),
+        ('lunch_breaks', 15),
+        ('theory_synchronization', 100),  # High penalty for sync violations
+    ]
+    
+    # Checks that must be free of violations for a timetable to be usable
+    HARD_CONSTRAINTS = ['faculty_conflicts', 'classroom_conflicts', 'fixed_slots', 'theory_synchronization']
+    
+    def __init__(self, subjects, faculty, classrooms, batches, constraints, eligibility=None):
         self.subjects = subjects
         self.faculty = faculty
         self.classrooms = classrooms
@@ -29,152 +56,295 @@ class GeneticTimetable:
         self.theory_subjects = [s for s in subjects if s.get('subject_type') == 'THEORY']
         self.lab_subjects = [s for s in subjects if s.get('subject_type') == 'LAB']
         
+        # Dense integer encoding; every timetable is an array of shape
+        # (batches, days, slots, 3) holding subject/faculty/classroom indices
+        self.problem = ProblemInstance(subjects, faculty, classrooms, batches,
+                                       self.days, self.time_slots, self.lunch_break)
+        # Subject kinds indexed by a subject channel directly, EMPTY (-1) reading the trailing False
+        self.holds_lab = np.append(self.problem.subject_is_lab, False)
+        self.holds_theory = np.append(self.problem.subject_is_theory, False)
+        
+        # Faculty/subject eligibility, loaded once instead of queried per placement
+        if eligibility is None:
+            eligibility = EligibilityIndex.from_database(self.problem.faculty_ids, self.problem.subject_ids)
+        elif (eligibility.faculty_ids != self.problem.faculty_ids or
+              eligibility.subject_ids != self.problem.subject_ids):
+            eligibility = eligibility.restrict(self.problem.faculty_ids, self.problem.subject_ids)
+        self.eligibility = eligibility
+        self.workload_limits = np.array(
+            [f.get('max_hours_per_day', self.max_hours_per_faculty) * len(self.days) for f in faculty]
+        )
+        
+        # Opt-in timing of GA phases and of every constraint check
+        self.profiler = Profiler(constraints.get('profile', False))
+        
+        # Batched selection and crossover draws; seeded from the random module
+        # so seeding that makes runs repeatable
+        self.rng = np.random.default_rng(random.getrandbits(64))
+        
+        # Theory genes are shared per department: its batches hold one theory
+        # subject per (day, slot), so theory synchronization needs no check
+        self.shared_theory_genes = constraints.get('shared_theory_genes', True)
+        self.fitness_weights = [(check, weight) for check, weight in self.FITNESS_WEIGHTS
+                                if not (self.shared_theory_genes and check == 'theory_synchronization')]
+        
+        # Batched evaluator scoring whole populations with the fitness weights
+        self.evaluator = PopulationEvaluator(self.problem, self.fitness_weights, self.workload_limits,
+                                             profiler=self.profiler)
+        
+        # Scores of recently seen timetables (elites and uncrossed parents recur)
+        self.fitness_cache = FitnessCache(constraints.get('fitness_cache_size', 4096))
+        
+        # Tabu search repair: seconds spent on the final best, and the memetic
+        # step improving the top-k individuals of every generation
+        self.local_search_time = constraints.get('local_search_time', 0)
+        self.memetic_top_k = constraints.get('memetic_top_k', 0)
+        self.memetic_iterations = constraints.get('memetic_iterations', 20)
+        
+        # Min-cost flow re-staffing of a run's best timetable with balanced faculty loads
+        self.faculty_balancing = constraints.get('faculty_balancing', True)
+        
+        # Classrooms are derived by matching each (day, slot)'s classes to rooms,
+        # so the search only decides subjects, faculty and times
+        self.room_assigner = RoomAssigner(self.problem) if constraints.get('room_matching', True) else None
+        
+        # Cells held by fixed slots, locked out of the search (none until fixed slots are given)
+        self.lock_fixed_slots(())
+        
     def initialize_population(self, size):
-        population = []
-        for _ in range(size):
-            timetable = {}
+        population = np.empty((size,) + self.problem.shape, dtype=np.int32)
+        for i in range(size):
+            # Bookings of batches, faculty and rooms made while building this individual
+            occupancy = OccupancyIndex(self.problem)
+            
+            # Fixed slots go in first and stay reserved in the occupancy index
+            timetable = self.place_fixed_slots(self.problem.empty_timetable(), occupancy)
             
-            # First schedule theory subjects synchronously across all batches
-            timetable = self.initialize_theory_slots()
+            # Then schedule theory subjects synchronously across all batches
+            timetable = self.initialize_theory_slots(occupancy, timetable)
             
             # Then fill remaining slots with lab subjects
-            timetable = self.fill_lab_slots(timetable)
-                
-            population.append(timetable)
+            population[i] = self.fill_lab_slots(timetable, occupancy)
+            if self.room_assigner is not None:
+                self.room_assigner.assign(population[i])
         return population
     
-    def initialize_theory_slots(self):
+    def lock_fixed_slots(self, compiled_fixed_slots):
+        """Lock the cells of fixed slots so no operator changes them.
+
+        A locked cell always holds its fixed subject, plus the faculty member and
+        classroom when the fixed slot names them. Fixed slots that can never be
+        satisfied (a time slot or ids outside the problem) stay soft penalties.
+        A shared theory subject is locked for every batch of the department.
+        Fixed slots of one cell are merged while they agree; the first wins.
+        """
+        self.fixed_mask = np.zeros(self.problem.shape[:3], dtype=bool)
+        self.fixed_genes = {}  # (batch, day, slot) -> (subject, faculty or EMPTY, classroom or EMPTY)
+        for b, d, s, subject, faculty, classroom in compiled_fixed_slots:
+            if s is None or subject < 0 or (faculty or 0) < 0 or (classroom or 0) < 0:
+                continue
+            genes = {(b, d, s): (subject, EMPTY if faculty is None else faculty,
+                                 EMPTY if classroom is None else classroom)}
+            if self.shared_theory_genes and self.problem.subject_is_theory[subject]:
+                for c in self.problem.department_batches[self.problem.batch_department[b]].tolist():
+                    genes.setdefault((c, d, s), (subject, EMPTY, EMPTY))
+            merged = {}
+            for cell, gene in genes.items():
+                locked = self.fixed_genes.get(cell)
+                if locked is not None:
+                    if any(value != other for value, other in zip(gene, locked) if value >= 0 and other >= 0):
+                        break
+                    gene = tuple(max(value, other) for value, other in zip(gene, locked))
+                merged[cell] = gene
+            else:
+                for cell, gene in merged.items():
+                    self.fixed_mask[cell] = True
+                    self.fixed_genes[cell] = gene
+        # Department (day, slot) cells with a locked cell in any of its batches
+        locked = self.problem.department_membership @ self.fixed_mask.reshape(self.problem.num_batches, -1)
+        self.department_locked = locked.reshape((self.problem.num_departments,) + self.problem.shape[1:3]) > 0
+        # Cells whose lab gene mutation may change, department (day, slot) cells whose theory gene it may
+        # move, and the (day, slot) cells such a gene may move to
+        self.mutable_cells = ~self.fixed_mask & self.problem.teaching_slots
+        self.theory_cells = ~self.department_locked.reshape(self.problem.num_departments, -1)
+        self.theory_targets = [np.argwhere(~locked & self.problem.teaching_slots) for locked in self.department_locked]
+        # Position of every (day, slot) among its department's targets, or -1
+        self.theory_target_index = np.full(self.department_locked.shape, -1)
+        for department, targets in enumerate(self.theory_targets):
+            self.theory_target_index[department, targets[:, 0], targets[:, 1]] = np.arange(len(targets))
+    
+    def place_fixed_slots(self, timetable, occupancy=None):
+        """Write the locked fixed slots into a timetable in place and return it.
+
+        A fixed slot naming no faculty member keeps the one the cell already has
+        for its subject, or gets a random eligible one; likewise for classrooms
+        when they are not matched. Placed classes are booked in the occupancy.
+        """
+        for (b, d, s), (subject, faculty, classroom) in self.fixed_genes.items():
+            current = timetable[b, d, s].tolist()
+            kept = current[SUBJECT] == subject
+            if faculty == EMPTY:
+                candidates = self.eligibility.candidates[subject]
+                if kept and current[FACULTY] >= 0:
+                    faculty = current[FACULTY]
+                elif len(candidates):
+                    faculty = int(random.choice(candidates))
+            if classroom == EMPTY and self.room_assigner is None:
+                room = self.get_available_classroom('LAB' if self.problem.subject_is_lab[subject] else 'THEORY')
+                if kept and current[CLASSROOM] >= 0:
+                    classroom = current[CLASSROOM]
+                elif room:
+                    classroom = self.problem.classroom_index[room['id']]
+            timetable[b, d, s] = (subject, faculty, classroom)
+            if occupancy is not None:
+                occupancy.book([b], d, s, (subject, faculty, classroom))
+        if self.room_assigner is not None:
+            for d, s in {(d, s) for _, d, s in self.fixed_genes}:
+                self.room_assigner.assign_cell(timetable, d, s)
+        return timetable
+    
+    def synchronize_theory(self, timetable):
+        """Leave every department one theory subject per (day, slot) in place and return the timetable.
+
+        Timetables from elsewhere (saved or edited ones) may disagree between
+        batches; the subject most batches hold is kept and the other theory
+        classes of that (day, slot) are cleared.
+        """
+        subjects = timetable[..., SUBJECT]
+        for batches in self.problem.department_batches:
+            held = subjects[batches]
+            theory = held >= 0
+            theory[theory] = self.problem.subject_is_theory[held[theory]]
+            for d, s in np.argwhere(theory.any(axis=0)).tolist():
+                values, counts = np.unique(held[theory[:, d, s], d, s], return_counts=True)
+                if len(values) > 1:
+                    drifted = theory[:, d, s] & (held[:, d, s] != values[np.argmax(counts)])
+                    timetable[batches[drifted], d, s] = EMPTY
+        return timetable
+    
+    def theory_genes(self, timetable):
+        """Flat (department, day, slot) indices of every shared theory gene not locked by a fixed slot"""
+        theory = self.holds_theory[timetable[..., SUBJECT]].reshape(self.problem.num_batches, -1)
+        genes = self.problem.department_membership @ theory.astype(np.float32)
+        return np.flatnonzero((genes > 0) & self.theory_cells)
+    
+    def department_swap(self, timetable, batches, cell, other):
+        """Changes swapping two (day, slot) cells for every given batch, as (batch, day, slot, gene)"""
+        genes = timetable[batches, cell[0], cell[1]].tolist()
+        other_genes = timetable[batches, other[0], other[1]].tolist()
+        changes = []
+        for b, gene, other_gene in zip(batches.tolist(), genes, other_genes):
+            if gene != other_gene:
+                changes += [(b,) + cell + (tuple(other_gene),), (b,) + other + (tuple(gene),)]
+        return changes
+    
+    def encode_slot(self, subject, faculty, classroom):
+        """Build the gene for a subject with its (possibly missing) faculty and classroom"""
+        return self.problem.gene(subject['id'],
+                                 faculty['id'] if faculty else None,
+                                 classroom['id'] if classroom else None)
+    
+    def initialize_theory_slots(self, occupancy, timetable=None):
         """Initialize timetable with theory subjects scheduled at same time across batches"""
-        timetable = {}
-        
-        # Create empty timetable structure
-        for batch in self.batches:
-            batch_id = batch['id']
-            timetable[batch_id] = {}
-            for day in self.days:
-                timetable[batch_id][day] = {}
-                for time_slot in self.time_slots:
-                    if time_slot == self.lunch_break:
-                        timetable[batch_id][day][time_slot] = None
-                    else:
-                        timetable[batch_id][day][time_slot] = None
+        if timetable is None:
+            timetable = self.problem.empty_timetable()
         
         # Schedule theory subjects synchronously
         for theory_subject in self.theory_subjects:
             required_classes = theory_subject.get('classes_per_week', 3)
+            target_batches = self.department_batch_indices(theory_subject.get('department_id'))
+            if target_batches:
+                # Classes already placed by fixed slots count towards the week
+                subject_idx = self.problem.subject_index[theory_subject['id']]
+                required_classes -= int(occupancy.subject_count[target_batches, subject_idx].min())
             
             for _ in range(required_classes):
+                faculty_for_subject = self.get_faculty_for_subject(theory_subject['id'])
+                
                 # Find a time slot that's available for all batches in this department
-                available_slot = self.find_available_theory_slot(timetable, theory_subject)
+                available_slot = self.find_available_theory_slot(occupancy, theory_subject, faculty_for_subject)
                 
                 if available_slot:
                     day, time_slot = available_slot
-                    faculty_for_subject = self.get_faculty_for_subject(theory_subject['id'])
-                    classroom = self.get_available_classroom('THEORY')
+                    classroom = self.get_free_classroom(occupancy, 'THEORY', day, time_slot)
                     
                     # Schedule this theory subject at the same time for all batches in the department
-                    for batch in self.batches:
-                        if batch.get('department_id') == theory_subject.get('department_id'):
-                            timetable[batch['id']][day][time_slot] = {
-                                'subject_id': theory_subject['id'],
-                                'faculty_id': faculty_for_subject['id'] if faculty_for_subject else None,
-                                'classroom_id': classroom['id'] if classroom else None
-                            }
+                    gene = self.encode_slot(theory_subject, faculty_for_subject, classroom)
+                    timetable[target_batches, day, time_slot] = gene
+                    occupancy.book(target_batches, day, time_slot, gene)
         
         return timetable
     
-    def find_available_theory_slot(self, timetable, theory_subject):
-        """Find a time slot available for all batches in the same department"""
+    def department_batch_indices(self, department_id):
+        """Indices of the batches belonging to a department"""
+        return [i for i, b in enumerate(self.batches) if b.get('department_id') == department_id]
+    
+    def find_available_slot(self, occupancy, batch_indices, faculty):
+        """Random (day, slot) free for every batch, preferring slots the faculty member is free in"""
+        free = occupancy.free_cells(batch_indices)
+        faculty_free = free & occupancy.free_cells((), self.problem.faculty_index[faculty['id']]) if faculty else 0
+        return occupancy.random_cell(faculty_free or free)
+    
+    def find_available_theory_slot(self, occupancy, theory_subject, faculty=None):
+        """Find a (day, slot) index pair available for all batches in the same department"""
         # Get batches that need this theory subject
-        target_batches = [b for b in self.batches if b.get('department_id') == theory_subject.get('department_id')]
-        
-        available_slots = []
-        for day in self.days:
-            for time_slot in self.time_slots:
-                if time_slot == self.lunch_break:
-                    continue
-                
-                # Check if slot is available for all target batches
-                slot_available = True
-                for batch in target_batches:
-                    if timetable[batch['id']][day][time_slot] is not None:
-                        slot_available = False
-                        break
-                
-                if slot_available:
-                    available_slots.append((day, time_slot))
-        
-        return random.choice(available_slots) if available_slots else None
+        target_batches = self.department_batch_indices(theory_subject.get('department_id'))
+        return self.find_available_slot(occupancy, target_batches, faculty)
     
-    def fill_lab_slots(self, timetable):
+    def fill_lab_slots(self, timetable, occupancy):
         """Fill remaining slots with lab subjects independently for each batch"""
-        for batch in self.batches:
-            batch_id = batch['id']
+        for batch_idx, batch in enumerate(self.batches):
             batch_lab_subjects = [s for s in self.lab_subjects if s.get('department_id') == batch.get('department_id')]
             
             for lab_subject in batch_lab_subjects:
                 required_classes = lab_subject.get('classes_per_week', 3)
-                scheduled_classes = self.count_scheduled_classes(timetable, batch_id, lab_subject['id'])
+                scheduled_classes = self.count_scheduled_classes(occupancy, batch_idx, lab_subject['id'])
                 
                 while scheduled_classes < required_classes:
+                    faculty_for_subject = self.get_faculty_for_subject(lab_subject['id'])
+                    
                     # Find available slot for this batch
-                    available_slot = self.find_available_lab_slot(timetable, batch_id)
+                    available_slot = self.find_available_lab_slot(occupancy, batch_idx, faculty_for_subject)
                     if not available_slot:
                         break
                     
                     day, time_slot = available_slot
-                    faculty_for_subject = self.get_faculty_for_subject(lab_subject['id'])
-                    classroom = self.get_available_classroom('LAB')
+                    classroom = self.get_free_classroom(occupancy, 'LAB', day, time_slot)
                     
-                    timetable[batch_id][day][time_slot] = {
-                        'subject_id': lab_subject['id'],
-                        'faculty_id': faculty_for_subject['id'] if faculty_for_subject else None,
-                        'classroom_id': classroom['id'] if classroom else None
-                    }
+                    gene = self.encode_slot(lab_subject, faculty_for_subject, classroom)
+                    timetable[batch_idx, day, time_slot] = gene
+                    occupancy.book([batch_idx], day, time_slot, gene)
                     scheduled_classes += 1
         
         return timetable
     
-    def find_available_lab_slot(self, timetable, batch_id):
-        """Find available slot for lab subject in a specific batch"""
-        available_slots = []
-        for day in self.days:
-            for time_slot in self.time_slots:
-                if (time_slot != self.lunch_break and 
-                    timetable[batch_id][day][time_slot] is None):
-                    available_slots.append((day, time_slot))
-        
-        return random.choice(available_slots) if available_slots else None
+    def find_available_lab_slot(self, occupancy, batch_idx, faculty=None):
+        """Find available (day, slot) index pair for lab subject in a specific batch"""
+        return self.find_available_slot(occupancy, [batch_idx], faculty)
     
-    def count_scheduled_classes(self, timetable, batch_id, subject_id):
+    def count_scheduled_classes(self, occupancy, batch_idx, subject_id):
         """Count how many times a subject is scheduled for a batch"""
-        count = 0
-        for day in self.days:
-            for time_slot in self.time_slots:
-                slot_data = timetable[batch_id][day].get(time_slot)
-                if slot_data and slot_data['subject_id'] == subject_id:
-                    count += 1
-        return count
+        return int(occupancy.subject_count[batch_idx, self.problem.subject_index[subject_id]])
     
     def get_faculty_for_subject(self, subject_id):
         # Find faculty who can teach this subject
-        eligible_faculty = [f for f in self.faculty if self.can_teach_subject(f, subject_id)]
-        return random.choice(eligible_faculty) if eligible_faculty else None
+        eligible_faculty = self.eligibility.candidates_for(subject_id)
+        return self.faculty[random.choice(eligible_faculty)] if len(eligible_faculty) else None
     
     def can_teach_subject(self, faculty, subject_id):
         """Check if faculty can teach this subject based on faculty_subjects table"""
-        conn = sqlite3.connect('timetable.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM faculty_subjects 
-            WHERE faculty_id = ? AND subject_id = ?
-        ''', (faculty['id'], subject_id))
-        
-        can_teach = cursor.fetchone()[0] > 0
-        conn.close()
+        return self.eligibility.can_teach(faculty['id'], subject_id)
     
-        return can_teach
+    def get_free_classroom(self, occupancy, subject_type, day, time_slot):
+        """Random classroom of the right type, preferring one still free at (day, slot)"""
+        if self.room_assigner is not None:
+            # Rooms are matched once the whole individual is built
+            return None
+        room_type = 'LAB' if subject_type == 'LAB' else 'CLASSROOM'
+        rooms = [c for c in self.classrooms if c['type'] == room_type]
+        free_rooms = [c for c in rooms
+                      if occupancy.is_free(occupancy.classrooms[self.problem.classroom_index[c['id']]], day, time_slot)]
+        return random.choice(free_rooms or rooms) if rooms else None
     
     def get_available_classroom(self, subject_type):
         # Filter classrooms based on subject type
@@ -186,123 +356,116 @@ class GeneticTimetable:
             return random.choice(classrooms) if classrooms else None
     
     def calculate_fitness(self, timetable):
-        fitness_score = 1000  # Start with perfect score
-        
-        # Check for faculty conflicts
-        faculty_conflicts = self.check_faculty_conflicts(timetable)
-        fitness_score -= faculty_conflicts * 50
-        
-        # Check for classroom conflicts
-        classroom_conflicts = self.check_classroom_conflicts(timetable)
-        fitness_score -= classroom_conflicts * 50
+        key = self.fitness_cache.key(timetable)
+        cached = self.fitness_cache.get(key)
+        if cached is not None:
+            return cached
         
-        # Check for workload violations
-        workload_violations = self.check_workload_violations(timetable)
-        fitness_score -= workload_violations * 30
-        
-        # Check for time preference violations
-        time_preference_violations = self.check_time_preferences(timetable)
-        fitness_score -= time_preference_violations * 20
-        
-        # Check for consecutive class violations
-        consecutive_class_violations = self.check_consecutive_classes(timetable)
-        fitness_score -= consecutive_class_violations * 25
+        fitness_score = 1000  # Start with perfect score
         
-        # Check for lunch break violations
-        lunch_break_violations = self.check_lunch_breaks(timetable)
-        fitness_score -= lunch_break_violations * 15
+        # Weight different constraint violations
+        total_violations = 0
+        for check, weight in self.fitness_weights:
+            with self.profiler.constraint(check):
+                total_violations += getattr(self, 'check_' + check)(timetable) * weight
         
-        # Check for theory synchronization violations (NEW)
-        theory_sync_violations = self.check_theory_synchronization(timetable)
-        fitness_score -= theory_sync_violations * 100  # High penalty for sync violations
+        fitness = max(0, fitness_score - total_violations)
+        self.fitness_cache.put(key, fitness)
+        return fitness
+    
+    def evaluate_population(self, population):
+        """Fitness of every individual of a stacked population, as a list"""
+        keys = [self.fitness_cache.key(timetable) for timetable in population]
+        fitness_scores = [self.fitness_cache.get(key) for key in keys]
         
-        return max(0, fitness_score)
+        # Only timetables not seen recently go through the batched evaluator, once each
+        misses = {}
+        for i, fitness in enumerate(fitness_scores):
+            if fitness is None:
+                misses.setdefault(keys[i], []).append(i)
+        if misses:
+            first = [indices[0] for indices in misses.values()]
+            for (key, indices), fitness in zip(misses.items(), self.evaluator.evaluate(population[first]).tolist()):
+                self.fitness_cache.put(key, fitness)
+                for i in indices:
+                    fitness_scores[i] = fitness
+        return fitness_scores
+    
+    def delta_evaluator(self, timetable):
+        """Incremental evaluator for applying and undoing moves on one timetable"""
+        return DeltaEvaluator(self.evaluator, timetable)
+    
+    def hard_constraints_satisfied(self, timetable):
+        """Whether a timetable has no violations of any weighted hard constraint"""
+        violations = self.evaluator.violations(timetable)
+        return all(violations[check][0] == 0 for check in self.HARD_CONSTRAINTS if check in violations)
+    
+    def profile_report(self):
+        """Profiler totals plus the input sizes that drive them"""
+        report = self.profiler.report()
+        report['inputs'] = {
+            'batches': self.problem.num_batches,
+            'subjects': self.problem.num_subjects,
+            'faculty': self.problem.num_faculty,
+            'classrooms': self.problem.num_classrooms,
+            'fixed_slots': len(self.evaluator.compiled_fixed_slots),
+            'population_size': getattr(self, 'population_size', None)
+        }
+        return report
+    
+    def repair(self, timetable, time_limit=None, max_iterations=1000):
+        """Tabu search from a timetable; returns the best timetable found, its fitness and search stats"""
+        repaired, stats = TabuSearch(self).improve(timetable, time_limit, max_iterations)
+        return repaired, self.calculate_fitness(repaired), stats
+    
+    def memetic_step(self, population, fitness_scores):
+        """Locally improve the top-k individuals in place"""
+        if not self.memetic_top_k:
+            return
+        with self.profiler.phase('local_search'):
+            for i in np.argsort(fitness_scores)[-self.memetic_top_k:].tolist():
+                population[i], fitness_scores[i], _ = self.repair(population[i], max_iterations=self.memetic_iterations)
     
     def check_theory_synchronization(self, timetable):
         """Check if theory subjects are scheduled at same time across batches"""
-        violations = 0
+        subjects = timetable[..., SUBJECT]
         
-        # Group theory subjects by department
-        department_theory_slots = {}
+        # Collect (department, day, slot, subject) for every scheduled theory class
+        theory = subjects >= 0
+        theory[theory] = self.problem.subject_is_theory[subjects[theory]]
+        b, d, s = np.nonzero(theory)
+        if not len(b):
+            return 0
+        department_theory_slots = np.unique(np.stack(
+            [self.problem.batch_department[b], d, s, subjects[b, d, s]], axis=1), axis=0)
         
-        # Collect all theory subject scheduling information
-        for batch_id, schedule in timetable.items():
-            batch = self.batch_map[batch_id]
-            dept_id = batch.get('department_id')
-            
-            if dept_id not in department_theory_slots:
-                department_theory_slots[dept_id] = {}
-            
-            for day, time_slots in schedule.items():
-                for time_slot, slot_data in time_slots.items():
-                    if slot_data and slot_data['subject_id']:
-                        subject = self.subject_map.get(slot_data['subject_id'])
-                        if subject and subject['subject_type'] == 'THEORY':
-                            key = (day, time_slot)
-                            if key not in department_theory_slots[dept_id]:
-                                department_theory_slots[dept_id][key] = set()
-                            department_theory_slots[dept_id][key].add(slot_data['subject_id'])
-        
-        # Check for synchronization violations
-        for dept_id, time_slots in department_theory_slots.items():
-            for (day, time_slot), subject_ids in time_slots.items():
-                # If multiple theory subjects are scheduled at same time in same department, it's a violation
-                if len(subject_ids) > 1:
-                    violations += len(subject_ids) - 1
-        
-        return violations
+        # If multiple theory subjects are scheduled at same time in same department, it's a violation
+        _, subjects_per_slot = np.unique(department_theory_slots[:, :3], axis=0, return_counts=True)
+        return int((subjects_per_slot - 1).sum())
+    
+    def count_clashes(self, resources):
+        """Count repeated bookings of a resource in the same (day, slot) across batches"""
+        num_batches, num_days, num_slots = resources.shape
+        booked = resources >= 0
+        if not booked.any():
+            return 0
+        _, d, s = np.nonzero(booked)
+        keys = (resources[booked].astype(np.int64) * num_days + d) * num_slots + s
+        return int(len(keys) - len(np.unique(keys)))
     
     def check_faculty_conflicts(self, timetable):
-        conflicts = 0
-        faculty_schedule = {}
-        
-        for batch_id, schedule in timetable.items():
-            for day, time_slots in schedule.items():
-                for time_slot, slot_data in time_slots.items():
-                    if slot_data and slot_data['faculty_id']:
-                        faculty_id = slot_data['faculty_id']
-                        key = (faculty_id, day, time_slot)
-                        
-                        if key in faculty_schedule:
-                            conflicts += 1
-                        else:
-                            faculty_schedule[key] = True
-        return conflicts
+        return self.count_clashes(timetable[..., FACULTY])
     
     def check_classroom_conflicts(self, timetable):
-        conflicts = 0
-        classroom_schedule = {}
-        
-        for batch_id, schedule in timetable.items():
-            for day, time_slots in schedule.items():
-                for time_slot, slot_data in time_slots.items():
-                    if slot_data and slot_data['classroom_id']:
-                        classroom_id = slot_data['classroom_id']
-                        key = (classroom_id, day, time_slot)
-                        
-                        if key in classroom_schedule:
-                            conflicts += 1
-                        else:
-                            classroom_schedule[key] = True
-        return conflicts
+        return self.count_clashes(timetable[..., CLASSROOM])
+    
+    def faculty_hours(self, timetable):
+        """Number of classes assigned to each faculty member"""
+        faculty = timetable[..., FACULTY]
+        return np.bincount(faculty[faculty >= 0], minlength=self.problem.num_faculty)
     
     def check_workload_violations(self, timetable):
-        violations = 0
-        faculty_hours = {f['id']: 0 for f in self.faculty}
-        
-        for batch_id, schedule in timetable.items():
-            for day, time_slots in schedule.items():
-                for time_slot, slot_data in time_slots.items():
-                    if slot_data and slot_data['faculty_id']:
-                        faculty_id = slot_data['faculty_id']
-                        faculty_hours[faculty_id] += 1
-        
-        for faculty_id, hours in faculty_hours.items():
-            faculty = self.faculty_map.get(faculty_id)
-            if faculty and hours > faculty.get('max_hours_per_day', self.max_hours_per_faculty) * len(self.days):
-                violations += 1
-                
-        return violations
+        return int(np.count_nonzero(self.faculty_hours(timetable) > self.workload_limits))
     
     def check_time_preferences(self, timetable):
         violations = 0
@@ -312,149 +475,218 @@ class GeneticTimetable:
     
     def check_consecutive_classes(self, timetable):
         violations = 0
-        for batch_id, schedule in timetable.items():
-            for day, time_slots in schedule.items():
-                consecutive_count = 0
-                for time_slot in self.time_slots:
-                    if time_slot == self.lunch_break:
-                        consecutive_count = 0
-                        continue
-                    
-                    if schedule[day].get(time_slot):
-                        consecutive_count += 1
-                        if consecutive_count > 3:  # More than 3 consecutive classes
-                            violations += 1
-                    else:
-                        consecutive_count = 0
+        occupied = timetable[..., SUBJECT] >= 0
+        consecutive_count = np.zeros(occupied.shape[:2], dtype=np.int64)
+        for slot in range(self.problem.num_slots):
+            if slot == self.problem.lunch_index:
+                consecutive_count[:] = 0
+                continue
+            
+            consecutive_count = np.where(occupied[:, :, slot], consecutive_count + 1, 0)
+            # More than 3 consecutive classes
+            violations += int(np.count_nonzero(consecutive_count > 3))
         return violations
     
     def check_lunch_breaks(self, timetable):
-        violations = 0
-        for batch_id, schedule in timetable.items():
-            for day, time_slots in schedule.items():
-                if time_slots.get(self.lunch_break):  # If there's a class during lunch break
-                    violations += 1
-        return violations
+        if self.problem.lunch_index is None:
+            return 0
+        # Count classes scheduled during the lunch break
+        return int(np.count_nonzero(timetable[:, :, self.problem.lunch_index, SUBJECT] >= 0))
     
     def crossover(self, parent1, parent2):
         """Enhanced crossover that creates two children"""
-        # Create two children
-        child1 = deepcopy(parent1)
-        child2 = deepcopy(parent2)
-
-        # Single-point crossover for both children
+        # Single-point crossover over the day axis for both children; whole
+        # cells are inherited, so locked fixed slots survive unchanged
         crossover_point = random.randint(1, len(self.days) - 1)
-        crossover_days = self.days[crossover_point:]
 
         # First child: parent1 with some days from parent2
-        for batch_id in parent2:
-            if batch_id not in child1:
-                child1[batch_id] = {}
-            for day in crossover_days:
-                if day in parent2[batch_id]:
-                    child1[batch_id][day] = deepcopy(parent2[batch_id][day])
+        child1 = parent1.copy()
+        child1[:, crossover_point:] = parent2[:, crossover_point:]
 
         # Second child: parent2 with some days from parent1
-        for batch_id in parent1:
-            if batch_id not in child2:
-                child2[batch_id] = {}
-            for day in crossover_days:
-                if day in parent1[batch_id]:
-                    child2[batch_id][day] = deepcopy(parent1[batch_id][day])
+        child2 = parent2.copy()
+        child2[:, crossover_point:] = parent1[:, crossover_point:]
                     
         return child1, child2
     
+    def tournament_selection(self, fitness_scores, count, tournament_size=3):
+        """Indices of count tournament winners, each the fittest of tournament_size random individuals.
+        
+        All tournaments are drawn at once as a (count, tournament_size) array.
+        Contestants are distinct: the few tournaments drawing an individual
+        twice are redrawn until none does.
+        """
+        fitness_scores = np.asarray(fitness_scores)
+        size = len(fitness_scores)
+        contestants = self.rng.integers(size, size=(count, tournament_size))
+        redraw = np.arange(count) if tournament_size <= size else np.empty(0, dtype=np.int64)
+        while len(redraw):
+            ordered = np.sort(contestants[redraw], axis=1)
+            redraw = redraw[(ordered[:, 1:] == ordered[:, :-1]).any(axis=1)]
+            contestants[redraw] = self.rng.integers(size, size=(len(redraw), tournament_size))
+        return contestants[np.arange(count), fitness_scores[contestants].argmax(axis=1)]
+    
+    def elite_indices(self, fitness_scores, count):
+        """Indices of the count fittest individuals, in no particular order"""
+        fitness_scores = np.asarray(fitness_scores)
+        if count <= 0:
+            return np.empty(0, dtype=np.int64)
+        if count >= len(fitness_scores):
+            return np.arange(len(fitness_scores))
+        return np.argpartition(fitness_scores, len(fitness_scores) - count)[-count:]
+    
+    def crossover_pairs(self, population, parents, crossover_rate=1.0):
+        """Two children per (parent1, parent2) index row of parents, crossed like crossover().
+        
+        Each pair is crossed with probability crossover_rate at its own day;
+        uncrossed pairs are copied.
+        """
+        parents = np.asarray(parents).reshape(-1, 2)
+        num_days = len(self.days)
+        points = self.rng.integers(1, num_days, size=len(parents))
+        points[self.rng.random(len(parents)) >= crossover_rate] = num_days
+        points = np.repeat(points, 2)
+        # Children 2i and 2i + 1 are copies of parents[i], then take the days
+        # from points[i] on from their other parent
+        children = population[parents.ravel()]
+        others = parents[:, ::-1].ravel()
+        for day in range(1, num_days):
+            crossed = np.flatnonzero(points <= day)
+            children[crossed, :, day] = population[others[crossed], :, day]
+        return children
+    
+    def mutate_population(self, population, mutation_rate):
+        """Mutate each individual with probability mutation_rate, in place"""
+        for i in np.flatnonzero(self.rng.random(len(population)) < mutation_rate).tolist():
+            population[i] = self.mutate(population[i])
+        return population
+    
+    def breed(self, population, parents, crossover_rate=1.0, mutation_rate=0.0):
+        """Children of (parent1, parent2) index pairs: batched crossover, then mutation"""
+        population = np.asarray(population)
+        with self.profiler.phase('crossover'):
+            children = self.crossover_pairs(population, parents, crossover_rate)
+        with self.profiler.phase('mutation'):
+            return self.mutate_population(children, mutation_rate)
+    
     def mutate(self, timetable):
-        mutated = deepcopy(timetable)
-        
-        # Don't mutate theory subjects to maintain synchronization
-        # Only mutate lab subjects
-        lab_slots = []
-        for batch_id in mutated:
-            for day in self.days:
-                for time_slot in self.time_slots:
-                    if time_slot == self.lunch_break:
-                        continue
-                    slot_data = mutated[batch_id][day][time_slot]
-                    if slot_data:
-                        subject = self.subject_map.get(slot_data['subject_id'])
-                        if subject and subject['subject_type'] == 'LAB':
-                            lab_slots.append((batch_id, day, time_slot))
-        
-        if not lab_slots:
-            return mutated
-            
-        batch_id, day, time_slot = random.choice(lab_slots)
+        mutated = timetable.copy()
+        move = self.mutation_move(mutated)
+        if move:
+            for batch_idx, day, time_slot, gene in move:
+                mutated[batch_idx, day, time_slot] = gene
+            if self.room_assigner is not None:
+                for day, time_slot in {(day, time_slot) for _, day, time_slot, _ in move}:
+                    self.room_assigner.assign_cell(mutated, day, time_slot)
+        return mutated
+    
+    def mutation_move(self, timetable):
+        """Pick the mutation as a list of (batch, day, slot, gene) changes without applying it"""
+        gene = self.random_gene(timetable)
+        if gene is None:
+            return None
+        theory, owner, day, time_slot = gene
+        if theory:
+            return self.theory_move(timetable, owner, day, time_slot)
+        batch_idx = owner
         
         if random.random() < 0.5:  # 50% chance to change lab subject
-            batch = self.batch_map[batch_id]
+            batch = self.batches[batch_idx]
             lab_subjects = [s for s in self.lab_subjects if s.get('department_id') == batch.get('department_id')]
             if lab_subjects:
                 new_subject = random.choice(lab_subjects)
                 faculty_for_subject = self.get_faculty_for_subject(new_subject['id'])
                 if faculty_for_subject:
                     classroom = self.get_available_classroom('LAB')
-                    mutated[batch_id][day][time_slot] = {
-                        'subject_id': new_subject['id'],
-                        'faculty_id': faculty_for_subject['id'],
-                        'classroom_id': classroom['id'] if classroom else None
-                    }
+                    return [(batch_idx, day, time_slot, self.encode_slot(new_subject, faculty_for_subject, classroom))]
+            return None
         else:  # 50% chance to clear the slot
-            mutated[batch_id][day][time_slot] = None
-            
-        return mutated
+            return [(batch_idx, day, time_slot, (EMPTY, EMPTY, EMPTY))]
+    
+    def random_gene(self, timetable):
+        """A uniformly drawn mutable gene as (is_theory, batch or department, day, slot), or None if there is none.
+
+        Lab genes belong to one batch; theory genes are only mutated when shared
+        by the department, so moving one keeps its batches synchronized.
+        """
+        subjects = timetable[..., SUBJECT]
+        lab_genes = np.flatnonzero(self.holds_lab[subjects] & self.mutable_cells)
+        theory_genes = self.theory_genes(timetable) if self.shared_theory_genes else lab_genes[:0]
+        if not len(lab_genes) + len(theory_genes):
+            return None
+        
+        pick = random.randrange(len(lab_genes) + len(theory_genes))
+        theory = pick >= len(lab_genes)
+        owner, cell = divmod(int(theory_genes[pick - len(lab_genes)] if theory else lab_genes[pick]),
+                             self.problem.num_days * self.problem.num_slots)
+        return (theory, owner) + divmod(cell, self.problem.num_slots)
+    
+    def theory_move(self, timetable, department, day, time_slot):
+        """Move a department's theory gene to a random other (day, slot), swapping in what its batches had there"""
+        targets = self.theory_targets[department]
+        # Draw among the targets other than the gene's own cell
+        own = int(self.theory_target_index[department, day, time_slot])
+        if len(targets) - (own >= 0) < 1:
+            return None
+        pick = random.randrange(len(targets) - (own >= 0))
+        if 0 <= own <= pick:
+            pick += 1
+        other_day, other_slot = targets[pick].tolist()
+        return self.department_swap(timetable, self.problem.department_batches[department], (day, time_slot),
+                                    (other_day, other_slot))
     
     def run(self, population_size=100, generations=500, mutation_rate=0.1):
-        population = self.initialize_population(population_size)
+        self.profiler.reset()
+        with self.profiler.phase('initialization'):
+            population = self.initialize_population(population_size)
+        self.fitness_cache.reset_stats()
         best_fitness = -1
         best_timetable = None
         
         for generation in range(generations):
             # Evaluate fitness
-            fitness_scores = [self.calculate_fitness(timetable) for timetable in population]
+            with self.profiler.phase('evaluation'):
+                fitness_scores = self.evaluate_population(population)
             
             # Find best timetable
             max_fitness = max(fitness_scores)
             if max_fitness > best_fitness:
                 best_fitness = max_fitness
-                best_timetable = population[fitness_scores.index(max_fitness)]
-                
-            # Select parents (tournament selection)
-            selected_parents = []
-            for _ in range(population_size):
-                tournament_size = 3
-                tournament = random.sample(list(zip(population, fitness_scores)), tournament_size)
-                winner = max(tournament, key=lambda x: x[1])[0]
-                selected_parents.append(winner)
+                best_timetable = population[fitness_scores.index(max_fitness)].copy()
                 
+            # Select parents (tournament selection), paired in draw order
+            with self.profiler.phase('selection'):
+                parents = self.tournament_selection(fitness_scores, population_size + population_size % 2)
+            
             # Create new generation
-            new_population = []
-            for i in range(0, population_size, 2):
-                parent1 = selected_parents[i]
-                parent2 = selected_parents[(i + 1) % population_size]
-                
-                # Crossover
-                child1, child2 = self.crossover(parent1, parent2)
-                
-                # Mutation
-                if random.random() < mutation_rate:
-                    child1 = self.mutate(child1)
-                if random.random() < mutation_rate:
-                    child2 = self.mutate(child2)
-                    
-                new_population.extend([child1, child2])
-                
-            population = new_population[:population_size]
+            population = self.breed(population, parents.reshape(-1, 2), 1.0, mutation_rate)[:population_size]
             
             # Print progress
             if generation % 50 == 0:
                 print(f"Generation {generation}: Best Fitness = {best_fitness}")
-                
+        
+        print(f"Fitness cache: {self.fitness_cache.stats()}")
         return best_timetable, best_fitness
 
 # Enhanced version with same class name but different functionality
 class EnhancedGeneticTimetable(GeneticTimetable):
-    def __init__(self, subjects, faculty, classrooms, batches, constraints):
+    FITNESS_WEIGHTS = [
+        ('faculty_conflicts', 50),
+        ('classroom_conflicts', 50),
+        ('workload_violations', 30),
+        ('time_preferences', 20),
+        ('consecutive_classes', 25),
+        ('lunch_breaks', 15),
+        
+        # New constraint violations
+        ('subject_distribution', 40),
+        ('max_classes_per_day', 35),
+        ('fixed_slots', 60),
+        ('faculty_availability', 25),
+        ('theory_synchronization', 100),  # High penalty for sync violations
+    ]
+    
+    def __init__(self, subjects, faculty, classrooms, batches, constraints, eligibility=None):
         # Convert sqlite3.Row objects to dictionaries if needed
         if subjects and hasattr(subjects[0], '_fields'):  # If it's sqlite3.Row
             subjects = [dict(subj) for subj in subjects]
@@ -465,7 +697,7 @@ class EnhancedGeneticTimetable(GeneticTimetable):
         if batches and hasattr(batches[0], '_fields'):
             batches = [dict(batch) for batch in batches]
             
-        super().__init__(subjects, faculty, classrooms, batches, constraints)
+        super().__init__(subjects, faculty, classrooms, batches, constraints, eligibility)
         self.population_size = 200
         self.generations = 1000
         self.mutation_rate = 0.15
@@ -476,7 +708,79 @@ class EnhancedGeneticTimetable(GeneticTimetable):
         self.max_classes_per_day_per_batch = constraints.get('max_classes_per_day_per_batch', 6)
         self.fixed_slots = constraints.get('fixed_slots', {})
         self.faculty_leaves = self.load_faculty_leaves()
+        self.compiled_fixed_slots = self.problem.compile_fixed_slots(self.fixed_slots)
+        self.lock_fixed_slots(self.compiled_fixed_slots)
+        if self.room_assigner is not None:
+            self.room_assigner.pin(self.compiled_fixed_slots)
+        
+        # Maximum hours per faculty member once average leaves are accounted for
+        self.availability_limits = []
+        for f in self.faculty:
+            avg_leaves = self.faculty_leaves.get(f['id'], 0)
+            available_days = len(self.days) * (20 - avg_leaves) / 30  # Approximate available days
+            self.availability_limits.append(f.get('max_hours_per_day', 8) * available_days)
+        
+        self.evaluator = PopulationEvaluator(self.problem, self.fitness_weights, self.workload_limits,
+                                             max_classes_per_day=self.max_classes_per_day_per_batch,
+                                             fixed_slots=self.compiled_fixed_slots,
+                                             availability_limits=self.availability_limits,
+                                             profiler=self.profiler)
+        
+        # Termination policies (a perfect score always stops the run)
+        self.time_limit = constraints.get('time_limit')
+        self.stagnation_generations = constraints.get('stagnation_generations')
+        self.target_fitness = constraints.get('target_fitness', self.evaluator.base_score)
+        self.stop_on_hard_constraints = constraints.get('stop_on_hard_constraints', False)
+        # Set by stop() from another thread to end a run early and keep its best
+        self.stop_requested = False
+        
+        # Checkpointing, resuming and warm starts from a saved timetable
+        self.checkpoint_path = constraints.get('checkpoint_path')
+        self.checkpoint_interval = constraints.get('checkpoint_interval', 50)
+        self.resume = constraints.get('resume', False)
+        warm_start_id = constraints.get('warm_start_timetable_id')
+        self.seed_timetables = []
+        if warm_start_id:
+            seed = self.load_timetable(warm_start_id)
+            if self.shared_theory_genes:
+                self.synchronize_theory(seed)
+            self.seed_timetables.append(self.place_fixed_slots(seed))
         
+    def load_timetable(self, timetable_id):
+        """Encode a saved timetable's slots; classes outside this problem are left out"""
+        conn = sqlite3.connect('timetable.db')
+        cursor = conn.cursor()
+        
+        cursor.execute('''SELECT batch_id, day, time_slot, subject_id, faculty_id, classroom_id
+                          FROM timetable_slots WHERE timetable_id = ?''', (timetable_id,))
+        timetable = {}
+        for batch_id, day, time_slot, subject_id, faculty_id, classroom_id in cursor.fetchall():
+            timetable.setdefault(batch_id, {}).setdefault(day, {})[time_slot] = {
+                'subject_id': subject_id,
+                'faculty_id': faculty_id,
+                'classroom_id': classroom_id
+            }
+        conn.close()
+        
+        encoded = self.problem.encode(timetable)
+        encoded[encoded[..., SUBJECT] == UNKNOWN] = EMPTY
+        encoded[encoded == UNKNOWN] = EMPTY
+        return encoded
+    
+    def initial_population(self, size):
+        """Random population, or one half-seeded with saved timetables and their mutated neighbours"""
+        if not self.seed_timetables:
+            return self.initialize_population(size)
+        
+        seeded = []
+        for i in range(max(1, size // 2)):
+            neighbour = self.seed_timetables[i % len(self.seed_timetables)].copy()
+            # The saved timetables themselves come first, then ever more distant neighbours
+            for _ in range(i // len(self.seed_timetables) and random.randint(1, 5)):
+                neighbour = self.mutate(neighbour)
+            seeded.append(neighbour)
+        return np.concatenate([np.stack(seeded), self.initialize_population(size - len(seeded))])
+    
     def load_faculty_leaves(self):
         """Load faculty leave information from database"""
         conn = sqlite3.connect('timetable.db')
@@ -492,182 +796,233 @@ class EnhancedGeneticTimetable(GeneticTimetable):
         conn.close()
         return faculty_leaves
     
-    def calculate_fitness(self, timetable):
-        fitness_score = 1000  # Start with perfect score
-        
-        # Weight different constraint violations
-        faculty_conflicts = self.check_faculty_conflicts(timetable) * 50
-        classroom_conflicts = self.check_classroom_conflicts(timetable) * 50
-        workload_violations = self.check_workload_violations(timetable) * 30
-        time_preference_violations = self.check_time_preferences(timetable) * 20
-        consecutive_class_violations = self.check_consecutive_classes(timetable) * 25
-        lunch_break_violations = self.check_lunch_breaks(timetable) * 15
-        
-        # New constraint violations
-        subject_distribution_violations = self.check_subject_distribution(timetable) * 40
-        max_classes_violations = self.check_max_classes_per_day(timetable) * 35
-        fixed_slots_violations = self.check_fixed_slots(timetable) * 60
-        faculty_availability_violations = self.check_faculty_availability(timetable) * 25
-        theory_sync_violations = self.check_theory_synchronization(timetable) * 100  # High penalty for sync violations
-        
-        total_violations = (faculty_conflicts + classroom_conflicts + 
-                          workload_violations + time_preference_violations +
-                          consecutive_class_violations + lunch_break_violations +
-                          subject_distribution_violations + max_classes_violations +
-                          fixed_slots_violations + faculty_availability_violations +
-                          theory_sync_violations)
-        
-        fitness_score = max(0, fitness_score - total_violations)
-        
-        return fitness_score
-    
     def check_subject_distribution(self, timetable):
         """Check if subjects have correct number of classes per week"""
-        violations = 0
+        subjects = timetable[..., SUBJECT]
+        num_subjects = self.problem.num_subjects
         
-        for batch_id, schedule in timetable.items():
-            subject_count = {}
-            
-            # Count classes for each subject
-            for day, time_slots in schedule.items():
-                for time_slot, slot_data in time_slots.items():
-                    if slot_data:
-                        subject_id = slot_data['subject_id']
-                        subject_count[subject_id] = subject_count.get(subject_id, 0) + 1
-            
-            # Check against required classes per week
-            for subject_id, actual_count in subject_count.items():
-                subject = self.subject_map.get(subject_id)
-                if subject:
-                    required_count = subject.get('classes_per_week', 3)
-                    if actual_count != required_count:
-                        violations += abs(actual_count - required_count)
+        # Count classes for each subject of each batch
+        b, _, _ = np.nonzero(subjects >= 0)
+        subject_count = np.bincount(b * num_subjects + subjects[subjects >= 0],
+                                    minlength=self.problem.num_batches * num_subjects)
+        subject_count = subject_count.reshape(self.problem.num_batches, num_subjects)
         
-        return violations
+        # Check scheduled subjects against required classes per week
+        deviation = np.abs(subject_count - self.problem.subject_classes_per_week)
+        return int(deviation[subject_count > 0].sum())
     
     def check_max_classes_per_day(self, timetable):
         """Check maximum classes per day per batch constraint"""
-        violations = 0
-        
-        for batch_id, schedule in timetable.items():
-            for day, time_slots in schedule.items():
-                class_count = sum(1 for time_slot, slot_data in time_slots.items() 
-                                if slot_data and time_slot != self.lunch_break)
-                
-                if class_count > self.max_classes_per_day_per_batch:
-                    violations += (class_count - self.max_classes_per_day_per_batch)
-        
-        return violations
+        occupied = (timetable[..., SUBJECT] >= 0) & self.problem.teaching_slots
+        class_count = occupied.sum(axis=2)
+        excess = class_count - self.max_classes_per_day_per_batch
+        return int(excess[excess > 0].sum())
     
     def check_fixed_slots(self, timetable):
         """Check if fixed slots are respected"""
         violations = 0
         
-        for fixed_slot in self.fixed_slots:
-            batch_id = fixed_slot['batch_id']
-            day = fixed_slot['day']
-            time_slot = fixed_slot['time_slot']
-            required_subject_id = fixed_slot['subject_id']
-            required_faculty_id = fixed_slot.get('faculty_id')
-            required_classroom_id = fixed_slot.get('classroom_id')
-            
-            if batch_id in timetable and day in timetable[batch_id]:
-                actual_slot = timetable[batch_id][day].get(time_slot)
-                
-                if not actual_slot:
-                    violations += 1  # Slot is empty but should be fixed
-                else:
-                    if actual_slot['subject_id'] != required_subject_id:
-                        violations += 1
-                    if required_faculty_id and actual_slot['faculty_id'] != required_faculty_id:
-                        violations += 1
-                    if required_classroom_id and actual_slot['classroom_id'] != required_classroom_id:
-                        violations += 1
+        for batch_idx, day, time_slot, subject, faculty, classroom in self.compiled_fixed_slots:
+            if time_slot is None or timetable[batch_idx, day, time_slot, SUBJECT] == EMPTY:
+                violations += 1  # Slot is empty but should be fixed
+            else:
+                actual_slot = timetable[batch_idx, day, time_slot]
+                if actual_slot[SUBJECT] != subject:
+                    violations += 1
+                if faculty is not None and actual_slot[FACULTY] != faculty:
+                    violations += 1
+                if classroom is not None and actual_slot[CLASSROOM] != classroom:
+                    violations += 1
         
         return violations
     
     def check_faculty_availability(self, timetable):
         """Check faculty availability considering leaves"""
         violations = 0
-        faculty_workload = {f['id']: 0 for f in self.faculty}
-        
-        # Count faculty workload
-        for batch_id, schedule in timetable.items():
-            for day, time_slots in schedule.items():
-                for time_slot, slot_data in time_slots.items():
-                    if slot_data and slot_data['faculty_id']:
-                        faculty_id = slot_data['faculty_id']
-                        faculty_workload[faculty_id] += 1
-        
-        # Check against availability considering leaves
-        for faculty_id, workload in faculty_workload.items():
-            avg_leaves = self.faculty_leaves.get(faculty_id, 0)
-            available_days = len(self.days) * (20 - avg_leaves) / 30  # Approximate available days
-            
-            max_allowed_hours = self.faculty_map[faculty_id].get('max_hours_per_day', 8) * available_days
-            
+        
+        # Check workload against availability considering leaves
+        for workload, max_allowed_hours in zip(self.faculty_hours(timetable).tolist(), self.availability_limits):
             if workload > max_allowed_hours:
                 violations += (workload - max_allowed_hours)
         
         return violations
     
-    def run(self):
-        """Run the enhanced genetic algorithm"""
-        population = self.initialize_population(self.population_size)
+    def termination(self):
+        """Termination policy for one run, started now"""
+        return Termination(self.generations, time_limit=self.time_limit,
+                           stagnation_generations=self.stagnation_generations,
+                           target_fitness=self.target_fitness,
+                           stop_on_hard_constraints=self.stop_on_hard_constraints)
+    
+    def run(self, callback=None):
+        """Run the enhanced genetic algorithm.
+        
+        callback, when given, receives the progress dict of every generation
+        (see iter_run) and may return True to stop the run like stop().
+        Returns the best timetable, its fitness and run statistics holding the
+        stop reason and the number of generations evaluated.
+        """
+        runner = self.iter_run()
+        while True:
+            try:
+                progress = next(runner)
+            except StopIteration as finished:
+                return finished.value
+            if callback is not None and callback(progress):
+                self.stop()
+    
+    def stop(self):
+        """Ask a running run to finish after the current generation, keeping the best so far"""
+        self.stop_requested = True
+    
+    def generation_progress(self, generation, population, fitness_scores, best_timetable, best_fitness,
+                            violations, termination):
+        """Statistics of one generation as yielded by iter_run"""
+        return {
+            'generation': generation,
+            'best_fitness': float(best_fitness),
+            'mean_fitness': float(np.mean(fitness_scores)),
+            # Mean share of cells in which an individual differs from the best timetable
+            'diversity': float((population != best_timetable).any(axis=-1).mean()),
+            'violations': violations,
+            'elapsed': round(termination.elapsed(), 3)
+        }
+    
+    def iter_run(self):
+        """Generator form of run(): yields a progress dict after every generation.
+        
+        Each holds the generation, best and mean fitness, diversity, the best
+        timetable's violations per constraint and the elapsed seconds. The
+        generator's return value is run()'s (timetable, fitness, run_stats).
+        """
         best_fitness = -1
         best_timetable = None
+        violations = None
+        hard_satisfied = False
+        termination = self.termination()
+        generation, stop_reason = -1, GENERATIONS
+        self.fitness_cache.reset_stats()
+        self.profiler.reset()
         
-        for generation in range(self.generations):
+        checkpoint = self.load_resumable_checkpoint() if self.resume else None
+        if checkpoint:
+            # Re-lock fixed slots before the random streams are restored, so the resumed run
+            # draws exactly what the interrupted one would have
+            population = checkpoint['population']
+            for timetable in population:
+                self.place_fixed_slots(timetable)
+            best_timetable = checkpoint['best_timetable']
+            best_fitness = checkpoint['best_fitness']
+            start = checkpoint['generation']
+            restore_random_state(checkpoint, self.rng)
+            termination.best_fitness, termination.last_improvement = best_fitness, start
+            print(f"Resuming from generation {start}: Best Fitness = {best_fitness}")
+        else:
+            with self.profiler.phase('initialization'):
+                population = self.initial_population(self.population_size)
+            start = 0
+        
+        for generation in range(start, self.generations):
             # Evaluate fitness
-            fitness_scores = [self.calculate_fitness(timetable) for timetable in population]
+            with self.profiler.phase('evaluation'):
+                fitness_scores = self.evaluate_population(population)
+            self.memetic_step(population, fitness_scores)
             
             # Find best timetable
             max_fitness = max(fitness_scores)
             if max_fitness > best_fitness:
                 best_fitness = max_fitness
-                best_timetable = population[fitness_scores.index(max_fitness)]
-                
-            # Elitism: keep best individuals
-            elite_size = int(self.population_size * self.elitism_rate)
-            elite_indices = np.argsort(fitness_scores)[-elite_size:]
-            new_population = [population[i] for i in elite_indices]
+                best_timetable = population[fitness_scores.index(max_fitness)].copy()
+                violations = None
+            if violations is None:
+                violations = {check: int(count[0]) for check, count in self.evaluator.violations(best_timetable).items()}
+                hard_satisfied = all(violations.get(check, 0) == 0 for check in self.HARD_CONSTRAINTS)
             
-            # Create new generation
-            while len(new_population) < self.population_size:
-                # Tournament selection
-                parent1 = self.tournament_selection(population, fitness_scores)
-                parent2 = self.tournament_selection(population, fitness_scores)
-                
-                # Crossover
-                if random.random() < self.crossover_rate:
-                    child1, child2 = self.crossover(parent1, parent2)
-                else:
-                    child1, child2 = parent1, parent2
-                
-                # Mutation
-                if random.random() < self.mutation_rate:
-                    child1 = self.mutate(child1)
-                if random.random() < self.mutation_rate:
-                    child2 = self.mutate(child2)
-                
-                new_population.extend([child1, child2])
+            yield self.generation_progress(generation, population, fitness_scores, best_timetable, best_fitness,
+                                           violations, termination)
             
-            population = new_population[:self.population_size]
+            stop_reason = termination.check(generation, best_fitness, hard_satisfied, self.stop_requested)
+            if stop_reason:
+                break
+            
+            population = self.next_generation(population, fitness_scores)
+            
+            if self.checkpoint_path and (generation + 1) % self.checkpoint_interval == 0:
+                with self.profiler.phase('checkpoint'):
+                    save_checkpoint(self.checkpoint_path, self.problem, population, best_timetable, best_fitness,
+                                    generation + 1, rng=self.rng, constraints=self.constraints)
             
             # Print progress
             if generation % 50 == 0:
                 print(f"Generation {generation}: Best Fitness = {best_fitness}")
-                
-        return best_timetable, best_fitness
-
-    def tournament_selection(self, population, fitness_scores, tournament_size=3):
-        """Tournament selection"""
-        tournament_indices = random.sample(range(len(population)), tournament_size)
-        tournament = [(population[i], fitness_scores[i]) for i in tournament_indices]
-        return max(tournament, key=lambda x: x[1])[0]
-
-    def tournament_selection(self, population, fitness_scores, tournament_size=3):
-        """Tournament selection"""
-        tournament_indices = random.sample(range(len(population)), tournament_size)
-        tournament = [(population[i], fitness_scores[i]) for i in tournament_indices]
-        return max(tournament, key=lambda x: x[1])[0]
\ No newline at end of file
+        
+        if self.checkpoint_path:
+            save_checkpoint(self.checkpoint_path, self.problem, population, best_timetable, best_fitness,
+                            generation + 1, finished=True, rng=self.rng, constraints=self.constraints)
+        self.stop_requested = False
+        
+        run_stats = termination.stats(generation, stop_reason)
+        run_stats['fitness_cache'] = self.fitness_cache.stats()
+        run_stats['resumed_from'] = start
+        print(f"Stopped after {generation + 1} generations ({stop_reason}): Best Fitness = {best_fitness}")
+        print(f"Fitness cache: {run_stats['fitness_cache']}")
+        best_timetable, best_fitness = self.polish(best_timetable, best_fitness, run_stats)
+        if self.profiler.enabled:
+            run_stats['profile'] = self.profile_report()
+        return best_timetable, best_fitness, run_stats
+    
+    def load_resumable_checkpoint(self):
+        """The unfinished checkpoint of an interrupted run of this problem and constraints, if there is one"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            checkpoint = load_checkpoint(self.checkpoint_path, self.problem, self.constraints)
+        except CHECKPOINT_ERRORS as e:
+            print(f"Ignoring checkpoint: {e}")
+            return None
+        if checkpoint['finished'] or len(checkpoint['population']) != self.population_size:
+            return None
+        return checkpoint
+    
+    def polish(self, timetable, fitness, run_stats):
+        """Run the enabled post-optimisation stages on a run's best timetable"""
+        if timetable is None:
+            return timetable, fitness
+        if self.faculty_balancing:
+            timetable, fitness = self.balance_faculty(timetable, fitness, run_stats)
+        if self.local_search_time:
+            with self.profiler.phase('local_search'):
+                timetable, fitness, run_stats['local_search'] = self.repair(timetable, self.local_search_time)
+            print(f"Local search: {run_stats['local_search']}: Best Fitness = {fitness}")
+        return timetable, fitness
+    
+    def balance_faculty(self, timetable, fitness, run_stats):
+        """Re-staff a timetable by min-cost flow, keeping the result unless it scores worse"""
+        with self.profiler.phase('faculty_assignment'):
+            balanced, stats = FacultyAssigner(self).assign(timetable)
+            balanced_fitness = self.calculate_fitness(balanced)
+        stats['applied'] = bool(balanced_fitness >= fitness)
+        run_stats['faculty_assignment'] = stats
+        if stats['applied']:
+            timetable, fitness = balanced, balanced_fitness
+        print(f"Faculty assignment: {stats}: Best Fitness = {fitness}")
+        return timetable, fitness
+    
+    def run_islands(self, islands, migration_interval=25, migration_size=2, topology='ring', seed=None,
+                    callback=None):
+        """Run the algorithm as an island model across worker processes"""
+        return run_islands(self, islands, migration_interval, migration_size, topology, seed, callback)
+    
+    def next_generation(self, population, fitness_scores):
+        """Breed the next population: elites plus tournament/crossover/mutation children"""
+        population = np.asarray(population)
+        population_size = len(population)
+        
+        # Elitism: keep best individuals; tournaments pick parent pairs for the rest
+        with self.profiler.phase('selection'):
+            elites = self.elite_indices(fitness_scores, int(population_size * self.elitism_rate))
+            pairs = -(-(population_size - len(elites)) // 2)
+            parents = self.tournament_selection(fitness_scores, 2 * pairs).reshape(pairs, 2)
+        
+        children = self.breed(population, parents, self.crossover_rate, self.mutation_rate)
+        return np.concatenate([population[elites], children])[:population_size]
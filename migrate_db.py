@@ -14,6 +14,50 @@ def migrate_database():
             cursor.execute('ALTER TABLE student_attendance ADD COLUMN attendance_time TIME')
             print("Added attendance_time column to student_attendance table")
         
+        # Record why and when a timetable generation run stopped
+        cursor.execute("PRAGMA table_info(timetables)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'stop_reason' not in columns:
+            cursor.execute('ALTER TABLE timetables ADD COLUMN stop_reason TEXT')
+            print("Added stop_reason column to timetables table")
+        
+        if 'generations_run' not in columns:
+            cursor.execute('ALTER TABLE timetables ADD COLUMN generations_run INTEGER')
+            print("Added generations_run column to timetables table")
+        
+        # Per-phase and per-constraint timings of profiled generation runs (JSON)
+        if 'profile' not in columns:
+            cursor.execute('ALTER TABLE timetables ADD COLUMN profile TEXT')
+            print("Added profile column to timetables table")
+        
+        # Queue of background timetable generation jobs
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='generation_jobs'")
+        if not cursor.fetchone():
+            cursor.execute('''
+                CREATE TABLE generation_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    submitted_by INTEGER,
+                    progress TEXT,
+                    timetable_id INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    cancel_requested INTEGER DEFAULT 0,
+                    stop_requested INTEGER DEFAULT 0,
+                    worker_pid INTEGER,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    started_at DATETIME,
+                    finished_at DATETIME,
+                    heartbeat_at DATETIME,
+                    FOREIGN KEY (submitted_by) REFERENCES users (id),
+                    FOREIGN KEY (timetable_id) REFERENCES timetables (id)
+                )
+            ''')
+            print("Created generation_jobs table")
+        
         # Check if events table exists
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='events'")
         if not cursor.fetchone():
@@ -1,13 +1,28 @@
 # routes/timetable.py - Enhanced version with your original structure
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context
 from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.eligibility import EligibilityIndex
+from scheduler.engines import ENGINES, ENGINE_LABELS
+from scheduler.reschedule import reschedule
+from config import Config
+from utils.generation import SCHEDULE_DAYS, SCHEDULE_TIME_SLOTS, LUNCH_BREAK, load_generation_data, save_changed_slots
+from utils.jobs import (FINISHED, COMPLETED, ALL, JobLimitError, submit_job, get_job, request_cancel, request_stop,
+                        ensure_dispatcher, job_events, in_job_worker)
 import sqlite3
+import time
 from datetime import datetime
 import json
 from functools import wraps
 
 timetable_bp = Blueprint('timetable', __name__)
 
+@timetable_bp.record_once
+def start_job_dispatcher(state):
+    # Requeues jobs left running by a previous server process and starts queued ones;
+    # job workers import the app as well but only run their job
+    if not in_job_worker():
+        ensure_dispatcher()
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -39,87 +54,297 @@ def generate_timetable():
         semester = request.form['semester']
         timetable_name = request.form['name']
         max_classes_per_day = request.form.get('max_classes_per_day', 6)
+        engine = request.form.get('engine') or Config.GA_ENGINE
+        islands = int(request.form.get('islands') or Config.GA_ISLANDS)
+        time_limit = float(request.form.get('time_limit') or Config.GA_TIME_LIMIT)
+        if engine not in ENGINES:
+            conn.close()
+            flash(f'Unknown engine: {engine}', 'error')
+            return redirect(url_for('timetable.generate_timetable'))
         
-        # Fetch all required data for genetic algorithm
-        cursor.execute('SELECT * FROM subjects WHERE department_id = ?', (department_id,))
-        subjects_data = [dict(row) for row in cursor.fetchall()]
-        
-        cursor.execute('SELECT * FROM batches WHERE department_id = ? AND semester = ?', (department_id, semester))
-        batches_data = [dict(row) for row in cursor.fetchall()]
-        
-        cursor.execute('SELECT * FROM faculty')
-        faculty_data = [dict(row) for row in cursor.fetchall()]
-        
-        cursor.execute('SELECT * FROM classrooms')
-        classrooms_data = [dict(row) for row in cursor.fetchall()]
-        
-        # Get fixed slots from form data
-        fixed_slots = []
-        fixed_batches = request.form.getlist('fixed_batch[]')
-        fixed_days = request.form.getlist('fixed_day[]')
-        fixed_times = request.form.getlist('fixed_time[]')
-        fixed_subjects = request.form.getlist('fixed_subject[]')
-        
-        for i in range(len(fixed_batches)):
-            if fixed_batches[i] and fixed_days[i] and fixed_times[i] and fixed_subjects[i]:
-                fixed_slots.append({
-                    'batch_id': int(fixed_batches[i]),
-                    'day': fixed_days[i],
-                    'time_slot': fixed_times[i],
-                    'subject_id': int(fixed_subjects[i])
-                })
-        
-        # Define constraints
-        constraints = {
-            'days': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'],
-            'time_slots': ['9:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-1:00', '1:00-2:00', '2:00-3:00', '3:00-4:00'],
-            'lunch_break': '12:00-1:00',
-            'max_classes_per_day': int(max_classes_per_day),
-            'max_hours_per_faculty': 8,
-            'max_classes_per_day_per_batch': int(max_classes_per_day),
-            'fixed_slots': fixed_slots
-        }
-        
-        # Generate timetable using genetic algorithm with all required parameters
-        genetic_algo = EnhancedGeneticTimetable(
-            subjects=subjects_data,
-            faculty=faculty_data,
-            classrooms=classrooms_data,
-            batches=batches_data,
-            constraints=constraints
-        )
+        # Seed the run with the latest saved timetable of this department and semester
+        warm_start_id = None
+        if request.form.get('warm_start'):
+            cursor.execute('''SELECT id FROM timetables WHERE department_id = ? AND semester = ?
+                              ORDER BY created_at DESC, id DESC LIMIT 1''', (department_id, semester))
+            latest = cursor.fetchone()
+            warm_start_id = latest['id'] if latest else None
         
-        timetable, fitness_score = genetic_algo.run()
-        
-        # Save timetable to database
-        cursor.execute(
-            "INSERT INTO timetables (name, department_id, semester, fitness_score, generated_by) VALUES (?, ?, ?, ?, ?)",
-            (timetable_name, department_id, semester, fitness_score, session['user_id'])
-        )
-        
-        timetable_id = cursor.lastrowid
-        
-        # Save timetable slots
-        for batch_id, days in timetable.items():
-            for day, time_slots in days.items():
-                for time_slot, slot_data in time_slots.items():
-                    if slot_data:  # Only save non-empty slots
-                        cursor.execute(
-                            "INSERT INTO timetable_slots (timetable_id, batch_id, day, time_slot, subject_id, faculty_id, classroom_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                            (timetable_id, batch_id, day, time_slot, slot_data['subject_id'], slot_data['faculty_id'], slot_data['classroom_id'])
-                        )
-        
-        conn.commit()
+        fixed_slots = fixed_slots_from_form()
         conn.close()
         
-        flash(f'Timetable generated successfully with fitness score: {fitness_score:.2f}', 'success')
-        return redirect(url_for('timetable.view_timetable', timetable_id=timetable_id))
+        params = {
+            'name': timetable_name,
+            'department_id': department_id,
+            'semester': semester,
+            'max_classes_per_day': max_classes_per_day,
+            'engine': engine,
+            'islands': islands,
+            'time_limit': time_limit,
+            'fixed_slots': fixed_slots,
+            'warm_start_id': warm_start_id
+        }
+        # Solve in a background job; the generate page streams its progress
+        try:
+            job_id = submit_job(session['user_id'], params)
+        except JobLimitError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('timetable.generate_timetable'))
+        return redirect(url_for('timetable.generate_timetable', job=job_id))
     
     conn.close()
+    job_id = request.args.get('job', type=int)
     return render_template('generate_timetable.html', 
                          departments=departments, 
                          batches=batches, 
-                         subjects=subjects)
+                         subjects=subjects,
+                         engines=ENGINE_LABELS,
+                         ga_engine=Config.GA_ENGINE,
+                         ga_islands=Config.GA_ISLANDS,
+                         ga_time_limit=Config.GA_TIME_LIMIT,
+                         job_id=job_id if job_id and get_job(job_id) else None)
+
+def fixed_slots_from_form():
+    """Fixed slots entered on the generate form"""
+    fixed_slots = []
+    fixed_batches = request.form.getlist('fixed_batch[]')
+    fixed_days = request.form.getlist('fixed_day[]')
+    fixed_times = request.form.getlist('fixed_time[]')
+    fixed_subjects = request.form.getlist('fixed_subject[]')
+    
+    for i in range(len(fixed_batches)):
+        if fixed_batches[i] and fixed_days[i] and fixed_times[i] and fixed_subjects[i]:
+            fixed_slots.append({
+                'batch_id': int(fixed_batches[i]),
+                'day': fixed_days[i],
+                'time_slot': fixed_times[i],
+                'subject_id': int(fixed_subjects[i])
+            })
+    return fixed_slots
+
+def job_result(job):
+    """A completed job's result with a link to its timetable, and to every option of a Pareto front.
+
+    A job generating every department links to the list of timetables.
+    """
+    if 'timetable_ids' in job['result']:
+        return dict(job['result'], timetable_id=job['timetable_id'], url=url_for('timetable.timetables'))
+    result = dict(job['result'], timetable_id=job['timetable_id'],
+                  url=url_for('timetable.view_timetable', id=job['timetable_id']))
+    if 'pareto_front' in result:
+        result['pareto_front'] = [dict(option, url=url_for('timetable.view_timetable', id=option['timetable_id']))
+                                  for option in result['pareto_front']]
+    return result
+
+def job_status(job):
+    """JSON view of a generation job"""
+    status = {key: job[key] for key in ('id', 'status', 'progress', 'timetable_id', 'result', 'error', 'attempts',
+                                        'created_at', 'started_at', 'finished_at')}
+    status['params'] = {key: job['params'][key] for key in ('name', 'department_id', 'semester')}
+    return status
+
+@timetable_bp.route('/generate/<int:job_id>/events')
+@admin_required
+def generation_events(job_id):
+    """Server-Sent Events: a 'progress' event per generation published by the job, then 'done' (or 'failed').
+    
+    Each connection is closed after GA_EVENTS_STREAM_SECONDS and the browser reconnects.
+    """
+    if get_job(job_id) is None:
+        return jsonify({'error': 'Unknown generation job'}), 404
+    
+    # A reconnecting EventSource resumes after the last generation it received
+    sent = int(request.headers.get('Last-Event-ID') or -1)
+    stream = job_events(job_id, sent, result=job_result)
+    
+    return Response(stream_with_context(stream), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@timetable_bp.route('/generate/<int:job_id>/stop', methods=['POST'])
+@admin_required
+def stop_generation(job_id):
+    """Finish a running generation after its current generation and keep the best timetable so far"""
+    job = request_stop(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown generation job'}), 404
+    return jsonify({'job_id': job_id, 'stopping': job['status'] not in FINISHED})
+
+@timetable_bp.route('/api/generation_jobs', methods=['POST'])
+@admin_required
+def submit_generation_job():
+    """Queue a generation job and return its id straight away.
+    
+    JSON body: {"name": "...", "department_id": 1, "semester": 3, "max_classes_per_day": 6,
+                "engine": "genetic", "islands": 1, "time_limit": 120, "fixed_slots": [...], "warm_start_id": null}
+    """
+    data = request.get_json(silent=True) or {}
+    missing = [key for key in ('name', 'department_id', 'semester') if not data.get(key)]
+    if missing:
+        return jsonify({'error': f"Missing {', '.join(missing)}"}), 400
+    engine = data.get('engine') or Config.GA_ENGINE
+    if engine not in ENGINES:
+        return jsonify({'error': f"Unknown engine '{engine}'; choose one of {', '.join(ENGINES)}"}), 400
+    params = {
+        'name': data['name'],
+        'department_id': data['department_id'],
+        'semester': data['semester'],
+        'max_classes_per_day': int(data.get('max_classes_per_day') or 6),
+        'engine': engine,
+        'islands': int(data.get('islands') or Config.GA_ISLANDS),
+        'time_limit': float(data.get('time_limit') or Config.GA_TIME_LIMIT),
+        'fixed_slots': data.get('fixed_slots') or [],
+        'warm_start_id': data.get('warm_start_id')
+    }
+    try:
+        job_id = submit_job(session['user_id'], params)
+    except JobLimitError as e:
+        return jsonify({'error': str(e)}), 429
+    return jsonify({'job_id': job_id, 'status': 'queued',
+                    'status_url': url_for('timetable.generation_job_status', job_id=job_id)}), 202
+
+@timetable_bp.route('/api/generation_jobs/<int:job_id>')
+@admin_required
+def generation_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown generation job'}), 404
+    return jsonify(job_status(job))
+
+@timetable_bp.route('/api/generation_jobs/<int:job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_generation_job(job_id):
+    """Cancel a queued job, or stop a running one without saving its timetable"""
+    job = request_cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown generation job'}), 404
+    return jsonify(job_status(job))
+
+@timetable_bp.route('/api/generation_jobs/<int:job_id>/result')
+@admin_required
+def generation_job_result(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown generation job'}), 404
+    if job['status'] != COMPLETED:
+        return jsonify({'error': f"Job is {job['status']}", 'status': job['status']}), 409
+    return jsonify(job_result(job))
+
+@timetable_bp.route('/generate_all', methods=['POST'])
+@admin_required
+def generate_all_timetables():
+    """Generate every department/semester at once in a background job.
+
+    Departments are solved concurrently in a process pool, then merged into
+    one institution-wide timetable whose shared classroom and faculty clashes
+    are repaired by re-solving only the affected days of the clashing batches.
+    """
+    conn = sqlite3.connect('timetable.db')
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1 FROM batches LIMIT 1')
+    has_batches = cursor.fetchone() is not None
+    conn.close()
+    if not has_batches:
+        flash('No batches to generate timetables for.', 'error')
+        return redirect(url_for('timetable.generate_timetable'))
+    
+    params = {
+        'name': request.form['name'],
+        'department_id': ALL,
+        'semester': ALL,
+        'max_classes_per_day': int(request.form.get('max_classes_per_day') or 6),
+        'time_limit': float(request.form.get('time_limit') or Config.GA_TIME_LIMIT)
+    }
+    # Solve in a background job; the generate page streams its progress
+    try:
+        job_id = submit_job(session['user_id'], params)
+    except JobLimitError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('timetable.generate_timetable'))
+    return redirect(url_for('timetable.generate_timetable', job=job_id))
+
+@timetable_bp.route('/api/timetable/<int:timetable_id>/reschedule', methods=['POST'])
+@admin_required
+def reschedule_timetable(timetable_id):
+    """Repair a saved timetable after a change, rewriting only the slots that move.
+    
+    JSON body: {"unavailable_faculty": [{"faculty_id": 3, "days": ["Monday"]}],
+                "removed_classrooms": [4],
+                "fixed_slots": [{"batch_id": 1, "day": "Monday", "time_slot": "9:00-10:00", "subject_id": 2}],
+                "time_limit": 5}
+    """
+    changes = request.get_json(silent=True) or {}
+    
+    conn = sqlite3.connect('timetable.db')
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT * FROM timetables WHERE id = ?', (timetable_id,))
+    saved = cursor.fetchone()
+    if not saved:
+        conn.close()
+        return jsonify({'error': 'Timetable not found'}), 404
+    
+    subjects_data, batches_data, faculty_data, classrooms_data = load_generation_data(
+        cursor, saved['department_id'], saved['semester'])
+    constraints = {
+        'days': SCHEDULE_DAYS,
+        'time_slots': SCHEDULE_TIME_SLOTS,
+        'lunch_break': LUNCH_BREAK,
+        'max_hours_per_faculty': 8,
+        'fixed_slots': changes.get('fixed_slots', [])
+    }
+    genetic_algo = EnhancedGeneticTimetable(
+        subjects=subjects_data,
+        faculty=faculty_data,
+        classrooms=classrooms_data,
+        batches=batches_data,
+        constraints=constraints
+    )
+    
+    timetable = genetic_algo.load_timetable(timetable_id)
+    unavailable_faculty = [(entry['faculty_id'], entry.get('days', []))
+                           for entry in changes.get('unavailable_faculty', [])]
+    timetable, fitness_score, changed, search_stats = reschedule(
+        genetic_algo, timetable, unavailable_faculty, changes.get('removed_classrooms', []),
+        time_limit=float(changes.get('time_limit') or 5)
+    )
+    
+    # Write back only the slots whose class changed
+    updated_slots = save_changed_slots(cursor, timetable_id, genetic_algo.problem, timetable, changed)
+    cursor.execute('UPDATE timetables SET fitness_score = ? WHERE id = ?', (fitness_score, timetable_id))
+    conn.commit()
+    conn.close()
+    
+    return jsonify({
+        'timetable_id': timetable_id,
+        'fitness_score': fitness_score,
+        'changed_slots': updated_slots,
+        'search': search_stats
+    })
+
+@timetable_bp.route('/api/timetable/<int:timetable_id>/profile')
+@admin_required
+def timetable_profile(timetable_id):
+    """Per-phase and per-constraint timings recorded when the timetable was generated with GA_PROFILE on"""
+    conn = sqlite3.connect('timetable.db')
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, name, stop_reason, generations_run, profile FROM timetables WHERE id = ?', (timetable_id,))
+    saved = cursor.fetchone()
+    conn.close()
+
+    if not saved:
+        return jsonify({'error': 'Timetable not found'}), 404
+    if not saved['profile']:
+        return jsonify({'error': 'No profile was recorded for this timetable'}), 404
+
+    return jsonify({
+        'timetable_id': saved['id'],
+        'name': saved['name'],
+        'stop_reason': saved['stop_reason'],
+        'generations_run': saved['generations_run'],
+        'profile': json.loads(saved['profile'])
+    })
 
 @timetable_bp.route('/timetables')
 def timetables():
@@ -382,7 +607,17 @@ def analyze_timetable():
         analysis['classroom_utilization'][classroom_name] = usage
     
     # Check for constraint violations
-    # 1. Classroom capacity violations
+    # 1. Faculty assigned to subjects they are not registered to teach
+    eligibility = EligibilityIndex.from_database()
+    for slot in slots:
+        if slot['faculty_id'] and slot['subject_id'] and not eligibility.can_teach(slot['faculty_id'], slot['subject_id']):
+            analysis['constraint_violations'].append({
+                'type': 'faculty_eligibility',
+                'message': f"{slot['faculty_name']} is not registered to teach {slot['subject_name']} ({slot['batch_name']}, {slot['day']} {slot['time_slot']})",
+                'severity': 'high'
+            })
+    
+    # 2. Classroom capacity violations
     for slot in slots:
         if slot['batch_strength'] > slot.get('classroom_capacity', 0):
             analysis['constraint_violations'].append({
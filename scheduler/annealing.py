@@ -0,0 +1,248 @@
+# scheduler/annealing.py - Simulated annealing engine on the GA's moves and weights
+import math
+import random
+import time
+import numpy as np
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.problem import CLASSROOM, EMPTY
+from scheduler.local_search import TabuSearch
+from scheduler.termination import STOPPED, TARGET_FITNESS, HARD_CONSTRAINTS, TIME_LIMIT
+
+# Seconds an annealing run takes when no time limit is given, and between its progress reports
+DEFAULT_TIME_LIMIT = 60
+PROGRESS_INTERVAL = 0.5
+
+# Temperature after a share f in [0, 1] of a cooling cycle, from the start temperature t0 to the final one
+COOLING_SCHEDULES = {
+    'exponential': lambda t0, final, f: t0 * (final / t0) ** f,
+    'linear': lambda t0, final, f: t0 + (final - t0) * f,
+    # Falls fast at first, then lingers at low temperatures
+    'logarithmic': lambda t0, final, f: t0 / (1 + (t0 / final - 1) * math.log1p(f * (math.e - 1)))
+}
+
+
+class AnnealingTimetable(EnhancedGeneticTimetable):
+    """Improves a single timetable by simulated annealing instead of evolving a population.
+
+    Starts from the GA's first individual (warm start seeds and fixed slots
+    included) and proposes one move at a time from the GA's operators: the
+    mutation (lab slot change or clear, department theory move), a slot swap
+    and a faculty reassignment. Moves are scored incrementally by a
+    DeltaEvaluator on the GA's constraint weights; the energy is the weighted
+    penalty, unclamped so the search keeps its direction once the fitness
+    bottoms out at zero. Worse moves are accepted with probability
+    exp(-increase / temperature).
+
+    The time limit is split into annealing_reheats + 1 cooling cycles. Each
+    cycle cools by annealing_schedule (see COOLING_SCHEDULES) down to
+    annealing_final_temperature. Every reheat restarts from the best
+    timetable at annealing_reheat_temperature times the initial temperature.
+    The initial temperature accepts an average worsening move with
+    probability annealing_initial_acceptance, measured on sample moves.
+
+    Same interface as EnhancedGeneticTimetable.run; progress is reported
+    every PROGRESS_INTERVAL seconds instead of every generation.
+    """
+
+    def __init__(self, subjects, faculty, classrooms, batches, constraints, eligibility=None):
+        super().__init__(subjects, faculty, classrooms, batches, constraints, eligibility)
+        self.time_limit = constraints.get('time_limit') or DEFAULT_TIME_LIMIT
+        self.schedule = constraints.get('annealing_schedule', 'exponential')
+        if self.schedule not in COOLING_SCHEDULES:
+            raise ValueError(f"Unknown cooling schedule '{self.schedule}'; "
+                             f"choose one of {', '.join(COOLING_SCHEDULES)}")
+        self.reheats = constraints.get('annealing_reheats', 2)
+        self.reheat_temperature = constraints.get('annealing_reheat_temperature', 0.5)
+        self.initial_acceptance = constraints.get('annealing_initial_acceptance', 0.8)
+        self.final_temperature = constraints.get('annealing_final_temperature', 0.5)
+        # Slot swaps and fixed-slot checks come from the local search's move set
+        self.moves = TabuSearch(self)
+        if self.room_assigner is not None:
+            self.kind_rooms = {kind: rooms.tolist() for kind, rooms in self.room_assigner.rooms_of_kind.items()}
+            self.room_costs = self.room_assigner.cost.tolist()
+
+    def energy(self, delta):
+        """Weighted penalty of the delta evaluator's timetable"""
+        violations = delta.violation_counts()
+        return sum(violations[check] * weight for check, weight in delta.weights)
+
+    def random_move(self, delta):
+        """One move of a random operator as (batch, day, slot, gene) changes, or None"""
+        problem = self.problem
+        operator = random.randrange(3)
+        if operator == 0:
+            return self.mutation_move(delta.timetable)
+        cell = (random.randrange(problem.num_batches), random.randrange(problem.num_days),
+                random.randrange(problem.num_slots))
+        if operator == 1:
+            if not problem.teaching_slots[cell[2]]:
+                return None
+            moves = self.moves.swap_moves(delta, cell, 1)
+            return moves[0] if moves else None
+        subject, faculty, classroom = delta.timetable[cell].tolist()
+        candidates = self.eligibility.candidates[subject].tolist() if subject >= 0 else []
+        candidates = [f for f in candidates if f != faculty]
+        if not candidates:
+            return None
+        # Faculty free in the slot, when there are any, so reassignments rarely create clashes
+        free = [f for f in candidates if not delta.faculty_bookings[f, cell[1], cell[2]]]
+        candidates = free or candidates
+        return [cell + ((subject, random.choice(candidates), classroom),)]
+
+    def apply_move(self, delta, move):
+        """Apply a move to the delta evaluator, refitting the rooms of the classes it places"""
+        for b, d, s, gene in move:
+            delta.place(b, d, s, gene)
+        if self.room_assigner is not None:
+            for b, d, s, _ in move:
+                self.fit_room(delta, b, d, s)
+
+    def fit_room(self, delta, b, d, s):
+        """Keep a class's room if it is of the right type and free, else take the cheapest free one.
+
+        Clashes only remain where a (day, slot) has more classes of a type than
+        rooms, exactly as with full matching, at a fraction of its cost; the
+        best timetable is matched properly once annealing ends.
+        """
+        assigner = self.room_assigner
+        subject, faculty, classroom = delta.timetable[b, d, s].tolist()
+        if subject < 0:
+            return
+        room = assigner.pinned.get((d, s), {}).get(b)
+        if room is None:
+            rooms = self.kind_rooms[assigner.subject_kind[subject]]
+            if not rooms:
+                return
+            taken = delta.timetable[:, d, s, CLASSROOM].tolist()
+            taken[b] = EMPTY
+            taken = set(taken)
+            if classroom in rooms and classroom not in taken:
+                return
+            room = min([r for r in rooms if r not in taken] or rooms, key=self.room_costs[b].__getitem__)
+        if room != classroom:
+            delta.place(b, d, s, (subject, faculty, room))
+
+    def proposal(self, delta, attempts=100):
+        """Apply a random move that keeps the locked fixed slots; False if none turned up"""
+        for _ in range(attempts):
+            move = self.random_move(delta)
+            if move and (not self.fixed_genes or self.moves.keeps_fixed_slots(move)):
+                self.apply_move(delta, move)
+                return True
+        return False
+
+    def initial_temperature(self, delta, energy, samples=100):
+        """Temperature accepting the average sampled worsening move with initial_acceptance"""
+        increases = []
+        for _ in range(samples):
+            if not self.proposal(delta):
+                continue
+            change = self.energy(delta) - energy
+            delta.revert()
+            if change > 0:
+                increases.append(change)
+        if not increases:
+            return 1.0
+        return max(-np.mean(increases) / math.log(self.initial_acceptance), self.final_temperature)
+
+    def annealing_progress(self, report, best_energy, energy, temperature, stats, violations, started):
+        """Statistics of a running annealing as yielded by iter_run"""
+        base_score = self.evaluator.base_score
+        return {
+            'generation': report,
+            'best_fitness': float(max(0, base_score - best_energy)),
+            'current_fitness': float(max(0, base_score - energy)),
+            'penalty': float(best_energy),
+            'temperature': round(temperature, 4),
+            'acceptance': round(stats['accepted'] / stats['iterations'], 4) if stats['iterations'] else None,
+            'iterations': stats['iterations'],
+            'violations': {check: int(count) for check, count in violations.items()},
+            'elapsed': round(time.monotonic() - started, 3)
+        }
+
+    def iter_run(self):
+        """Generator form of run(): yields a progress dict while annealing and once at the end.
+
+        The generator's return value is run()'s (timetable, fitness, run_stats).
+        """
+        started = time.monotonic()
+        self.profiler.reset()
+        with self.profiler.phase('initialization'):
+            delta = self.delta_evaluator(self.initial_population(1)[0])
+            energy = self.energy(delta)
+            t0 = self.initial_temperature(delta, energy)
+        best_energy, best_timetable = energy, delta.timetable.copy()
+        best_violations = delta.violation_counts()
+        target_penalty = self.evaluator.base_score - self.target_fitness
+        cycle_length = self.time_limit / (self.reheats + 1)
+        cool = COOLING_SCHEDULES[self.schedule]
+        stats = {'iterations': 0, 'accepted': 0, 'improvements': 0, 'reheats': 0}
+        cycle, cycle_start, temperature = 0, t0, t0
+        report, reported = 0, started
+        stop_reason = TIME_LIMIT
+
+        while True:
+            now = time.monotonic()
+            if self.stop_requested:
+                stop_reason = STOPPED
+                break
+            if best_energy <= target_penalty:
+                stop_reason = TARGET_FITNESS
+                break
+            if self.stop_on_hard_constraints and all(best_violations.get(check, 0) == 0
+                                                     for check in self.HARD_CONSTRAINTS):
+                stop_reason = HARD_CONSTRAINTS
+                break
+            if now - started >= self.time_limit:
+                break
+            if now - reported >= PROGRESS_INTERVAL:
+                reported = now
+                yield self.annealing_progress(report, best_energy, energy, temperature, stats, best_violations, started)
+                report += 1
+
+            elapsed_cycles = (now - started) / cycle_length
+            if int(elapsed_cycles) > cycle and cycle < self.reheats:
+                # Reheat: continue from the best timetable at a share of the initial temperature
+                cycle = int(elapsed_cycles)
+                cycle_start = t0 * self.reheat_temperature ** cycle
+                delta = self.delta_evaluator(best_timetable)
+                energy = best_energy
+                stats['reheats'] += 1
+            temperature = cool(cycle_start, self.final_temperature, min(elapsed_cycles - cycle, 1.0))
+
+            with self.profiler.phase('annealing'):
+                if not self.proposal(delta):
+                    continue
+                candidate = self.energy(delta)
+                change = candidate - energy
+                stats['iterations'] += 1
+                if change <= 0 or random.random() < math.exp(-change / temperature):
+                    delta.commit()
+                    energy = candidate
+                    stats['accepted'] += 1
+                    if energy < best_energy:
+                        best_energy, best_timetable = energy, delta.timetable.copy()
+                        best_violations = delta.violation_counts()
+                        stats['improvements'] += 1
+                else:
+                    delta.revert()
+        yield self.annealing_progress(report, best_energy, energy, temperature, stats, best_violations, started)
+        self.stop_requested = False
+
+        if self.room_assigner is not None:
+            self.room_assigner.assign(best_timetable)
+        fitness = self.calculate_fitness(best_timetable)
+        run_stats = dict(stats, stop_reason=stop_reason, generations=report + 1,
+                         elapsed=round(time.monotonic() - started, 3), initial_temperature=round(t0, 4),
+                         schedule=self.schedule)
+        print(f"Annealing stopped after {stats['iterations']} moves ({stop_reason}, {stats['accepted']} accepted, "
+              f"{stats['reheats']} reheats): Best Fitness = {fitness}")
+        best_timetable, fitness = self.polish(best_timetable, fitness, run_stats)
+        if self.profiler.enabled:
+            run_stats['profile'] = self.profile_report()
+        return best_timetable, fitness, run_stats
+
+    def run_islands(self, islands, migration_interval=25, migration_size=2, topology='ring', seed=None,
+                    callback=None):
+        """A single trajectory has no islands; it runs once in this process"""
+        return self.run(callback)
@@ -0,0 +1,66 @@
+# scheduler/cache.py - Bounded LRU cache of fitness scores
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+
+class FitnessCache:
+    """Remembers the fitness of recently scored chromosomes.
+
+    Chromosomes are keyed by a 128-bit BLAKE2 digest of their contents, so
+    identical timetables share an entry however they were produced. The least
+    recently used entry is evicted once maxsize entries are held.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, chromosome):
+        """Structural hash of a timetable array (or of a dict chromosome's repr)"""
+        if isinstance(chromosome, np.ndarray):
+            data = np.ascontiguousarray(chromosome)
+            digest = hashlib.blake2b(data.tobytes(), digest_size=16)
+            digest.update(repr(data.shape).encode())
+        else:
+            digest = hashlib.blake2b(repr(chromosome).encode(), digest_size=16)
+        return digest.digest()
+
+    def get(self, key):
+        """Cached fitness for a key, or None"""
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return fitness
+
+    def put(self, key, fitness):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.reset_stats()
+
+    def stats(self):
+        """Hit/miss counters since the last reset"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,106 @@
+# scheduler/checkpoint.py - On-disk checkpoints of genetic algorithm runs
+import hashlib
+import json
+import os
+import random
+import zipfile
+import zlib
+import numpy as np
+
+
+# Constraints that only decide how long or how observably a run goes on; a run
+# resumed with other values continues the same search
+RUN_CONTROL = ('time_limit', 'stagnation_generations', 'stop_on_hard_constraints', 'target_fitness', 'profile',
+               'checkpoint_path', 'checkpoint_interval', 'resume')
+
+# Errors reading a checkpoint of another problem, or one truncated or corrupted on disk;
+# a run ignores such a checkpoint and starts over
+CHECKPOINT_ERRORS = (ValueError, KeyError, OSError, EOFError, zipfile.BadZipFile, zlib.error)
+
+
+def constraints_digest(constraints):
+    """Hash of the constraints that shape a run's population (fixed slots, limits, warm start, ...)"""
+    shaping = {key: value for key, value in (constraints or {}).items() if key not in RUN_CONTROL}
+    encoded = json.dumps(shaping, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def problem_signature(problem, constraints=None):
+    """Arrays identifying the ids, grid and constraints a population was encoded against"""
+    return {
+        'subject_ids': np.array(problem.subject_ids),
+        'faculty_ids': np.array(problem.faculty_ids),
+        'classroom_ids': np.array(problem.classroom_ids),
+        'batch_ids': np.array(problem.batch_ids),
+        'grid': np.array([problem.num_days, problem.num_slots]),
+        'constraints': np.array(constraints_digest(constraints))
+    }
+
+
+def save_checkpoint(path, problem, population, best_timetable, best_fitness, generation, finished=False,
+                    rng=None, constraints=None):
+    """Write population, best-so-far and RNG state to a compressed .npz file.
+
+    The state of the random and numpy streams is saved, and that of the
+    numpy Generator rng when one is given.
+
+    The file is written next to its destination and renamed into place, so a
+    run killed mid-write leaves the previous checkpoint intact.
+    """
+    py_version, py_state, py_gauss = random.getstate()
+    np_name, np_keys, np_pos, np_has_gauss, np_gauss = np.random.get_state()
+    arrays = problem_signature(problem, constraints)
+    arrays.update(
+        population=np.asarray(population),
+        best_timetable=np.asarray(best_timetable if best_timetable is not None else problem.empty_timetable()),
+        best_fitness=np.array(best_fitness, dtype=np.float64),
+        generation=np.array(generation),
+        finished=np.array(finished),
+        py_version=np.array(py_version),
+        py_state=np.array(py_state, dtype=np.int64),
+        py_gauss=np.array(np.nan if py_gauss is None else py_gauss),
+        np_keys=np_keys,
+        np_pos=np.array(np_pos),
+        np_has_gauss=np.array(np_has_gauss),
+        np_gauss=np.array(np_gauss)
+    )
+    if rng is not None:
+        # Bit generator states hold integers wider than 64 bits
+        arrays['rng_state'] = np.array(json.dumps(rng.bit_generator.state))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path, problem, constraints=None):
+    """Read a checkpoint written for the same problem and constraints; raises ValueError otherwise"""
+    with np.load(path) as data:
+        checkpoint = {key: data[key] for key in data.files}
+    for key, expected in problem_signature(problem, constraints).items():
+        if not np.array_equal(checkpoint[key], expected):
+            raise ValueError(f"Checkpoint {path} does not match this problem ({key} differ)")
+    return {
+        'population': checkpoint['population'].astype(np.int32),
+        'best_timetable': checkpoint['best_timetable'].astype(np.int32),
+        'best_fitness': float(checkpoint['best_fitness']),
+        'generation': int(checkpoint['generation']),
+        'finished': bool(checkpoint['finished']),
+        'random_state': checkpoint
+    }
+
+
+def restore_random_state(checkpoint, rng=None):
+    """Continue the random and numpy streams, and rng's if saved, exactly where the checkpoint left them"""
+    state = checkpoint['random_state']
+    py_gauss = float(state['py_gauss'])
+    random.setstate((int(state['py_version']), tuple(state['py_state'].tolist()),
+                     None if np.isnan(py_gauss) else py_gauss))
+    np.random.set_state(('MT19937', state['np_keys'], int(state['np_pos']),
+                         int(state['np_has_gauss']), float(state['np_gauss'])))
+    if rng is not None and 'rng_state' in state:
+        rng.bit_generator.state = json.loads(str(state['rng_state']))
@@ -0,0 +1,519 @@
+# scheduler/cp.py - Constraint programming engine: complete backtracking search
+import itertools
+import time
+from collections import defaultdict
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.problem import EMPTY
+from scheduler.occupancy import OccupancyIndex
+from scheduler.rooms import RoomAssigner, ROOM_TYPES, THEORY_SESSION, LAB_SESSION
+from scheduler.termination import STOPPED, TIME_LIMIT
+
+# Stop reasons of a search besides a stop request or the time limit
+SOLVED = 'solved'
+INFEASIBLE = 'infeasible'  # some class cannot be placed without breaking a hard constraint
+
+# Seconds a search runs when no time limit is given, and between its progress reports
+DEFAULT_TIME_LIMIT = 60
+PROGRESS_INTERVAL = 0.5
+
+
+class Session:
+    """One class still to place: a subject taught to some batches in a single (day, slot).
+
+    cells is the mask of cells it may take (one for a fixed slot), pinned maps
+    batches to the faculty a fixed slot names, and rooms counts the rooms it needs per kind.
+    The remaining batches need distinct faculty drawn from candidates.
+    previous is the identical session created before this one, if any.
+    """
+
+    def __init__(self, subject, batches, cells, rooms, candidates, pinned=None, fixed=False, previous=None):
+        self.subject = subject
+        self.batches = list(batches)
+        self.cells = cells
+        self.rooms = rooms
+        self.pinned = pinned or {}
+        self.candidates = [f for f in candidates if f not in self.pinned.values()]
+        self.staff_needed = len(self.batches) - len(self.pinned)
+        self.fixed = fixed
+        self.previous = previous
+        self.degree = 0
+
+    def staff(self, chosen):
+        """Faculty of every batch given the members chosen for the unpinned ones"""
+        chosen = iter(chosen)
+        return [self.pinned[b] if b in self.pinned else next(chosen) for b in self.batches]
+
+
+class BacktrackingSearch:
+    """Depth-first search over sessions with forward checking.
+
+    A value is a (cell, chosen faculty) pair. After each assignment every open
+    session's domain, the cells free for all its batches, its faculty and its
+    rooms, is recomputed and the branch is abandoned as soon as one empties or
+    a batch, or a faculty member some sessions cannot do without, has more
+    open sessions than free cells left (for a batch, under its daily limit).
+    """
+
+    def __init__(self, engine, sessions):
+        problem = engine.problem
+        self.engine = engine
+        self.sessions = sessions
+        self.num_slots = problem.num_slots
+        self.occupancy = OccupancyIndex(problem)
+        self.day_masks = [self.occupancy.teaching & (((1 << problem.num_slots) - 1) << (d * problem.num_slots))
+                          for d in range(problem.num_days)]
+        self.day_limit = engine.max_classes_per_day_per_batch
+        self.day_count = [[0] * problem.num_days for _ in range(problem.num_batches)]
+        self.day_full = [0] * problem.num_batches  # Cells of the days each batch has filled
+        self.subject_days = defaultdict(int)  # (batch, subject, day) -> classes
+
+        # Per room kind, levels[j] holds the cells in which at least j rooms are taken
+        self.room_capacity = {kind: sum(c['type'] == room_type for c in problem.classrooms)
+                              for kind, room_type in ROOM_TYPES.items()}
+        self.room_levels = {kind: [0] * (capacity + 1) for kind, capacity in self.room_capacity.items()}
+        self.rooms_used = {kind: [0] * (problem.num_days * problem.num_slots) for kind in ROOM_TYPES}
+
+        # Faculty workload limits are not enforced, only spared by the value ordering
+        self.hours = [0] * problem.num_faculty
+        self.faculty_day = [[0] * problem.num_days for _ in range(problem.num_faculty)]
+        self.daily_limits = [int(f.get('max_hours_per_day', engine.max_hours_per_faculty)) for f in engine.faculty]
+        self.weekly_limits = [max(limit, 1) for limit in engine.availability_limits]
+
+        # Identical sessions take increasing cells, so their permutations are not searched
+        self.following = {s.previous: i for i, s in enumerate(sessions) if s.previous is not None}
+        self.assignment = {}
+        self.best = {}
+        self.unplaced = []
+        self.nodes = 0
+        self.backtracks = 0
+        self.compute_degrees()
+
+    def compute_degrees(self):
+        """Count, for every session, the others sharing a batch or a possible faculty member"""
+        by_resource = defaultdict(set)
+        for i, session in enumerate(self.sessions):
+            for b in session.batches:
+                by_resource['batch', b].add(i)
+            for f in session.candidates + list(session.pinned.values()):
+                by_resource['faculty', f].add(i)
+        neighbours = defaultdict(set)
+        for members in by_resource.values():
+            for i in members:
+                neighbours[i] |= members
+        for i, session in enumerate(self.sessions):
+            session.degree = len(neighbours[i]) - 1
+
+    def room_cells(self, kind, count):
+        """Cells with count more rooms of a kind free"""
+        capacity = self.room_capacity[kind]
+        if count > capacity:
+            return 0
+        return ~self.room_levels[kind][capacity - count + 1]
+
+    def domain(self, i):
+        """Mask of cells where a session can still go, with enough free faculty and rooms"""
+        occupancy = self.occupancy
+        session = self.sessions[i]
+        mask = session.cells
+        if session.previous in self.assignment:
+            mask &= -2 << self.assignment[session.previous][0]
+        if self.following.get(i) in self.assignment:
+            mask &= (1 << self.assignment[self.following[i]][0]) - 1
+        for b in session.batches:
+            mask &= ~(occupancy.batches[b] | self.day_full[b])
+        for f in session.pinned.values():
+            mask &= ~occupancy.faculty[f]
+        for kind, count in session.rooms.items():
+            if not mask:
+                return 0
+            mask &= self.room_cells(kind, count)
+        need = session.staff_needed
+        if need and mask:
+            # have[j]: cells in which at least j candidates are free (bit-sliced counting)
+            have = [mask] + [0] * need
+            for f in session.candidates:
+                free = ~occupancy.faculty[f]
+                for j in range(need, 0, -1):
+                    have[j] |= have[j - 1] & free
+            mask = have[need]
+        return mask
+
+    def cell_cost(self, session, cell):
+        """Preference for a cell: spread a subject over the week and the classes over the days"""
+        day, time_slot = divmod(cell, self.num_slots)
+        cost = 0
+        for b in session.batches:
+            busy = self.occupancy.batches[b]
+            cost += 4 * self.subject_days[b, session.subject, day] + self.day_count[b][day]
+            if time_slot > 0:
+                cost += busy >> (cell - 1) & 1
+            if time_slot < self.num_slots - 1:
+                cost += busy >> (cell + 1) & 1
+        return cost
+
+    def values(self, session, domain):
+        """(cell, chosen faculty) values of a session, most promising first"""
+        cells = []
+        while domain:
+            low = domain & -domain
+            cells.append(low.bit_length() - 1)
+            domain ^= low
+        cells.sort(key=lambda cell: self.cell_cost(session, cell))
+        if not session.staff_needed:
+            for cell in cells:
+                yield cell, ()
+            return
+
+        staffings = []
+        for cell in cells:
+            day = cell // self.num_slots
+            free = [f for f in session.candidates if not self.occupancy.faculty[f] >> cell & 1]
+            free.sort(key=lambda f: (self.faculty_day[f][day] >= self.daily_limits[f],
+                                     self.hours[f] >= self.weekly_limits[f], self.hours[f] / self.weekly_limits[f]))
+            staffings.append((cell, itertools.combinations(free, session.staff_needed)))
+        # Every cell with its least loaded staffing first, then every cell's next staffing
+        while staffings:
+            remaining = []
+            for cell, combinations in staffings:
+                chosen = next(combinations, None)
+                if chosen is not None:
+                    yield cell, chosen
+                    remaining.append((cell, combinations))
+            staffings = remaining
+
+    def assign(self, i, value, undo=False):
+        """Book (or with undo, release) a session's value everywhere the search keeps count"""
+        session = self.sessions[i]
+        cell, chosen = value
+        day, time_slot = divmod(cell, self.num_slots)
+        bit = 1 << cell
+        step = -1 if undo else 1
+        counted = bool(self.occupancy.teaching & bit)
+        for b, f in zip(session.batches, session.staff(chosen)):
+            gene = (session.subject, f, EMPTY)
+            if undo:
+                self.occupancy.release([b], day, time_slot, gene)
+            else:
+                self.occupancy.book([b], day, time_slot, gene)
+            self.hours[f] += step
+            self.faculty_day[f][day] += step
+            self.subject_days[b, session.subject, day] += step
+            if counted:
+                self.day_count[b][day] += step
+                if self.day_limit is not None and self.day_count[b][day] >= self.day_limit:
+                    self.day_full[b] |= self.day_masks[day]
+                else:
+                    self.day_full[b] &= ~self.day_masks[day]
+        for kind, count in session.rooms.items():
+            used = self.rooms_used[kind][cell]
+            levels = self.room_levels[kind]
+            if undo:
+                for j in range(used - count + 1, used + 1):
+                    levels[j] &= ~bit
+            else:
+                for j in range(used + 1, used + count + 1):
+                    levels[j] |= bit
+            self.rooms_used[kind][cell] = used + step * count
+        if undo:
+            del self.assignment[i]
+        else:
+            self.assignment[i] = value
+
+    def propagate(self, open_sessions):
+        """Domains of the open sessions, or None if the current assignment cannot be completed"""
+        domains = {}
+        need = defaultdict(int)
+        reach = defaultdict(int)
+        for i in open_sessions:
+            domain = domains[i] = self.domain(i)
+            if not domain:
+                return None
+            session = self.sessions[i]
+            resources = [('batch', b) for b in session.batches]
+            resources += [('faculty', f) for f in session.pinned.values()]
+            if session.staff_needed == len(session.candidates):
+                resources += [('faculty', f) for f in session.candidates]
+            for resource in resources:
+                need[resource] += 1
+                reach[resource] |= domain
+        # A batch cannot take more classes than its reachable cells under the daily limit allow,
+        # nor a faculty member more than their reachable cells hold of the classes only they can teach
+        for (kind, index), count in need.items():
+            if kind == 'faculty' or self.day_limit is None:
+                room = reach[kind, index].bit_count()
+            else:
+                room = sum(min(self.day_limit - self.day_count[index][d], (reach[kind, index] & mask).bit_count())
+                           for d, mask in enumerate(self.day_masks))
+            if count > room:
+                return None
+        return domains
+
+    def solve(self, deadline=None):
+        """Generator yielding every PROGRESS_INTERVAL seconds; returns the stop reason"""
+        open_sessions = set(range(len(self.sessions)))
+        # Sessions that fit nowhere even in an empty timetable cannot be placed at all,
+        # nor can fixed slots sharing a batch or faculty member with an earlier one
+        taken = set()
+        for i in sorted(open_sessions):
+            session = self.sessions[i]
+            claims = set()
+            if session.fixed:
+                claims = {('batch', b) for b in session.batches} | {('faculty', f) for f in session.pinned.values()}
+                claims = {(resource, index, session.cells) for resource, index in claims}
+            if not self.domain(i) or claims & taken:
+                self.unplaced.append(i)
+                open_sessions.discard(i)
+            else:
+                taken |= claims
+        domains = self.propagate(open_sessions)
+        if domains is None:
+            return INFEASIBLE
+
+        stack = []  # [session, its values, the value it holds]
+        reported = time.monotonic()
+        while True:
+            if self.engine.stop_requested:
+                return STOPPED
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return TIME_LIMIT
+            if now - reported >= PROGRESS_INTERVAL:
+                reported = now
+                yield
+            if not open_sessions:
+                return INFEASIBLE if self.unplaced else SOLVED
+
+            # Minimum remaining values, ties to the session constraining most others
+            i = min(open_sessions, key=lambda i: (domains[i].bit_count(), -self.sessions[i].degree, i))
+            stack.append([i, self.values(self.sessions[i], domains[i]), None])
+            while stack:
+                frame = stack[-1]
+                i, values, value = frame
+                if value is not None:
+                    self.assign(i, value, undo=True)
+                    open_sessions.add(i)
+                    frame[2] = None
+                value = next(values, None)
+                if value is None:
+                    stack.pop()
+                    self.backtracks += 1
+                    continue
+                self.nodes += 1
+                self.assign(i, value)
+                open_sessions.discard(i)
+                domains = self.propagate(open_sessions)
+                if domains is not None:
+                    frame[2] = value
+                    if len(self.assignment) > len(self.best):
+                        self.best = dict(self.assignment)
+                    break
+                self.assign(i, value, undo=True)
+                open_sessions.add(i)
+            else:
+                return INFEASIBLE
+
+    def complete_greedily(self):
+        """Extend the best assignment, without backtracking, by every session that still fits"""
+        for i, value in list(self.assignment.items()):
+            self.assign(i, value, undo=True)
+        for i, value in self.best.items():
+            self.assign(i, value)
+        open_sessions = set(range(len(self.sessions))) - set(self.assignment) - set(self.unplaced)
+        while open_sessions:
+            domains = {i: self.domain(i) for i in open_sessions}
+            fitting = [i for i in open_sessions if domains[i]]
+            if not fitting:
+                break
+            i = min(fitting, key=lambda i: (domains[i].bit_count(), -self.sessions[i].degree, i))
+            value = next(self.values(self.sessions[i], domains[i]), None)
+            if value is None:
+                break
+            self.assign(i, value)
+            open_sessions.discard(i)
+        self.best = dict(self.assignment)
+
+
+class ConstraintTimetable(EnhancedGeneticTimetable):
+    """Builds a timetable by complete backtracking search instead of evolution.
+
+    Every class becomes a session: a theory class is taught to all batches of
+    its department at once by distinct faculty members, a lab class to one
+    batch. Sessions are placed so that batches, faculty and rooms never
+    overlap, every subject gets exactly its classes_per_week, nothing lands in
+    the lunch break, fixed slots keep their cells (and faculty) and no batch
+    has more than max_classes_per_day_per_batch classes a day. Sessions are
+    chosen by minimum remaining values, ties going to the highest degree, and
+    values spread each subject over the week and spare the least loaded
+    faculty. Faculty workload limits and the other soft constraints are left
+    to the usual polish.
+
+    The search ends 'solved' with a clash-free timetable or 'infeasible' when
+    some class cannot be placed; run_stats['unplaced'] then names the classes
+    no empty timetable has room for. Unless solved, the timetable returned is
+    the deepest assignment the search reached, extended greedily by every
+    session that still fits. Same interface as
+    EnhancedGeneticTimetable.run; progress is reported every
+    PROGRESS_INTERVAL seconds instead of every generation.
+    """
+
+    def __init__(self, subjects, faculty, classrooms, batches, constraints, eligibility=None):
+        super().__init__(subjects, faculty, classrooms, batches, constraints, eligibility)
+        self.time_limit = constraints.get('time_limit') or DEFAULT_TIME_LIMIT
+
+    def build_sessions(self):
+        """Sessions for every fixed slot, then for the classes each subject still needs"""
+        problem = self.problem
+        cells = OccupancyIndex(problem).teaching
+        room_kinds = {room_type: kind for kind, room_type in ROOM_TYPES.items()}
+        sessions = []
+        fixed_classes = defaultdict(int)  # (batch, subject) -> classes placed by fixed slots
+
+        # Theory fixed slots take the whole department, lab ones their batch
+        grouped = {}
+        for (b, d, s), gene in sorted(self.fixed_genes.items()):
+            subject = gene[0]
+            if problem.subject_is_theory[subject]:
+                key = ('theory', int(problem.batch_department[b]), d, s, subject)
+            else:
+                key = ('lab', b, d, s, subject)
+            grouped.setdefault(key, {})[b] = gene
+        for (kind, owner, d, s, subject), genes in grouped.items():
+            batches = problem.department_batches[owner].tolist() if kind == 'theory' else [owner]
+            rooms = defaultdict(int)
+            for b in batches:
+                classroom = genes.get(b, (subject, EMPTY, EMPTY))[2]
+                if classroom >= 0:
+                    rooms[room_kinds.get(problem.classrooms[classroom]['type'])] += 1
+                else:
+                    rooms[LAB_SESSION if problem.subject_is_lab[subject] else THEORY_SESSION] += 1
+            rooms.pop(None, None)
+            pinned = {b: gene[1] for b, gene in genes.items() if gene[1] >= 0}
+            sessions.append(Session(subject, batches, 1 << (d * problem.num_slots + s), dict(rooms),
+                                    self.eligibility.candidates[subject].tolist(), pinned, fixed=True))
+            for b in batches:
+                fixed_classes[b, subject] += 1
+
+        for theory_subject in self.theory_subjects:
+            target_batches = self.department_batch_indices(theory_subject.get('department_id'))
+            if not target_batches:
+                continue
+            subject = problem.subject_index[theory_subject['id']]
+            required = theory_subject.get('classes_per_week', 3) - min(fixed_classes[b, subject]
+                                                                      for b in target_batches)
+            for k in range(required):
+                sessions.append(Session(subject, target_batches, cells, {THEORY_SESSION: len(target_batches)},
+                                        self.eligibility.candidates[subject].tolist(),
+                                        previous=len(sessions) - 1 if k else None))
+
+        for batch_idx, batch in enumerate(self.batches):
+            for lab_subject in self.lab_subjects:
+                if lab_subject.get('department_id') != batch.get('department_id'):
+                    continue
+                subject = problem.subject_index[lab_subject['id']]
+                for k in range(lab_subject.get('classes_per_week', 3) - fixed_classes[batch_idx, subject]):
+                    sessions.append(Session(subject, [batch_idx], cells, {LAB_SESSION: 1},
+                                            self.eligibility.candidates[subject].tolist(),
+                                            previous=len(sessions) - 1 if k else None))
+        return sessions
+
+    def build_timetable(self, search, assignment):
+        """Dense timetable of an assignment, with rooms matched per (day, slot)"""
+        timetable = self.problem.empty_timetable()
+        for i, (cell, chosen) in assignment.items():
+            session = search.sessions[i]
+            day, time_slot = divmod(cell, self.problem.num_slots)
+            for b, f in zip(session.batches, session.staff(chosen)):
+                timetable[b, day, time_slot] = (session.subject, f, EMPTY)
+        room_assigner = self.room_assigner
+        if room_assigner is None:
+            room_assigner = RoomAssigner(self.problem)
+            room_assigner.pin(self.compiled_fixed_slots)
+        return room_assigner.assign(timetable)
+
+    def search_progress(self, search, report, started):
+        """Statistics of a running search as yielded by iter_run"""
+        timetable = self.build_timetable(search, search.best)
+        return {
+            'generation': report,
+            'best_fitness': float(self.calculate_fitness(timetable)),
+            'placed': len(search.best),
+            'sessions': len(search.sessions),
+            'nodes': search.nodes,
+            'backtracks': search.backtracks,
+            'violations': {check: int(count[0]) for check, count in self.evaluator.violations(timetable).items()},
+            'elapsed': round(time.monotonic() - started, 3)
+        }
+
+    def iter_run(self):
+        """Generator form of run(): yields a progress dict while the search runs and once at its end.
+
+        The generator's return value is run()'s (timetable, fitness, run_stats).
+        """
+        started = time.monotonic()
+        self.profiler.reset()
+        with self.profiler.phase('initialization'):
+            search = BacktrackingSearch(self, self.build_sessions())
+        runner = search.solve(started + self.time_limit)
+        report = 0
+        while True:
+            try:
+                with self.profiler.phase('search'):
+                    next(runner)
+            except StopIteration as finished:
+                stop_reason = finished.value
+                break
+            yield self.search_progress(search, report, started)
+            report += 1
+        if stop_reason != SOLVED:
+            # Whatever could not be searched out still goes in where it fits
+            with self.profiler.phase('search'):
+                search.complete_greedily()
+        yield self.search_progress(search, report, started)
+        self.stop_requested = False
+
+        # Fixed slots lock_fixed_slots could not hold (no cell, or clashing with another) are never placed
+        unheld = [(b, subject) for b, d, s, subject, faculty, classroom in self.compiled_fixed_slots
+                  if s is None or self.fixed_genes.get((b, d, s), (EMPTY,) * 3)[0] != subject]
+        if unheld and stop_reason == SOLVED:
+            stop_reason = INFEASIBLE
+
+        timetable = self.build_timetable(search, search.best)
+        fitness = self.calculate_fitness(timetable)
+        run_stats = {
+            'stop_reason': stop_reason,
+            'generations': report + 1,
+            'elapsed': round(time.monotonic() - started, 3),
+            'sessions': len(search.sessions),
+            'placed': len(search.best),
+            'unplaced': [{'subject': self.problem.subject_ids[search.sessions[i].subject],
+                          'batches': [self.problem.batch_ids[b] for b in search.sessions[i].batches]}
+                         for i in search.unplaced] +
+                        [{'subject': self.problem.subject_ids[subject] if subject >= 0 else None,
+                          'batches': [self.problem.batch_ids[b]], 'fixed_slot': True} for b, subject in unheld],
+            'nodes': search.nodes,
+            'backtracks': search.backtracks
+        }
+        print(f"Search {stop_reason} after {search.nodes} nodes and {search.backtracks} backtracks: "
+              f"{len(search.best)}/{len(search.sessions)} sessions placed, Fitness = {fitness}")
+        timetable, fitness = self.polish(timetable, fitness, run_stats)
+        if self.profiler.enabled:
+            run_stats['profile'] = self.profile_report()
+        return timetable, fitness, run_stats
+
+    def hard_violations(self, timetable):
+        violations = self.evaluator.violations(timetable)
+        return sum(int(violations[check][0]) for check in self.HARD_CONSTRAINTS if check in violations)
+
+    def balance_faculty(self, timetable, fitness, run_stats):
+        """Re-staff as after a GA run, unless that breaks hard constraints the search kept"""
+        balanced, balanced_fitness = super().balance_faculty(timetable, fitness, run_stats)
+        if balanced is not timetable and self.hard_violations(balanced) > self.hard_violations(timetable):
+            run_stats['faculty_assignment']['applied'] = False
+            print(f"Faculty assignment broke a hard constraint; keeping the search's staffing: Fitness = {fitness}")
+            return timetable, fitness
+        return balanced, balanced_fitness
+
+    def run_islands(self, islands, migration_interval=25, migration_size=2, topology='ring', seed=None,
+                    callback=None):
+        """A complete search has no islands; it runs once in this process"""
+        return self.run(callback)
@@ -0,0 +1,100 @@
+# scheduler/decompose.py - Solve departments in parallel and reconcile shared resources
+import multiprocessing
+import numpy as np
+from scheduler.problem import FACULTY, CLASSROOM, EMPTY
+from scheduler.reschedule import RescheduleSearch
+
+
+POLL_INTERVAL = 1  # seconds between checks for a stop while departments are solved
+
+
+def run_engine(task):
+    """Pool task: run one department's engine, returning its index with the result"""
+    index, engine = task
+    return index, engine.run()
+
+
+def solve_departments(engines, processes=None):
+    """Run independent department engines concurrently; returns their run() results in order"""
+    return [result for _, result in sorted(iter_solve_departments(engines, processes), key=lambda item: item[0])]
+
+
+def iter_solve_departments(engines, processes=None, stopped=None):
+    """Run independent department engines concurrently, yielding (index, run() result) as each finishes.
+
+    Once stopped() is true no further results are waited for; departments
+    still being solved in the pool are terminated.
+    """
+    if len(engines) <= 1 or processes == 1:
+        for index, engine in enumerate(engines):
+            if stopped and stopped():
+                return
+            yield index, engine.run()
+        return
+    with multiprocessing.get_context().Pool(processes) as pool:
+        results = pool.imap_unordered(run_engine, list(enumerate(engines)))
+        for _ in engines:
+            while True:
+                if stopped and stopped():
+                    return
+                try:
+                    result = results.next(timeout=POLL_INTERVAL)
+                    break
+                except multiprocessing.TimeoutError:
+                    continue
+            yield result
+
+
+def combined_batches(batch_groups):
+    """Batches of every department/semester for one institution-wide engine.
+
+    Theory synchronization groups batches by department_id, so each copy is
+    keyed by (department_id, semester) to keep semesters of one department apart.
+    """
+    return [dict(batch, department_id=(batch['department_id'], batch['semester']))
+            for batches in batch_groups for batch in batches]
+
+
+def merge_timetables(engine, department_timetables):
+    """Encode decoded department timetables into one array of the institution-wide engine"""
+    merged = engine.problem.empty_timetable()
+    for timetable in department_timetables:
+        encoded = engine.problem.encode(timetable)
+        placed = (encoded != EMPTY).any(axis=-1)
+        merged[placed] = encoded[placed]
+    return merged
+
+
+def shared_resource_clashes(engine, timetable):
+    """Cells whose faculty member or classroom is double-booked, shape (batches, days, slots)"""
+    delta = engine.delta_evaluator(timetable)
+    days = np.arange(engine.problem.num_days).reshape(-1, 1)
+    slots = np.arange(engine.problem.num_slots)
+    faculty = timetable[..., FACULTY]
+    classroom = timetable[..., CLASSROOM]
+    clashes = (faculty >= 0) & (delta.faculty_bookings[np.maximum(faculty, 0), days, slots] > 1)
+    clashes |= (classroom >= 0) & (delta.classroom_bookings[np.maximum(classroom, 0), days, slots] > 1)
+    return clashes
+
+
+def reconcile(engine, timetable, time_limit=30, max_iterations=2000):
+    """Resolve faculty and classroom clashes between separately solved departments.
+
+    engine covers every department. Only the days of batches holding a clashing
+    class may change, with the same disruption penalty as rescheduling.
+    Returns the reconciled timetable, the changed cells and search statistics.
+    """
+    problem = engine.problem
+    clashes = shared_resource_clashes(engine, timetable)
+    if not clashes.any():
+        return timetable, [], {'iterations': 0, 'clashes': 0}
+
+    mutable = np.broadcast_to(clashes.any(axis=2, keepdims=True), clashes.shape).copy()
+    search = RescheduleSearch(engine, timetable, mutable,
+                              np.zeros((problem.num_faculty, problem.num_days), dtype=bool),
+                              np.zeros(problem.num_classrooms, dtype=bool))
+    result, stats = search.improve(timetable, time_limit, max_iterations)
+    stats['clashes'] = int(np.count_nonzero(clashes))
+    stats['clashes_after'] = int(np.count_nonzero(shared_resource_clashes(engine, result)))
+    changed = [tuple(cell) for cell in np.argwhere((result != timetable).any(axis=-1)).tolist()]
+    return result, changed, stats
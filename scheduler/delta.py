@@ -0,0 +1,206 @@
+# scheduler/delta.py - Incremental fitness evaluation for single-cell moves
+import numpy as np
+from scheduler.problem import SUBJECT, FACULTY, CLASSROOM, EMPTY
+
+
+class DeltaEvaluator:
+    """Keeps constraint counters for one timetable so moves are scored incrementally.
+
+    Shares problem, weights and limits with a PopulationEvaluator and always
+    reports the same score it would give the current timetable. Moves are
+    journalled until commit(); rollback() undoes everything since then. The
+    score is only recomputed when read, so place() changes a cell without
+    paying for it.
+    """
+
+    def __init__(self, evaluator, timetable):
+        self.evaluator = evaluator
+        self.problem = problem = evaluator.problem
+        self.weights = evaluator.weights
+        self.timetable = problem.empty_timetable()
+        self.journal = []
+
+        num_batches, num_days, num_slots = problem.num_batches, problem.num_days, problem.num_slots
+        self.faculty_bookings = np.zeros((problem.num_faculty, num_days, num_slots), dtype=np.int64)
+        self.classroom_bookings = np.zeros((problem.num_classrooms, num_days, num_slots), dtype=np.int64)
+        self.hours = np.zeros(problem.num_faculty, dtype=np.int64)
+        self.subject_count = np.zeros((num_batches, problem.num_subjects), dtype=np.int64)
+        self.day_count = np.zeros((num_batches, num_days), dtype=np.int64)
+        self.consecutive = np.zeros((num_batches, num_days), dtype=np.int64)
+        self.theory_count = np.zeros((problem.num_departments, num_days, num_slots, problem.num_subjects),
+                                     dtype=np.int64)
+        self.theory_distinct = np.zeros((problem.num_departments, num_days, num_slots), dtype=np.int64)
+        # Engines sharing theory genes per department cannot drift, so they leave the check out
+        self.track_theory = any(check == 'theory_synchronization' for check, _ in self.weights)
+
+        # Fixed slots indexed by cell; slots outside the grid are permanently violated
+        self.fixed_by_cell = {}
+        self.fixed_violations = {}
+        self.violations = {check: 0 for check in (
+            'faculty_conflicts', 'classroom_conflicts', 'workload_violations', 'time_preferences',
+            'consecutive_classes', 'lunch_breaks', 'subject_distribution', 'max_classes_per_day',
+            'fixed_slots', 'faculty_availability', 'theory_synchronization')}
+        for i, (b, d, s, subject, faculty, classroom) in enumerate(evaluator.compiled_fixed_slots):
+            self.violations['fixed_slots'] += 1
+            if s is not None:
+                self.fixed_by_cell.setdefault((b, d, s), []).append(i)
+                self.fixed_violations[i] = 1
+
+        for b, d, s in np.argwhere((timetable != EMPTY).any(axis=-1)).tolist():
+            self._place(b, d, s, tuple(timetable[b, d, s].tolist()))
+        self.cached_score = None
+
+    @property
+    def score(self):
+        """Fitness of the current timetable"""
+        if self.cached_score is None:
+            self.cached_score = self._score()
+        return self.cached_score
+
+    def _score(self):
+        total_violations = 0
+        for check, weight in self.weights:
+            total_violations += self._violation(check) * weight
+        return max(0, self.evaluator.base_score - total_violations)
+
+    def _violation(self, check):
+        if check == 'faculty_availability':
+            # Summed in faculty order, exactly as the batched and scalar checks do
+            violations = 0
+            limits = self.evaluator.availability_limits
+            for f in np.flatnonzero(self.hours > limits).tolist():
+                violations += (int(self.hours[f]) - limits[f])
+            return violations
+        return self.violations[check]
+
+    def _book(self, bookings, resource, d, s, sign, check):
+        count = bookings[resource, d, s]
+        if sign > 0 and count >= 1:
+            self.violations[check] += 1
+        elif sign < 0 and count >= 2:
+            self.violations[check] -= 1
+        bookings[resource, d, s] = count + sign
+
+    def _update(self, b, d, s, gene, sign):
+        """Add (sign=1) or remove (sign=-1) the counters of one gene"""
+        problem = self.problem
+        subject, faculty, classroom = gene
+        if faculty >= 0:
+            self._book(self.faculty_bookings, faculty, d, s, sign, 'faculty_conflicts')
+            hours = self.hours[faculty]
+            limit = self.evaluator.workload_limits[faculty]
+            self.violations['workload_violations'] += int(hours + sign > limit) - int(hours > limit)
+            self.hours[faculty] = hours + sign
+        if classroom >= 0:
+            self._book(self.classroom_bookings, classroom, d, s, sign, 'classroom_conflicts')
+        if subject < 0:
+            return
+
+        if s == problem.lunch_index:
+            self.violations['lunch_breaks'] += sign
+        else:
+            count = self.day_count[b, d]
+            limit = self.evaluator.max_classes_limit
+            if limit is not None:
+                self.violations['max_classes_per_day'] += int(max(count + sign - limit, 0) - max(count - limit, 0))
+            self.day_count[b, d] = count + sign
+
+        count = self.subject_count[b, subject]
+        required = problem.subject_classes_per_week[subject]
+        before = abs(count - required) if count > 0 else 0
+        after = abs(count + sign - required) if count + sign > 0 else 0
+        self.violations['subject_distribution'] += int(after - before)
+        self.subject_count[b, subject] = count + sign
+
+        if self.track_theory and problem.subject_is_theory[subject]:
+            g = problem.batch_department[b]
+            count = self.theory_count[g, d, s, subject]
+            if (count == 0) != (count + sign == 0):
+                distinct = self.theory_distinct[g, d, s]
+                self.violations['theory_synchronization'] += int(max(distinct + sign - 1, 0) - max(distinct - 1, 0))
+                self.theory_distinct[g, d, s] = distinct + sign
+            self.theory_count[g, d, s, subject] = count + sign
+
+    def _consecutive_row(self, b, d):
+        """Consecutive-class violations of one batch/day"""
+        violations = 0
+        consecutive_count = 0
+        limit = self.evaluator.consecutive_limit
+        for slot, subject in enumerate(self.timetable[b, d, :, SUBJECT].tolist()):
+            if slot == self.problem.lunch_index:
+                consecutive_count = 0
+                continue
+            consecutive_count = consecutive_count + 1 if subject >= 0 else 0
+            if consecutive_count > limit:
+                violations += 1
+        return violations
+
+    def _fixed_violation(self, i):
+        b, d, s, subject, faculty, classroom = self.evaluator.compiled_fixed_slots[i]
+        actual = self.timetable[b, d, s]
+        if actual[SUBJECT] == EMPTY:
+            return 1
+        violations = int(actual[SUBJECT] != subject)
+        if faculty is not None:
+            violations += int(actual[FACULTY] != faculty)
+        if classroom is not None:
+            violations += int(actual[CLASSROOM] != classroom)
+        return violations
+
+    def _place(self, b, d, s, gene):
+        """Overwrite a cell and update every counter it touches"""
+        old = tuple(self.timetable[b, d, s].tolist())
+        self._update(b, d, s, old, -1)
+        self.timetable[b, d, s] = gene
+        self._update(b, d, s, gene, 1)
+
+        if (old[SUBJECT] >= 0) != (gene[SUBJECT] >= 0):
+            row = self._consecutive_row(b, d)
+            self.violations['consecutive_classes'] += int(row - self.consecutive[b, d])
+            self.consecutive[b, d] = row
+
+        for i in self.fixed_by_cell.get((b, d, s), ()):
+            violation = self._fixed_violation(i)
+            self.violations['fixed_slots'] += violation - self.fixed_violations[i]
+            self.fixed_violations[i] = violation
+        return old
+
+    def place(self, b, d, s, gene):
+        """Set cell (b, d, s) to gene, journalled but without rescoring"""
+        gene = tuple(int(x) for x in gene)
+        old = self._place(b, d, s, gene)
+        self.journal.append((b, d, s, old))
+        self.cached_score = None
+
+    def apply(self, b, d, s, gene):
+        """Set cell (b, d, s) to gene and return the change in fitness"""
+        previous = self.score
+        self.place(b, d, s, gene)
+        return self.score - previous
+
+    def swap(self, cell_a, cell_b):
+        """Exchange the genes of two cells and return the change in fitness"""
+        gene_a = tuple(self.timetable[cell_a].tolist())
+        gene_b = tuple(self.timetable[cell_b].tolist())
+        return self.apply(*cell_a, gene_b) + self.apply(*cell_b, gene_a)
+
+    def violation_counts(self):
+        """Current {check: violations} for every weighted check"""
+        return {check: self._violation(check) for check, _ in self.weights}
+
+    def commit(self):
+        """Accept every move applied since the last commit"""
+        self.journal.clear()
+
+    def rollback(self):
+        """Undo every move applied since the last commit and return the change in fitness"""
+        previous = self.score
+        self.revert()
+        return self.score - previous
+
+    def revert(self):
+        """Undo every move applied since the last commit without rescoring"""
+        while self.journal:
+            b, d, s, old = self.journal.pop()
+            self._place(b, d, s, old)
+        self.cached_score = None
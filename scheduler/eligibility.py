@@ -0,0 +1,65 @@
+# scheduler/eligibility.py - In-memory faculty/subject eligibility index
+import sqlite3
+import numpy as np
+
+
+class EligibilityIndex:
+    """Which faculty members may teach which subjects, loaded once per run.
+
+    Holds a boolean (faculty, subject) matrix over the given ids and, for every
+    subject, the array of faculty indices that can teach it.
+    """
+
+    def __init__(self, pairs, faculty_ids=None, subject_ids=None):
+        pairs = [(faculty_id, subject_id) for faculty_id, subject_id in pairs]
+        if faculty_ids is None:
+            faculty_ids = sorted({faculty_id for faculty_id, _ in pairs})
+        if subject_ids is None:
+            subject_ids = sorted({subject_id for _, subject_id in pairs})
+        self.faculty_ids = list(faculty_ids)
+        self.subject_ids = list(subject_ids)
+        self.faculty_index = {fid: i for i, fid in enumerate(self.faculty_ids)}
+        self.subject_index = {sid: i for i, sid in enumerate(self.subject_ids)}
+
+        self.matrix = np.zeros((len(self.faculty_ids), len(self.subject_ids)), dtype=bool)
+        for faculty_id, subject_id in pairs:
+            f = self.faculty_index.get(faculty_id)
+            s = self.subject_index.get(subject_id)
+            if f is not None and s is not None:
+                self.matrix[f, s] = True
+
+        # subject index -> faculty indices able to teach it
+        self.candidates = [np.flatnonzero(self.matrix[:, s]) for s in range(len(self.subject_ids))]
+
+    @classmethod
+    def from_database(cls, faculty_ids=None, subject_ids=None, db_path='timetable.db'):
+        """Load every faculty_subjects row in a single query"""
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT faculty_id, subject_id FROM faculty_subjects')
+        pairs = cursor.fetchall()
+        conn.close()
+        return cls(pairs, faculty_ids, subject_ids)
+
+    def pairs(self):
+        """All (faculty_id, subject_id) pairs in the index"""
+        faculty, subjects = np.nonzero(self.matrix)
+        return [(self.faculty_ids[f], self.subject_ids[s]) for f, s in zip(faculty, subjects)]
+
+    def restrict(self, faculty_ids, subject_ids):
+        """Index over another set of faculty and subject ids"""
+        return EligibilityIndex(self.pairs(), faculty_ids, subject_ids)
+
+    def can_teach(self, faculty_id, subject_id):
+        f = self.faculty_index.get(faculty_id)
+        s = self.subject_index.get(subject_id)
+        return f is not None and s is not None and bool(self.matrix[f, s])
+
+    def candidates_for(self, subject_id):
+        """Faculty indices able to teach a subject (empty for unknown subjects)"""
+        s = self.subject_index.get(subject_id)
+        return self.candidates[s] if s is not None else np.empty(0, dtype=np.int64)
+
+    def faculty_for(self, subject_id):
+        """Faculty ids able to teach a subject"""
+        return [self.faculty_ids[f] for f in self.candidates_for(subject_id)]
@@ -0,0 +1,27 @@
+# scheduler/engines.py - Registry of the engines that can build a timetable
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.cp import ConstraintTimetable
+from scheduler.annealing import AnnealingTimetable
+from scheduler.pareto import ParetoTimetable
+
+# Engine name -> class; every engine takes the same arguments and has the same run() interface
+ENGINES = {
+    'genetic': EnhancedGeneticTimetable,
+    'cp': ConstraintTimetable,
+    'annealing': AnnealingTimetable,
+    'pareto': ParetoTimetable
+}
+ENGINE_LABELS = {
+    'genetic': 'Genetic algorithm',
+    'cp': 'Constraint programming (complete search)',
+    'annealing': 'Simulated annealing',
+    'pareto': 'Multi-objective genetic algorithm (Pareto front)'
+}
+DEFAULT_ENGINE = 'genetic'
+
+
+def create_engine(name, subjects, faculty, classrooms, batches, constraints, eligibility=None):
+    """Instantiate a registered engine by name"""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}'; choose one of {', '.join(ENGINES)}")
+    return ENGINES[name](subjects, faculty, classrooms, batches, constraints, eligibility)
@@ -0,0 +1,178 @@
+# scheduler/fitness.py - Whole-population fitness evaluation
+import numpy as np
+from scheduler.problem import SUBJECT, FACULTY, CLASSROOM, EMPTY
+from scheduler.profiling import Profiler
+
+
+class PopulationEvaluator:
+    """Scores a stacked population of shape (P, batches, days, slots, 3) at once.
+
+    Every check mirrors the matching check_* method of the genetic algorithm
+    and returns one violation count per individual, so the weighted total is
+    exactly the score calculate_fitness gives a single timetable.
+    """
+
+    # Largest key space counted with a one-hot bincount before falling back to sorting
+    ONE_HOT_LIMIT = 1 << 24
+
+    def __init__(self, problem, weights, workload_limits, max_classes_per_day=None,
+                 fixed_slots=(), availability_limits=(), base_score=1000, consecutive_limit=3, profiler=None):
+        self.problem = problem
+        self.weights = list(weights)
+        self.workload_limits = np.asarray(workload_limits)
+        self.max_classes_limit = max_classes_per_day
+        self.compiled_fixed_slots = list(fixed_slots)
+        self.availability_limits = np.asarray(availability_limits, dtype=np.float64)
+        self.base_score = base_score
+        self.consecutive_limit = consecutive_limit
+        self.profiler = profiler or Profiler()
+
+    def evaluate(self, population):
+        """Return the fitness of every individual"""
+        violations = self.violations(population)
+        total_violations = 0
+        # Accumulate in calculate_fitness order so float rounding matches
+        for check, weight in self.weights:
+            total_violations = total_violations + violations[check] * weight
+        return np.maximum(0, self.base_score - total_violations)
+
+    def violations(self, population):
+        """Return {check: per-individual violation counts} for every weighted check"""
+        population = np.asarray(population)
+        if population.ndim == 4:
+            population = population[np.newaxis]
+        state = {'hours': None}
+        if not self.profiler.enabled:
+            return {check: getattr(self, check)(population, state) for check, _ in self.weights}
+        violations = {}
+        for check, _ in self.weights:
+            with self.profiler.constraint(check, len(population)):
+                violations[check] = getattr(self, check)(population, state)
+        return violations
+
+    def faculty_loads(self, population):
+        """Classes assigned to each faculty member in every individual, shape (P, faculty)"""
+        population = np.asarray(population)
+        if population.ndim == 4:
+            population = population[np.newaxis]
+        return self._hours(population, {'hours': None})
+
+    def _hours(self, population, state):
+        """Classes assigned to each faculty member, shape (P, faculty)"""
+        if state['hours'] is None:
+            state['hours'] = self._resource_counts(population[..., FACULTY], self.problem.num_faculty, per_slot=False)
+        return state['hours']
+
+    def _resource_counts(self, resources, num_resources, per_slot=True):
+        """Bookings per (individual, resource[, day, slot]) via one bincount"""
+        num_individuals, _, num_days, num_slots = resources.shape
+        keys = np.arange(num_individuals).reshape(-1, 1, 1, 1) * num_resources + resources
+        size = num_individuals * num_resources
+        if per_slot:
+            keys = (keys * num_days + np.arange(num_days).reshape(-1, 1)) * num_slots + np.arange(num_slots)
+            size *= num_days * num_slots
+        # Unbooked cells are counted in one extra bin that is dropped afterwards
+        keys = np.where(resources >= 0, keys, size)
+        return np.bincount(keys.ravel(), minlength=size + 1)[:size].reshape(num_individuals, -1)
+
+    def _clashes(self, resources, num_resources):
+        counts = self._resource_counts(resources, num_resources)
+        # Every booking beyond the first of a (resource, day, slot) is a clash
+        return counts.sum(axis=1) - np.count_nonzero(counts, axis=1)
+
+    def faculty_conflicts(self, population, state):
+        return self._clashes(population[..., FACULTY], self.problem.num_faculty)
+
+    def classroom_conflicts(self, population, state):
+        return self._clashes(population[..., CLASSROOM], self.problem.num_classrooms)
+
+    def workload_violations(self, population, state):
+        return np.count_nonzero(self._hours(population, state) > self.workload_limits, axis=1)
+
+    def time_preferences(self, population, state):
+        return np.zeros(len(population), dtype=np.int64)
+
+    def consecutive_classes(self, population, state):
+        occupied = population[..., SUBJECT] >= 0
+        violations = np.zeros(len(population), dtype=np.int64)
+        consecutive_count = np.zeros(occupied.shape[:3], dtype=np.int64)
+        for slot in range(self.problem.num_slots):
+            if slot == self.problem.lunch_index:
+                consecutive_count[:] = 0
+                continue
+            consecutive_count = np.where(occupied[..., slot], consecutive_count + 1, 0)
+            violations += np.count_nonzero(consecutive_count > self.consecutive_limit, axis=(1, 2))
+        return violations
+
+    def lunch_breaks(self, population, state):
+        if self.problem.lunch_index is None:
+            return np.zeros(len(population), dtype=np.int64)
+        return np.count_nonzero(population[:, :, :, self.problem.lunch_index, SUBJECT] >= 0, axis=(1, 2))
+
+    def subject_distribution(self, population, state):
+        subjects = population[..., SUBJECT]
+        num_individuals, num_batches = subjects.shape[:2]
+        num_subjects = self.problem.num_subjects
+        size = num_individuals * num_batches * num_subjects
+        keys = np.arange(num_individuals * num_batches).reshape(num_individuals, num_batches, 1, 1) * num_subjects + subjects
+        keys = np.where(subjects >= 0, keys, size)
+        subject_count = np.bincount(keys.ravel(), minlength=size + 1)[:size]
+        subject_count = subject_count.reshape(num_individuals, num_batches, num_subjects)
+        deviation = np.abs(subject_count - self.problem.subject_classes_per_week)
+        return np.where(subject_count > 0, deviation, 0).sum(axis=(1, 2))
+
+    def max_classes_per_day(self, population, state):
+        occupied = (population[..., SUBJECT] >= 0) & self.problem.teaching_slots
+        excess = occupied.sum(axis=3) - self.max_classes_limit
+        return np.where(excess > 0, excess, 0).sum(axis=(1, 2))
+
+    def fixed_slots(self, population, state):
+        violations = np.zeros(len(population), dtype=np.int64)
+        for batch_idx, day, time_slot, subject, faculty, classroom in self.compiled_fixed_slots:
+            if time_slot is None:
+                violations += 1
+                continue
+            actual = population[:, batch_idx, day, time_slot]
+            empty = actual[:, SUBJECT] == EMPTY
+            mismatches = (actual[:, SUBJECT] != subject).astype(np.int64)
+            if faculty is not None:
+                mismatches += actual[:, FACULTY] != faculty
+            if classroom is not None:
+                mismatches += actual[:, CLASSROOM] != classroom
+            violations += np.where(empty, 1, mismatches)
+        return violations
+
+    def faculty_availability(self, population, state):
+        hours = self._hours(population, state)
+        over = hours > self.availability_limits
+        violations = np.zeros(len(population), dtype=np.float64)
+        # Add faculty excesses one at a time, in faculty order, like the scalar check
+        for f in np.flatnonzero(over.any(axis=0)):
+            violations = violations + np.where(over[:, f], hours[:, f] - self.availability_limits[f], 0.0)
+        return violations
+
+    def theory_synchronization(self, population, state):
+        subjects = population[..., SUBJECT]
+        num_individuals = len(population)
+        theory = subjects >= 0
+        theory[theory] = self.problem.subject_is_theory[subjects[theory]]
+        p, b, d, s = np.nonzero(theory)
+        if not len(p):
+            return np.zeros(num_individuals, dtype=np.int64)
+        # A (department, day, slot) group holding n distinct theory subjects adds n - 1
+        group_size = self.problem.num_departments * self.problem.num_days * self.problem.num_slots
+        groups = ((p * self.problem.num_departments + self.problem.batch_department[b])
+                  * self.problem.num_days + d) * self.problem.num_slots + s
+        keys = groups * self.problem.num_subjects + subjects[theory]
+        size = num_individuals * group_size * self.problem.num_subjects
+        if size <= self.ONE_HOT_LIMIT:
+            # One-hot presence of every (group, subject) pair
+            present = np.bincount(keys, minlength=size).reshape(num_individuals, group_size, -1) > 0
+            distinct_subjects = np.count_nonzero(present, axis=(1, 2))
+            distinct_groups = np.count_nonzero(present.any(axis=2), axis=1)
+            return distinct_subjects - distinct_groups
+        keys = np.unique(keys)
+        groups = np.unique(groups)
+        distinct_subjects = np.bincount(keys // (self.problem.num_subjects * group_size), minlength=num_individuals)
+        distinct_groups = np.bincount(groups // group_size, minlength=num_individuals)
+        return distinct_subjects - distinct_groups
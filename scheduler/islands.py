@@ -0,0 +1,247 @@
+# scheduler/islands.py - Island-model genetic algorithm across worker processes
+import random
+import time
+import multiprocessing
+import numpy as np
+from scheduler.termination import GENERATIONS, STOPPED
+from scheduler.profiling import merge_reports
+from scheduler.shared import SharedArrays, share_engine, load_engine, detach_segments
+
+TOPOLOGIES = ('ring', 'full')
+
+
+def migration_sources(island, num_islands, topology):
+    """Islands whose emigrants arrive at the given island"""
+    if topology == 'ring':
+        return [(island - 1) % num_islands]
+    return [i for i in range(num_islands) if i != island]
+
+
+def exchange_migrants(population, messages, topology, migration_size):
+    """Copy every island's immigrants over its free rows; returns their fitness per island.
+
+    population holds every island's population, messages the islands'
+    ('migrate', ...) messages by island. Emigrant rows are the best of their
+    island and free rows the worst, so no copy overwrites a row another copy
+    of the round still reads.
+    """
+    num_islands = len(messages)
+    immigrant_fitness = {}
+    for island in range(num_islands):
+        arrivals = [(fitness, source, row) for source in migration_sources(island, num_islands, topology)
+                    for row, fitness in zip(messages[source][2], messages[source][3])]
+        # A fully connected island keeps only the best of all arrivals
+        arrivals = sorted(arrivals, key=lambda arrival: arrival[0])[-migration_size:]
+        for (_, source, row), free in zip(arrivals, messages[island][4]):
+            population[island, free] = population[source, row]
+        immigrant_fitness[island] = [fitness for fitness, _, _ in arrivals]
+    return immigrant_fitness
+
+
+def island_worker(payload, island, populations_spec, migration_interval, migration_size, seed, conn):
+    """Evolve one island and exchange migrants with the coordinator through conn.
+
+    The engine comes as share_engine()'s payload, and the island's population
+    lives in row island of the shared populations segment, so migrants are
+    copied there by the coordinator instead of travelling through conn.
+    Sends ('migrate', best fitness, emigrant rows, their fitness, rows free
+    for immigrants) at every migration and waits for the immigrants' fitness,
+    or None when the run is over. Once the island stops it writes its best
+    timetable to row island of the segment's 'best' and sends ('done', best
+    fitness, run stats). However it exits, it closes both segments first.
+    """
+    random.seed(seed)
+    np.random.seed(seed % (1 << 32))
+    engine = load_engine(payload)
+    segment = SharedArrays.attach(*populations_spec)
+    try:
+        evolve_island(engine, island, segment, migration_interval, migration_size, seed, conn)
+    finally:
+        conn.close()
+        segment.close()
+        # Nothing views the problem segment once the engine is gone
+        del engine
+        detach_segments()
+
+
+def evolve_island(engine, island, segment, migration_interval, migration_size, seed, conn):
+    """island_worker's run on the loaded engine and the attached populations segment"""
+    # The engine was pickled with the coordinator's generator; every island draws its own stream
+    engine.rng = np.random.default_rng(seed)
+    population = segment['population'][island]
+
+    engine.profiler.reset()
+    with engine.profiler.phase('initialization'):
+        population[...] = engine.initial_population(len(population))
+    best_timetable = None
+    best_fitness = 0
+    hard_satisfied = False
+    termination = engine.termination()
+    generation, stop_reason = -1, GENERATIONS
+    engine.fitness_cache.reset_stats()
+
+    for generation in range(engine.generations):
+        with engine.profiler.phase('evaluation'):
+            fitness_scores = engine.evaluate_population(population)
+        engine.memetic_step(population, fitness_scores)
+        order = np.argsort(fitness_scores)
+
+        if fitness_scores[order[-1]] > best_fitness or best_timetable is None:
+            best_fitness = fitness_scores[order[-1]]
+            best_timetable = population[order[-1]].copy()
+            if engine.stop_on_hard_constraints:
+                hard_satisfied = engine.hard_constraints_satisfied(best_timetable)
+
+        stop_reason = termination.check(generation, best_fitness, hard_satisfied)
+        if stop_reason:
+            break
+
+        # Send the best individuals out and let immigrants replace the worst
+        if (generation + 1) % migration_interval == 0:
+            emigrants = order[-migration_size:].tolist()
+            worst = order[:migration_size].tolist()
+            with engine.profiler.phase('migration'):
+                conn.send(('migrate', best_fitness, emigrants, [fitness_scores[i] for i in emigrants], worst))
+                immigrant_fitness = conn.recv()
+            if immigrant_fitness is None:
+                # Another island stopped the run
+                stop_reason = None
+                break
+            for i, fitness in zip(worst, immigrant_fitness):
+                fitness_scores[i] = fitness
+
+        population[...] = engine.next_generation(population, fitness_scores)
+
+    run_stats = termination.stats(generation, stop_reason)
+    run_stats['fitness_cache'] = engine.fitness_cache.stats()
+    if engine.profiler.enabled:
+        run_stats['profile'] = engine.profiler.report()
+    segment['best'][island] = best_timetable
+    conn.send(('done', best_fitness, run_stats))
+
+
+def run_islands(engine, num_islands, migration_interval=25, migration_size=2, topology='ring', seed=None,
+                callback=None):
+    """Split the engine's population over num_islands processes and return the global best.
+
+    Every migration_interval generations each island sends its migration_size
+    best individuals to its neighbours ('ring') or to every other island
+    ('full'); arrivals replace the island's worst individuals. Islands apply
+    the engine's termination policy themselves; once one stops, the others stop
+    at their next migration. callback receives the progress at every
+    migration (generation, best fitness, elapsed seconds) and, like
+    engine.stop(), can end the run there. Returns the best timetable, its
+    fitness and run statistics like engine.run().
+
+    Workers attach to shared memory instead of unpickling their own copies:
+    one segment holds the engine's compiled problem, another every island's
+    population and best timetable. Both are unlinked when the run ends,
+    whether the islands finished, crashed or were interrupted.
+
+    Island runs are not checkpointed: an interrupted one starts over,
+    whatever the engine's checkpoint_path and resume say, and its run_stats
+    has 'resumable' False and 'resumed_from' 0.
+    """
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown migration topology: {topology}")
+    if num_islands <= 1:
+        return engine.run(callback)
+
+    population_size = max(engine.population_size // num_islands, 4)
+    migration_size = max(1, min(migration_size, population_size // 2))
+    migration_interval = max(1, migration_interval)
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(num_islands)]
+
+    if engine.checkpoint_path:
+        print("Island runs are not checkpointed; an interrupted one starts over")
+    problem_segment, payload = share_engine(engine)
+    populations = SharedArrays.create({
+        'population': ((num_islands, population_size) + engine.problem.shape, np.int32),
+        'best': ((num_islands,) + engine.problem.shape, np.int32)
+    })
+    context = multiprocessing.get_context()
+    islands = []
+    started = time.monotonic()
+    results = {}
+    stopped = False
+    try:
+        for island in range(num_islands):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=island_worker,
+                args=(payload, island, populations.spec, migration_interval, migration_size, seeds[island],
+                      child_conn),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            islands.append((process, parent_conn))
+
+        migration = 0
+        while len(results) < num_islands:
+            messages = {island: conn.recv() for island, (_, conn) in enumerate(islands) if island not in results}
+            results.update((island, (populations['best'][island].copy(),) + message[1:])
+                           for island, message in messages.items() if message[0] == 'done')
+            if not results and callback is not None:
+                progress = {
+                    'generation': (migration + 1) * migration_interval - 1,
+                    'best_fitness': float(max(message[1] for message in messages.values())),
+                    'elapsed': round(time.monotonic() - started, 3)
+                }
+                if callback(progress):
+                    engine.stop()
+            stopped = stopped or engine.stop_requested
+            if results or stopped:
+                # Every island stops in the same round as the first one
+                for island, message in messages.items():
+                    if message[0] == 'migrate':
+                        islands[island][1].send(None)
+                continue
+
+            migration += 1
+            arrivals = exchange_migrants(populations['population'], messages, topology, migration_size)
+            for island, (_, conn) in enumerate(islands):
+                conn.send(arrivals[island])
+            print(f"Generation {migration * migration_interval}: "
+                  f"Best Fitness = {max(message[1] for message in messages.values())}")
+    except BaseException:
+        # A failed island (or an interrupted coordinator) stops the whole run
+        for process, _ in islands:
+            process.terminate()
+        raise
+    finally:
+        for process, conn in islands:
+            conn.close()
+            process.join()
+        populations.unlink()
+        problem_segment.unlink()
+
+    results = [results[island] for island in range(num_islands)]
+    best_timetable, best_fitness, _ = max(results, key=lambda result: result[1])
+    stop_reasons = [STOPPED] if stopped else [stats['stop_reason'] for _, _, stats in results if stats['stop_reason']]
+    engine.stop_requested = False
+    hits = sum(stats['fitness_cache']['hits'] for _, _, stats in results)
+    misses = sum(stats['fitness_cache']['misses'] for _, _, stats in results)
+    run_stats = {
+        'stop_reason': stop_reasons[0] if stop_reasons else GENERATIONS,
+        'generations': max(stats['generations'] for _, _, stats in results),
+        'elapsed': round(time.monotonic() - started, 3),
+        'resumed_from': 0,
+        'resumable': False,
+        # Every island keeps its own cache
+        'fitness_cache': {
+            'hits': hits,
+            'misses': misses,
+            'size': sum(stats['fitness_cache']['size'] for _, _, stats in results),
+            'maxsize': engine.fitness_cache.maxsize * num_islands,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0
+        }
+    }
+    engine.profiler.reset()
+    best_timetable, best_fitness = engine.polish(best_timetable, best_fitness, run_stats)
+    if engine.profiler.enabled:
+        # Island totals are summed across processes, so they can exceed the elapsed time
+        island_reports = [stats['profile'] for _, _, stats in results]
+        run_stats['profile'] = dict(engine.profile_report(),
+                                    **merge_reports(island_reports + [engine.profiler.report()]))
+    return best_timetable, best_fitness, run_stats
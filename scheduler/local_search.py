@@ -0,0 +1,215 @@
+# scheduler/local_search.py - Tabu search repair on top of delta evaluation
+import random
+import time
+import numpy as np
+from scheduler.problem import SUBJECT, FACULTY, CLASSROOM, EMPTY
+
+
+class TabuSearch:
+    """Repairs a timetable with single-cell moves scored by a DeltaEvaluator.
+
+    Each iteration tries every faculty and classroom reassignment of the cells
+    involved in hard-constraint violations, plus relocations and swaps inside
+    their batch, and takes the best move whose cells are not tabu. The
+    objective is (hard violations, weighted violations), so hard constraints
+    are repaired first and the unclamped penalty still guides the search when
+    the fitness itself is saturated at zero.
+    """
+
+    def __init__(self, engine, tenure=7, sample_size=30, patience=50):
+        self.engine = engine
+        self.problem = engine.problem
+        self.tenure = tenure
+        self.sample_size = sample_size
+        self.patience = patience
+        weighted = {check for check, _ in engine.evaluator.weights}
+        self.hard_constraints = [check for check in engine.HARD_CONSTRAINTS if check in weighted]
+
+        # Classroom indices by the room type each kind of subject needs
+        lab_rooms = [i for i, c in enumerate(engine.classrooms) if c['type'] == 'LAB']
+        theory_rooms = [i for i, c in enumerate(engine.classrooms) if c['type'] == 'CLASSROOM']
+        self.rooms_for = [lab_rooms if is_lab else theory_rooms for is_lab in self.problem.subject_is_lab]
+        # Genes of the cells locked by fixed slots; EMPTY faculty/classroom may change
+        self.fixed_genes = engine.fixed_genes
+        # Theory genes shared per department move for all its batches at once
+        self.shared_theory = engine.shared_theory_genes
+
+    def objective(self, delta):
+        violations = delta.violation_counts()
+        hard = sum(violations[check] for check in self.hard_constraints)
+        return hard, sum(violations[check] * weight for check, weight in delta.weights)
+
+    def conflict_cells(self, delta):
+        """(batch, day, slot) cells taking part in a hard-constraint violation"""
+        problem = self.problem
+        timetable = delta.timetable
+        days = np.arange(problem.num_days).reshape(-1, 1)
+        slots = np.arange(problem.num_slots)
+
+        faculty = timetable[..., FACULTY]
+        classroom = timetable[..., CLASSROOM]
+        conflicts = (faculty >= 0) & (delta.faculty_bookings[np.maximum(faculty, 0), days, slots] > 1)
+        conflicts |= (classroom >= 0) & (delta.classroom_bookings[np.maximum(classroom, 0), days, slots] > 1)
+
+        subjects = timetable[..., SUBJECT]
+        theory = subjects >= 0
+        theory[theory] = problem.subject_is_theory[subjects[theory]]
+        departments = problem.batch_department.reshape(-1, 1, 1)
+        conflicts |= theory & (delta.theory_distinct[departments, days, slots] > 1)
+
+        cells = [tuple(cell) for cell in np.argwhere(conflicts).tolist()]
+        for i, violation in delta.fixed_violations.items():
+            if violation:
+                cells.append(tuple(delta.evaluator.compiled_fixed_slots[i][:3]))
+        return cells
+
+    def moves(self, delta, cell):
+        """Candidate moves for one cell, each a list of (batch, day, slot, gene) changes"""
+        b, d, s = cell
+        subject, faculty, classroom = delta.timetable[b, d, s].tolist()
+        moves = []
+
+        for i in delta.fixed_by_cell.get(cell, ()):
+            _, _, _, fixed_subject, fixed_faculty, fixed_classroom = delta.evaluator.compiled_fixed_slots[i]
+            # Ids outside the problem can never be satisfied
+            if fixed_subject >= 0 and (fixed_faculty or 0) >= 0 and (fixed_classroom or 0) >= 0:
+                # Every eligible faculty member (with a random room) and every room (with a random
+                # faculty member) the fixed slot leaves open
+                faculty_options = [fixed_faculty] if fixed_faculty is not None else \
+                    self.engine.eligibility.candidates[fixed_subject].tolist() or [EMPTY]
+                room_options = [fixed_classroom] if fixed_classroom is not None else \
+                    self.rooms_for[fixed_subject] or [EMPTY]
+                shared = self.department_theory(delta, b, d, s, fixed_subject)
+                for f in faculty_options:
+                    moves.append([(b, d, s, (fixed_subject, f, random.choice(room_options)))] + shared)
+                for r in room_options:
+                    moves.append([(b, d, s, (fixed_subject, random.choice(faculty_options), r))] + shared)
+
+        if subject >= 0:
+            for f in self.engine.eligibility.candidates[subject].tolist():
+                if f != faculty:
+                    moves.append([(b, d, s, (subject, f, classroom))])
+            for r in self.rooms_for[subject]:
+                if r != classroom:
+                    moves.append([(b, d, s, (subject, faculty, r))])
+
+        return moves + self.swap_moves(delta, cell, self.sample_size)
+
+    def is_shared(self, gene):
+        """Whether a gene is a theory gene shared by its department"""
+        return self.shared_theory and gene[SUBJECT] >= 0 and self.problem.subject_is_theory[gene[SUBJECT]]
+
+    def department_theory(self, delta, b, d, s, subject):
+        """Changes giving the other batches of b's department a shared theory subject at (day, slot)"""
+        if not self.is_shared((subject,)):
+            return []
+        candidates = self.engine.eligibility.candidates[subject].tolist() or [EMPTY]
+        rooms = self.rooms_for[subject] or [EMPTY]
+        return [(c, d, s, (subject, random.choice(candidates), random.choice(rooms)))
+                for c in self.problem.department_batches[self.problem.batch_department[b]].tolist()
+                if c != b and delta.timetable[c, d, s, SUBJECT] != subject]
+
+    def swap_moves(self, delta, cell, count):
+        """Relocations or swaps of a cell with random teaching cells of the same batch.
+
+        Shared theory genes are swapped for the whole department, together with
+        whatever its other batches hold in the two cells.
+        """
+        b, d, s = cell
+        gene = tuple(delta.timetable[cell].tolist())
+        teaching = np.flatnonzero(self.problem.teaching_slots).tolist()
+        batches = self.problem.department_batches[self.problem.batch_department[b]]
+        moves = []
+        for _ in range(count):
+            other = (b, random.randrange(self.problem.num_days), random.choice(teaching))
+            other_gene = tuple(delta.timetable[other].tolist())
+            if other_gene == gene:
+                continue
+            if self.is_shared(gene) or self.is_shared(other_gene):
+                moves.append(self.engine.department_swap(delta.timetable, batches, (d, s), other[1:]))
+            else:
+                moves.append([(b, d, s, other_gene), other + (gene,)])
+        return moves
+
+    def keeps_fixed_slots(self, move):
+        """Whether a move leaves every locked fixed slot as it must be"""
+        for b, d, s, gene in move:
+            fixed = self.fixed_genes.get((b, d, s))
+            if fixed is not None and any(value != want for value, want in zip(gene, fixed) if want >= 0):
+                return False
+        return True
+
+    def random_moves(self, delta):
+        """Swaps of random cells, used once no hard violations remain"""
+        moves = []
+        for _ in range(self.sample_size):
+            cell = (random.randrange(self.problem.num_batches), random.randrange(self.problem.num_days),
+                    random.randrange(self.problem.num_slots))
+            moves.extend(self.swap_moves(delta, cell, 1))
+        return moves
+
+    def improve(self, timetable, time_limit=None, max_iterations=1000):
+        """Search from a timetable and return the best one found with search statistics"""
+        started = time.monotonic()
+        delta = self.engine.delta_evaluator(timetable)
+        current = best = self.objective(delta)
+        best_timetable = delta.timetable.copy()
+        hard_before = best[0]
+        tabu = {}
+        iteration = stale = 0
+
+        while iteration < max_iterations and stale < self.patience:
+            if time_limit is not None and time.monotonic() - started >= time_limit:
+                break
+            iteration += 1
+
+            cells = self.conflict_cells(delta)
+            if cells:
+                moves = []
+                for cell in random.sample(cells, min(len(cells), self.sample_size)):
+                    moves.extend(self.moves(delta, cell))
+            else:
+                moves = self.random_moves(delta)
+            if self.fixed_genes:
+                moves = [move for move in moves if self.keeps_fixed_slots(move)]
+
+            chosen, chosen_value = None, None
+            fallback, fallback_value = None, None
+            for move in moves:
+                for b, d, s, gene in move:
+                    delta.place(b, d, s, gene)
+                value = self.objective(delta)
+                delta.revert()
+                if fallback is None or value < fallback_value:
+                    fallback, fallback_value = move, value
+                is_tabu = any(tabu.get((b, d, s), 0) > iteration for b, d, s, _ in move)
+                # Aspiration: a tabu move is allowed when it beats the best found so far
+                if (is_tabu and value >= best) or (chosen is not None and value >= chosen_value):
+                    continue
+                chosen, chosen_value = move, value
+
+            if chosen is None:
+                if fallback is None:
+                    break
+                # Every move is tabu; take the best of them rather than stall
+                chosen, chosen_value = fallback, fallback_value
+            for b, d, s, gene in chosen:
+                delta.place(b, d, s, gene)
+                tabu[(b, d, s)] = iteration + self.tenure
+            delta.commit()
+            current = chosen_value
+
+            if current < best:
+                best = current
+                best_timetable = delta.timetable.copy()
+                stale = 0
+            else:
+                stale += 1
+
+        stats = {
+            'iterations': iteration,
+            'hard_violations_before': int(hard_before),
+            'hard_violations_after': int(best[0]),
+            'elapsed': round(time.monotonic() - started, 3)
+        }
+        return best_timetable, stats
@@ -0,0 +1,96 @@
+# scheduler/occupancy.py - Bitmask occupancy of batches, faculty and rooms
+import random
+import numpy as np
+from scheduler.problem import SUBJECT, EMPTY
+
+
+class OccupancyIndex:
+    """Which (day, slot) cells each batch, faculty member and classroom already uses.
+
+    Every resource has one integer bitmask with bit day * slots + slot set when
+    it is booked, so the cells free for a whole group of resources are a few
+    ANDs and the first or a random free cell is a bit scan.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.num_slots = problem.num_slots
+        self.teaching = 0
+        for d in range(problem.num_days):
+            for s in np.flatnonzero(problem.teaching_slots).tolist():
+                self.teaching |= 1 << (d * self.num_slots + s)
+
+        self.batches = [0] * problem.num_batches
+        self.faculty = [0] * problem.num_faculty
+        self.classrooms = [0] * problem.num_classrooms
+        # Classes of every subject scheduled per batch
+        self.subject_count = np.zeros((problem.num_batches, problem.num_subjects), dtype=np.int64)
+
+    @classmethod
+    def from_timetable(cls, problem, timetable):
+        """Index the classes already placed in a timetable"""
+        occupancy = cls(problem)
+        for b, d, s in np.argwhere(timetable[..., SUBJECT] >= 0).tolist():
+            occupancy.book([b], d, s, timetable[b, d, s].tolist())
+        return occupancy
+
+    def bit(self, day, time_slot):
+        return 1 << (day * self.num_slots + time_slot)
+
+    def cell(self, bit_index):
+        """(day, slot) of a bit index"""
+        return divmod(bit_index, self.num_slots)
+
+    def free_cells(self, batches, faculty=EMPTY, classroom=EMPTY):
+        """Mask of teaching cells free for every batch and the given faculty/classroom index"""
+        busy = 0
+        for b in batches:
+            busy |= self.batches[b]
+        if faculty >= 0:
+            busy |= self.faculty[faculty]
+        if classroom >= 0:
+            busy |= self.classrooms[classroom]
+        return self.teaching & ~busy
+
+    def is_free(self, mask, day, time_slot):
+        return not mask & self.bit(day, time_slot)
+
+    def first_cell(self, mask):
+        """Lowest free (day, slot) of a mask, or None"""
+        if not mask:
+            return None
+        return self.cell((mask & -mask).bit_length() - 1)
+
+    def random_cell(self, mask):
+        """Uniformly chosen (day, slot) of a mask, or None"""
+        if not mask:
+            return None
+        for _ in range(random.randrange(mask.bit_count())):
+            mask &= mask - 1  # Drop the lowest set bit
+        return self.cell((mask & -mask).bit_length() - 1)
+
+    def book(self, batches, day, time_slot, gene):
+        """Mark a (subject, faculty, classroom) gene as placed for the batches"""
+        subject, faculty, classroom = gene
+        bit = self.bit(day, time_slot)
+        for b in batches:
+            self.batches[b] |= bit
+            if subject >= 0:
+                self.subject_count[b, subject] += 1
+        if faculty >= 0:
+            self.faculty[faculty] |= bit
+        if classroom >= 0:
+            self.classrooms[classroom] |= bit
+
+    def release(self, batches, day, time_slot, gene):
+        """Undo book() of the same gene, for indexes whose bookings never overlap"""
+        subject, faculty, classroom = gene
+        bit = self.bit(day, time_slot)
+        for b in batches:
+            self.batches[b] &= ~bit
+            if subject >= 0:
+                self.subject_count[b, subject] -= 1
+        if faculty >= 0:
+            self.faculty[faculty] &= ~bit
+        if classroom >= 0:
+            self.classrooms[classroom] &= ~bit
@@ -0,0 +1,238 @@
+# scheduler/pareto.py - NSGA-II multi-objective engine returning a Pareto front of timetables
+import numpy as np
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.termination import GENERATIONS
+
+# Objectives every timetable is scored on, all minimised
+OBJECTIVES = ('hard_penalty', 'soft_penalty', 'load_imbalance')
+DEFAULT_FRONT_SIZE = 5
+
+
+def non_dominated_fronts(objectives):
+    """Row indices of an (n, objectives) matrix grouped into non-dominated fronts, best front first"""
+    objectives = np.asarray(objectives)
+    no_worse = (objectives[:, np.newaxis] <= objectives[np.newaxis]).all(axis=2)
+    better = (objectives[:, np.newaxis] < objectives[np.newaxis]).any(axis=2)
+    dominates = no_worse & better  # dominates[i, j]: row i dominates row j
+    dominated_by = dominates.sum(axis=0)
+    remaining = np.ones(len(objectives), dtype=bool)
+    fronts = []
+    while remaining.any():
+        front = np.flatnonzero(remaining & (dominated_by == 0))
+        fronts.append(front)
+        remaining[front] = False
+        dominated_by -= dominates[front].sum(axis=0)
+    return fronts
+
+
+def crowding_distance(objectives):
+    """Crowding distance of every row of one front's (n, objectives) matrix; the extremes get infinity"""
+    objectives = np.asarray(objectives, dtype=np.float64)
+    if len(objectives) <= 2:
+        return np.full(len(objectives), np.inf)
+    distance = np.zeros(len(objectives))
+    for column in objectives.T:
+        order = np.argsort(column, kind='stable')
+        span = column[order[-1]] - column[order[0]]
+        distance[order[[0, -1]]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (column[order[2:]] - column[order[:-2]]) / span
+    return distance
+
+
+class ParetoTimetable(EnhancedGeneticTimetable):
+    """NSGA-II: evolves timetables on separate objectives instead of one weighted score.
+
+    Every timetable is scored on OBJECTIVES, all minimised: the weighted
+    penalty of the hard constraints, that of the soft ones, and the standard
+    deviation of the hours of the faculty able to teach any subject. The hard
+    penalty stays an objective rather than a constraint ranked first: emptier
+    timetables have fewer clashes, so ranking it first would strip classes.
+
+    Parents are picked by binary tournaments on (front, crowding distance)
+    and bred with the GA's crossover and mutation. Parents and children
+    together are ranked by non-dominated sorting, and whole fronts form the
+    next population; crowding distance decides within the last front that
+    fits, which always keeps its member with the least total (hard plus soft)
+    penalty, so the best weighted fitness never drops between generations.
+
+    run() returns the timetable with the least total penalty, i.e. the best
+    weighted fitness, as the other engines do, and run_stats['pareto_front']
+    holding up to pareto_front_size distinct trade-offs from the first front
+    (see pareto_front), each polished. Termination works as in the GA on the
+    best weighted fitness. Runs are not checkpointed.
+    """
+
+    def __init__(self, subjects, faculty, classrooms, batches, constraints, eligibility=None):
+        super().__init__(subjects, faculty, classrooms, batches, constraints, eligibility)
+        self.pareto_front_size = constraints.get('pareto_front_size') or DEFAULT_FRONT_SIZE
+        # Load balance is only measured over faculty who can teach something here
+        self.teaching_faculty = np.flatnonzero(self.eligibility.matrix.any(axis=1))
+
+    def objectives(self, population):
+        """(P, len(OBJECTIVES)) objective matrix and weighted fitness of a stacked population"""
+        violations = self.evaluator.violations(population)
+        hard = np.zeros(len(population))
+        soft = np.zeros(len(population))
+        total = 0
+        # Accumulate in calculate_fitness order so the fitness matches it exactly
+        for check, weight in self.evaluator.weights:
+            penalty = violations[check] * weight
+            total = total + penalty
+            if check in self.HARD_CONSTRAINTS:
+                hard += penalty
+            else:
+                soft += penalty
+        loads = self.evaluator.faculty_loads(population)[:, self.teaching_faculty]
+        imbalance = loads.std(axis=1) if loads.shape[1] else np.zeros(len(population))
+        fitness = np.maximum(0, self.evaluator.base_score - total)
+        return np.column_stack([hard, soft, imbalance]), fitness
+
+    def rank(self, objectives):
+        """Front index and crowding distance of every individual"""
+        ranks = np.empty(len(objectives), dtype=np.int64)
+        crowding = np.empty(len(objectives))
+        for i, front in enumerate(non_dominated_fronts(objectives)):
+            ranks[front] = i
+            crowding[front] = crowding_distance(objectives[front])
+        return ranks, crowding
+
+    def crowded_tournament(self, ranks, crowding, count):
+        """Indices of count binary tournament winners: lower front, then larger crowding distance"""
+        order = np.lexsort((-crowding, ranks))
+        standing = np.empty(len(order))
+        standing[order] = -np.arange(len(order))
+        return self.tournament_selection(standing, count, tournament_size=2)
+
+    def survivors(self, objectives, size):
+        """Indices of the size individuals kept by non-dominated sorting and crowding distance"""
+        kept = []
+        for front in non_dominated_fronts(objectives):
+            if len(kept) + len(front) <= size:
+                kept.extend(front.tolist())
+                continue
+            crowding = crowding_distance(objectives[front])
+            crowding[np.argmin(objectives[front, :2].sum(axis=1))] = np.inf
+            order = np.argsort(-crowding, kind='stable')
+            kept.extend(front[order[:size - len(kept)]].tolist())
+            break
+        return np.array(kept, dtype=np.int64)
+
+    def spread(self, objectives):
+        """Up to pareto_front_size distinct members of the first front, least total penalty first.
+
+        The rest follow by crowding distance, so the extremes of every
+        objective come before timetables close to others. Members with the
+        same objectives are one trade-off and are listed once.
+        """
+        front = non_dominated_fronts(objectives)[0]
+        _, first = np.unique(objectives[front], axis=0, return_index=True)
+        front = front[np.sort(first)]
+        crowding = crowding_distance(objectives[front])
+        best = int(np.argmin(objectives[front, :2].sum(axis=1)))
+        order = sorted(range(len(front)), key=lambda i: (i != best, -crowding[i]))
+        return front[order[:self.pareto_front_size]]
+
+    def pareto_front(self, population, objectives, fitness, run_stats):
+        """Polish the spread of the final front and return the trade-offs still non-dominated.
+
+        Each member is re-staffed and repaired like a single-objective run's
+        best, the final repair time being shared among them; run_stats gets
+        the polishing statistics of the first, best member.
+        """
+        chosen = self.spread(objectives)
+        polished, polish_stats = [], []
+        for i in chosen.tolist():
+            timetable, timetable_fitness, stats = population[i], fitness[i], {}
+            if self.faculty_balancing:
+                timetable, timetable_fitness = self.balance_faculty(timetable, timetable_fitness, stats)
+            if self.local_search_time:
+                with self.profiler.phase('local_search'):
+                    timetable, timetable_fitness, stats['local_search'] = self.repair(
+                        timetable, self.local_search_time / len(chosen))
+            polished.append(timetable)
+            polish_stats.append(stats)
+        polished = np.stack(polished)
+        objectives, fitness = self.objectives(polished)
+
+        kept = self.spread(objectives)
+        run_stats.update(polish_stats[kept[0]])
+        violations = self.evaluator.violations(polished[kept])
+        members = []
+        for position, i in enumerate(kept.tolist()):
+            members.append({
+                'timetable': polished[i],
+                'fitness': float(fitness[i]),
+                'objectives': {name: round(float(value), 4) for name, value in zip(OBJECTIVES, objectives[i])},
+                'hard_violations': sum(int(violations[check][position]) for check in self.HARD_CONSTRAINTS
+                                       if check in violations)
+            })
+        return members
+
+    def iter_run(self):
+        """Generator form of run(): yields a progress dict after every generation.
+
+        Besides the GA's statistics each holds front_size, the number of
+        individuals on the first front. The generator's return value is
+        run()'s (timetable, fitness, run_stats).
+        """
+        termination = self.termination()
+        generation, stop_reason = -1, GENERATIONS
+        self.fitness_cache.reset_stats()
+        self.profiler.reset()
+
+        with self.profiler.phase('initialization'):
+            population = self.initial_population(self.population_size)
+        with self.profiler.phase('evaluation'):
+            objectives, fitness = self.objectives(population)
+
+        for generation in range(self.generations):
+            with self.profiler.phase('selection'):
+                ranks, crowding = self.rank(objectives)
+            # Fitness bottoms out at zero, the total penalty keeps telling timetables apart
+            best = int(np.argmin(objectives[:, :2].sum(axis=1)))
+            violations = {check: int(count[0]) for check, count in self.evaluator.violations(population[best]).items()}
+            hard_satisfied = all(violations.get(check, 0) == 0 for check in self.HARD_CONSTRAINTS)
+
+            progress = self.generation_progress(generation, population, fitness, population[best], fitness[best],
+                                                violations, termination)
+            progress['front_size'] = int(np.count_nonzero(ranks == 0))
+            yield progress
+
+            stop_reason = termination.check(generation, fitness[best], hard_satisfied, self.stop_requested)
+            if stop_reason:
+                break
+
+            # As many children as parents, bred like the GA's from crowded tournament winners
+            with self.profiler.phase('selection'):
+                parents = self.crowded_tournament(ranks, crowding, len(population) + len(population) % 2)
+            children = self.breed(population, parents.reshape(-1, 2), self.crossover_rate,
+                                  self.mutation_rate)[:len(population)]
+            with self.profiler.phase('evaluation'):
+                child_objectives, child_fitness = self.objectives(children)
+            population = np.concatenate([population, children])
+            objectives = np.concatenate([objectives, child_objectives])
+            fitness = np.concatenate([fitness, child_fitness])
+            with self.profiler.phase('selection'):
+                kept = self.survivors(objectives, self.population_size)
+            population, objectives, fitness = population[kept], objectives[kept], fitness[kept]
+
+            if generation % 50 == 0:
+                # best indexed the population before survivor selection reordered it
+                print(f"Generation {generation}: Best Fitness = {progress['best_fitness']}, "
+                      f"Pareto front of {progress['front_size']}")
+        self.stop_requested = False
+
+        run_stats = termination.stats(generation, stop_reason)
+        run_stats['pareto_front'] = self.pareto_front(population, objectives, fitness, run_stats)
+        best = run_stats['pareto_front'][0]
+        print(f"Stopped after {generation + 1} generations ({stop_reason}): Best Fitness = {best['fitness']}, "
+              f"{len(run_stats['pareto_front'])} trade-offs on the Pareto front")
+        if self.profiler.enabled:
+            run_stats['profile'] = self.profile_report()
+        return best['timetable'], best['fitness'], run_stats
+
+    def run_islands(self, islands, migration_interval=25, migration_size=2, topology='ring', seed=None,
+                    callback=None):
+        """Non-dominated sorting needs the whole population; it runs once in this process"""
+        return self.run(callback)
@@ -0,0 +1,147 @@
+# scheduler/problem.py - Dense integer encoding of a timetabling problem
+import numpy as np
+
+# Gene channels of a timetable array
+SUBJECT = 0
+FACULTY = 1
+CLASSROOM = 2
+
+# Marker for an empty slot / unassigned faculty or classroom
+EMPTY = -1
+# Marker for an id that is not part of this problem (never matches a gene)
+UNKNOWN = -2
+
+
+class ProblemInstance:
+    """Maps batches, days, slots, subjects, faculty and rooms to dense indices.
+
+    A timetable is an int array of shape (batches, days, slots, 3) whose last
+    axis holds the subject, faculty and classroom index of a class, or EMPTY.
+    """
+
+    def __init__(self, subjects, faculty, classrooms, batches, days, time_slots, lunch_break=None):
+        self.subjects = subjects
+        self.faculty = faculty
+        self.classrooms = classrooms
+        self.batches = batches
+        self.days = list(days)
+        self.time_slots = list(time_slots)
+        self.lunch_break = lunch_break
+
+        self.subject_ids = [s['id'] for s in subjects]
+        self.faculty_ids = [f['id'] for f in faculty]
+        self.classroom_ids = [c['id'] for c in classrooms]
+        self.batch_ids = [b['id'] for b in batches]
+
+        self.subject_index = {sid: i for i, sid in enumerate(self.subject_ids)}
+        self.faculty_index = {fid: i for i, fid in enumerate(self.faculty_ids)}
+        self.classroom_index = {cid: i for i, cid in enumerate(self.classroom_ids)}
+        self.batch_index = {bid: i for i, bid in enumerate(self.batch_ids)}
+        self.day_index = {day: i for i, day in enumerate(self.days)}
+        self.slot_index = {slot: i for i, slot in enumerate(self.time_slots)}
+        self.lunch_index = self.slot_index.get(lunch_break)
+
+        self.num_batches = len(self.batch_ids)
+        self.num_days = len(self.days)
+        self.num_slots = len(self.time_slots)
+        self.num_subjects = len(self.subject_ids)
+        self.num_faculty = len(self.faculty_ids)
+        self.num_classrooms = len(self.classroom_ids)
+        self.shape = (self.num_batches, self.num_days, self.num_slots, 3)
+
+        # Per-subject attributes
+        self.subject_is_theory = np.array([s.get('subject_type') == 'THEORY' for s in subjects], dtype=bool)
+        self.subject_is_lab = np.array([s.get('subject_type') == 'LAB' for s in subjects], dtype=bool)
+        self.subject_classes_per_week = np.array([s.get('classes_per_week', 3) for s in subjects], dtype=np.int64)
+
+        # Departments are coded densely so batches can be grouped cheaply
+        department_codes = {}
+        self.batch_department = np.array(
+            [department_codes.setdefault(b.get('department_id'), len(department_codes)) for b in batches],
+            dtype=np.int64
+        )
+        self.department_codes = department_codes
+        self.num_departments = len(department_codes)
+        # Batch indices of every department, the batches sharing its theory genes
+        self.department_batches = [np.flatnonzero(self.batch_department == g) for g in range(self.num_departments)]
+        # department_membership[g, b] is 1 when batch b belongs to department g, for grouping by matmul
+        self.department_membership = (self.batch_department ==
+                                      np.arange(self.num_departments).reshape(-1, 1)).astype(np.float32)
+
+        # Slots that may hold a class (everything except the lunch break)
+        self.teaching_slots = np.ones(self.num_slots, dtype=bool)
+        if self.lunch_index is not None:
+            self.teaching_slots[self.lunch_index] = False
+
+    def empty_timetable(self):
+        """Return a timetable with every slot empty"""
+        return np.full(self.shape, EMPTY, dtype=np.int32)
+
+    def gene(self, subject_id, faculty_id=None, classroom_id=None):
+        """Encode a (subject, faculty, classroom) id triple as a gene"""
+        return (
+            self.subject_index.get(subject_id, UNKNOWN),
+            EMPTY if faculty_id is None else self.faculty_index.get(faculty_id, UNKNOWN),
+            EMPTY if classroom_id is None else self.classroom_index.get(classroom_id, UNKNOWN)
+        )
+
+    def encode(self, timetable):
+        """Convert a {batch_id: {day: {time_slot: slot}}} dict into an array"""
+        encoded = self.empty_timetable()
+        for batch_id, schedule in timetable.items():
+            b = self.batch_index.get(batch_id)
+            if b is None:
+                continue
+            for day, time_slots in schedule.items():
+                d = self.day_index.get(day)
+                if d is None:
+                    continue
+                for time_slot, slot_data in time_slots.items():
+                    s = self.slot_index.get(time_slot)
+                    if s is None or not slot_data:
+                        continue
+                    encoded[b, d, s] = self.gene(slot_data['subject_id'], slot_data.get('faculty_id'),
+                                                 slot_data.get('classroom_id'))
+        return encoded
+
+    def decode(self, timetable):
+        """Convert a timetable array back into the dict form stored in the database"""
+        genes = np.asarray(timetable).tolist()
+        decoded = {}
+        for b, batch_id in enumerate(self.batch_ids):
+            decoded[batch_id] = {}
+            for d, day in enumerate(self.days):
+                decoded[batch_id][day] = {}
+                for s, time_slot in enumerate(self.time_slots):
+                    subject, faculty, classroom = genes[b][d][s]
+                    if subject < 0:
+                        decoded[batch_id][day][time_slot] = None
+                    else:
+                        decoded[batch_id][day][time_slot] = {
+                            'subject_id': self.subject_ids[subject],
+                            'faculty_id': self.faculty_ids[faculty] if faculty >= 0 else None,
+                            'classroom_id': self.classroom_ids[classroom] if classroom >= 0 else None
+                        }
+        return decoded
+
+    def compile_fixed_slots(self, fixed_slots):
+        """Translate fixed slot dicts into (batch, day, slot, subject, faculty, classroom) indices.
+
+        Fixed slots for batches or days outside this problem are dropped, matching
+        how they were ignored by the dict based check. A time slot outside the
+        grid keeps a slot index of None so it always counts as unsatisfied.
+        """
+        compiled = []
+        for fixed_slot in fixed_slots:
+            b = self.batch_index.get(fixed_slot['batch_id'])
+            d = self.day_index.get(fixed_slot['day'])
+            if b is None or d is None:
+                continue
+            s = self.slot_index.get(fixed_slot['time_slot'])
+            subject = self.subject_index.get(fixed_slot['subject_id'], UNKNOWN)
+            faculty_id = fixed_slot.get('faculty_id')
+            classroom_id = fixed_slot.get('classroom_id')
+            faculty = self.faculty_index.get(faculty_id, UNKNOWN) if faculty_id else None
+            classroom = self.classroom_index.get(classroom_id, UNKNOWN) if classroom_id else None
+            compiled.append((b, d, s, subject, faculty, classroom))
+        return compiled
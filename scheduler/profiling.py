@@ -0,0 +1,81 @@
+# scheduler/profiling.py - Opt-in timing of GA phases and constraint checks
+import contextlib
+import time
+
+# Shared no-op context returned while profiling is off
+NULL_SECTION = contextlib.nullcontext()
+
+
+class Section:
+    """Adds the wall time of a with-block to one profile entry"""
+
+    __slots__ = ('entry', 'items', 'started')
+
+    def __init__(self, entry, items):
+        self.entry = entry
+        self.items = items
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.entry[0] += time.perf_counter() - self.started
+        self.entry[1] += 1
+        self.entry[2] += self.items
+        return False
+
+
+class Profiler:
+    """Cumulative seconds and call counts per GA phase and per constraint check.
+
+    phase() and constraint() return a context manager; while the profiler is
+    disabled that is a shared null context, so instrumented code costs one
+    method call per section.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = {}
+        self.constraints = {}
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_SECTION
+        return Section(self.phases.setdefault(name, [0.0, 0, 0]), 1)
+
+    def constraint(self, name, individuals=1):
+        """Time one check over a number of timetables (a batched population counts each)"""
+        if not self.enabled:
+            return NULL_SECTION
+        return Section(self.constraints.setdefault(name, [0.0, 0, 0]), individuals)
+
+    def reset(self):
+        self.phases.clear()
+        self.constraints.clear()
+
+    def report(self):
+        """JSON-friendly totals, each section ordered by time spent"""
+        return {
+            'phases': {name: {'seconds': round(seconds, 6), 'calls': calls}
+                       for name, (seconds, calls, _) in sorted(self.phases.items(), key=lambda item: -item[1][0])},
+            'constraints': {name: {'seconds': round(seconds, 6), 'calls': calls, 'timetables': timetables}
+                            for name, (seconds, calls, timetables) in
+                            sorted(self.constraints.items(), key=lambda item: -item[1][0])}
+        }
+
+
+def merge_reports(reports):
+    """Sum several profiler reports, e.g. those of every island"""
+    merged = {'phases': {}, 'constraints': {}}
+    for report in reports:
+        for section in ('phases', 'constraints'):
+            for name, entry in report.get(section, {}).items():
+                total = merged[section].setdefault(name, dict.fromkeys(entry, 0))
+                for key, value in entry.items():
+                    total[key] += value
+    for section in merged.values():
+        for entry in section.values():
+            entry['seconds'] = round(entry['seconds'], 6)
+    return {section: dict(sorted(entries.items(), key=lambda item: -item[1]['seconds']))
+            for section, entries in merged.items()}
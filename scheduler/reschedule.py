@@ -0,0 +1,122 @@
+# scheduler/reschedule.py - Incremental repair of a saved timetable after a change
+import random
+import numpy as np
+from scheduler.problem import SUBJECT, FACULTY, CLASSROOM, EMPTY
+from scheduler.local_search import TabuSearch
+
+
+class RescheduleSearch(TabuSearch):
+    """Tabu search that may only touch the mutable cells of a timetable.
+
+    Moves never assign an unavailable faculty member or a removed classroom,
+    classes left without one count as hard violations, and every cell that
+    differs from the original timetable costs disruption_weight so unaffected
+    schedules stay as they were.
+    """
+
+    def __init__(self, engine, original, mutable, unavailable, removed, disruption_weight=5, **kwargs):
+        super().__init__(engine, **kwargs)
+        self.original = original[mutable]
+        self.mutable = mutable
+        self.unavailable = unavailable
+        self.removed = removed
+        self.disruption_weight = disruption_weight
+        self.mutable_cells = [tuple(cell) for cell in np.argwhere(mutable).tolist()]
+
+    def allowed(self, move):
+        for b, d, s, (subject, faculty, classroom) in move:
+            if not self.mutable[b, d, s]:
+                return False
+            if faculty >= 0 and self.unavailable[faculty, d]:
+                return False
+            if classroom >= 0 and self.removed[classroom]:
+                return False
+        return True
+
+    def objective(self, delta):
+        hard, penalty = super().objective(delta)
+        genes = delta.timetable[self.mutable]
+        unstaffed = np.count_nonzero((genes[:, SUBJECT] >= 0) & ((genes[:, FACULTY] < 0) | (genes[:, CLASSROOM] < 0)))
+        changed = np.count_nonzero((genes != self.original).any(axis=1))
+        return hard + unstaffed, penalty + self.disruption_weight * changed
+
+    def conflict_cells(self, delta):
+        cells = [cell for cell in super().conflict_cells(delta) if self.mutable[cell]]
+        genes = delta.timetable
+        unstaffed = self.mutable & (genes[..., SUBJECT] >= 0) & ((genes[..., FACULTY] < 0) | (genes[..., CLASSROOM] < 0))
+        return cells + [tuple(cell) for cell in np.argwhere(unstaffed).tolist()]
+
+    def moves(self, delta, cell):
+        return [move for move in super().moves(delta, cell) if self.allowed(move)]
+
+    def random_moves(self, delta):
+        moves = []
+        for _ in range(self.sample_size):
+            cell = random.choice(self.mutable_cells)
+            moves.extend(move for move in self.swap_moves(delta, cell, 1) if self.allowed(move))
+        return moves
+
+
+def reschedule(engine, timetable, unavailable_faculty=(), removed_classrooms=(), time_limit=5, max_iterations=500):
+    """Repair a timetable after faculty/classroom changes or new fixed slots.
+
+    unavailable_faculty is a list of (faculty_id, days) pairs, where an empty
+    days list means every day; fixed slots are taken from the engine. Only the
+    affected cells, the classes of the same (day, slot) using their faculty or
+    classroom and the affected batches' adjacent slots may change, and the
+    disruption penalty keeps those changes few. Returns the new timetable, its
+    fitness, the changed (batch, day, slot) cells and search statistics.
+    """
+    problem = engine.problem
+    unavailable = np.zeros((problem.num_faculty, problem.num_days), dtype=bool)
+    for faculty_id, days in unavailable_faculty:
+        f = problem.faculty_index.get(faculty_id)
+        if f is None:
+            continue
+        if days:
+            unavailable[f, [problem.day_index[day] for day in days if day in problem.day_index]] = True
+        else:
+            unavailable[f] = True
+    removed = np.zeros(problem.num_classrooms, dtype=bool)
+    for classroom_id in removed_classrooms:
+        if classroom_id in problem.classroom_index:
+            removed[problem.classroom_index[classroom_id]] = True
+
+    # Take the lost faculty and rooms out of the classes that used them
+    working = timetable.copy()
+    days = np.arange(problem.num_days).reshape(-1, 1)
+    faculty = working[..., FACULTY]
+    classroom = working[..., CLASSROOM]
+    lost_faculty = (faculty >= 0) & unavailable[np.maximum(faculty, 0), days]
+    lost_classroom = (classroom >= 0) & removed[np.maximum(classroom, 0)]
+    faculty[lost_faculty] = EMPTY
+    classroom[lost_classroom] = EMPTY
+
+    impacted = lost_faculty | lost_classroom
+    # Faculty and classroom every impacted cell held or is now fixed to
+    wanted = {}
+    for b, d, s, subject, fixed_faculty, fixed_classroom in engine.evaluator.compiled_fixed_slots:
+        if s is None:
+            continue
+        gene = timetable[b, d, s]
+        if gene[SUBJECT] != subject or fixed_faculty not in (None, gene[FACULTY]) or \
+                fixed_classroom not in (None, gene[CLASSROOM]):
+            impacted[b, d, s] = True
+            wanted[b, d, s] = (fixed_faculty, fixed_classroom)
+    mutable = impacted.copy()
+    for b, d, s in np.argwhere(impacted).tolist():
+        # Neighbours: the classes of the same (day, slot) holding one of those
+        # resources, so clashes can make way, and the batch's adjacent slots
+        column = timetable[:, d, s]
+        for channel, fixed in zip((FACULTY, CLASSROOM), wanted.get((b, d, s), (None, None))):
+            resources = [r for r in (timetable[b, d, s, channel], fixed) if r is not None and r >= 0]
+            mutable[:, d, s] |= np.isin(column[:, channel], resources)
+        mutable[b, d, max(s - 1, 0):s + 2] = True
+
+    if not mutable.any():
+        return timetable.copy(), engine.calculate_fitness(timetable), [], {'iterations': 0}
+
+    search = RescheduleSearch(engine, timetable, mutable, unavailable, removed)
+    result, stats = search.improve(working, time_limit, max_iterations)
+    changed = [tuple(cell) for cell in np.argwhere((result != timetable).any(axis=-1)).tolist()]
+    return result, engine.calculate_fitness(result), changed, stats
@@ -0,0 +1,158 @@
+# scheduler/rooms.py - Deterministic classroom assignment by min-cost bipartite matching
+import numpy as np
+from scheduler.problem import SUBJECT, CLASSROOM, EMPTY
+from scheduler.cache import FitnessCache
+
+# Cost of holding a batch's class in a room; each assignment minimises the total
+FOREIGN_ROOM_COST = 1  # the room belongs to another department
+UNDERSIZED_ROOM_COST = 100  # the room has fewer seats than the batch has students
+WASTED_SEAT_COST = 1e-6  # per empty seat; small enough never to outweigh a foreign room
+
+# Kind of session a batch has in a (day, slot), and the room type each needs
+NO_SESSION = 0
+THEORY_SESSION = 1
+LAB_SESSION = 2
+ROOM_TYPES = {THEORY_SESSION: 'CLASSROOM', LAB_SESSION: 'LAB'}
+
+
+def min_cost_assignment(cost):
+    """Column assigned to each row of a cost matrix with rows <= columns, minimising the total.
+
+    Hungarian algorithm with shortest augmenting paths (O(rows^2 * columns)),
+    the scan over columns vectorised; rows only augment when a greedy pick of
+    their cheapest column collides.
+    """
+    rows, columns = cost.shape
+    # Row reduction: rows whose cheapest column is still free take it straight away
+    u = np.concatenate([[0], cost.min(axis=1)])
+    v = np.zeros(columns + 1)
+    row_of = np.zeros(columns + 1, dtype=np.int64)  # 1-based row matched to each column, 0 = free
+    way = np.zeros(columns + 1, dtype=np.int64)
+    unmatched = []
+    for i, j in enumerate(cost.argmin(axis=1).tolist(), 1):
+        if row_of[j + 1]:
+            unmatched.append(i)
+        else:
+            row_of[j + 1] = i
+    for i in unmatched:
+        row_of[0] = i
+        j0 = 0
+        min_reduced = np.full(columns + 1, np.inf)
+        used = np.zeros(columns + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = row_of[j0]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = ~used[1:] & (reduced < min_reduced[1:])
+            min_reduced[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(used[1:], np.inf, min_reduced[1:])
+            j1 = int(np.argmin(candidates)) + 1
+            step = candidates[j1 - 1]
+            u[row_of[used]] += step
+            v[used] -= step
+            min_reduced[~used] -= step
+            j0 = j1
+            if row_of[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            row_of[j0] = row_of[j1]
+            j0 = j1
+
+    assignment = np.empty(rows, dtype=np.int64)
+    matched = np.flatnonzero(row_of[1:])
+    assignment[row_of[1:][matched] - 1] = matched
+    return assignment
+
+
+class RoomAssigner:
+    """Gives the classes of every (day, slot) rooms by min-cost bipartite matching.
+
+    Each class is matched to a distinct room of the type its subject needs,
+    preferring rooms big enough for the batch, then rooms of the batch's own
+    department, then the tightest fit. Rooms therefore never clash unless a
+    (day, slot) holds more classes of a type than there are rooms of it; the
+    classes left over then share the room costing them least, so
+    classroom_conflicts still reports the shortage. The assignment only
+    depends on which batches have which kind of class, so results are cached
+    per pattern.
+    """
+
+    def __init__(self, problem, cache_size=4096):
+        self.problem = problem
+        self.subject_kind = np.where(problem.subject_is_lab, LAB_SESSION, THEORY_SESSION).astype(np.int8)
+        # Indexed by a subject channel directly, EMPTY (-1) reading the trailing NO_SESSION
+        self.session_kind = np.append(self.subject_kind, np.int8(NO_SESSION))
+
+        capacity = np.array([c.get('capacity') or 0 for c in problem.classrooms])
+        strength = np.array([b.get('strength') or 0 for b in problem.batches])
+        # Institution-wide engines key batches by (department_id, semester)
+        batch_departments = [b.get('department_id') for b in problem.batches]
+        batch_departments = [d[0] if isinstance(d, tuple) else d for d in batch_departments]
+        foreign = np.array([[d != c.get('department_id') for c in problem.classrooms] for d in batch_departments],
+                           dtype=bool).reshape(problem.num_batches, problem.num_classrooms)
+        # cost[b, r]: batch b taught in room r
+        self.cost = (FOREIGN_ROOM_COST * foreign +
+                     UNDERSIZED_ROOM_COST * (capacity[None, :] < strength[:, None]) +
+                     WASTED_SEAT_COST * np.maximum(capacity[None, :] - strength[:, None], 0)).astype(np.float64)
+        self.rooms_of_kind = {kind: np.array([i for i, c in enumerate(problem.classrooms) if c['type'] == room_type],
+                                             dtype=np.int64)
+                              for kind, room_type in ROOM_TYPES.items()}
+
+        self.pinned = {}  # (day, slot) -> {batch: room} from fixed slots naming a classroom
+        self.cache = FitnessCache(cache_size)
+
+    def pin(self, compiled_fixed_slots):
+        """Keep the classroom of fixed slots that name one"""
+        self.pinned = {}
+        for b, d, s, _, _, classroom in compiled_fixed_slots:
+            if s is not None and classroom is not None and classroom >= 0:
+                self.pinned.setdefault((d, s), {})[b] = classroom
+        self.cache.clear()
+
+    def match(self, kinds, pinned):
+        """Room index (or EMPTY) for every batch given the kind of class each has"""
+        rooms = np.full(len(kinds), EMPTY, dtype=np.int32)
+        for kind, candidates in self.rooms_of_kind.items():
+            sessions = np.flatnonzero(kinds == kind)
+            if pinned:
+                for b in sessions.tolist():
+                    if b in pinned:
+                        rooms[b] = pinned[b]
+                sessions = np.array([b for b in sessions.tolist() if b not in pinned], dtype=np.int64)
+                candidates = candidates[~np.isin(candidates, list(pinned.values()))]
+            if not len(sessions) or not len(candidates):
+                continue
+
+            cost = self.cost[np.ix_(sessions, candidates)]
+            if len(sessions) <= len(candidates):
+                rooms[sessions] = candidates[min_cost_assignment(cost)]
+            else:
+                # More classes than rooms: match every room, the rest take their cheapest room
+                rooms[sessions] = candidates[np.argmin(cost, axis=1)]
+                rooms[sessions[min_cost_assignment(cost.T)]] = candidates
+        return rooms
+
+    def cell_rooms(self, timetable, day, slot):
+        """Room index (or EMPTY) of every batch's class in one (day, slot), leaving the timetable as is"""
+        subjects = timetable[:, day, slot, SUBJECT]
+        kinds = self.session_kind[subjects]
+        pinned = self.pinned.get((day, slot))
+        key = (day, slot, kinds.tobytes()) if pinned else kinds.tobytes()
+        rooms = self.cache.get(key)
+        if rooms is None:
+            rooms = self.match(kinds, pinned)
+            self.cache.put(key, rooms)
+        return rooms
+
+    def assign_cell(self, timetable, day, slot):
+        """Rewrite the classroom of every class in one (day, slot) in place"""
+        timetable[:, day, slot, CLASSROOM] = self.cell_rooms(timetable, day, slot)
+
+    def assign(self, timetable):
+        """Rewrite every classroom of a timetable in place and return it"""
+        for day in range(self.problem.num_days):
+            for slot in range(self.problem.num_slots):
+                self.assign_cell(timetable, day, slot)
+        return timetable
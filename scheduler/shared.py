@@ -0,0 +1,187 @@
+# scheduler/shared.py - Numpy arrays in shared memory segments for multi-process solvers
+import gc
+import io
+import pickle
+import weakref
+from functools import reduce
+from multiprocessing import shared_memory
+import numpy as np
+
+# Offsets of arrays within a segment are multiples of this many bytes
+ALIGNMENT = 64
+
+# Read-only arrays of an engine's compiled problem, by attribute path, that workers attach to
+PROBLEM_ARRAYS = (
+    'problem.subject_is_theory', 'problem.subject_is_lab', 'problem.subject_classes_per_week',
+    'problem.batch_department', 'problem.department_membership', 'problem.teaching_slots',
+    'eligibility.matrix', 'workload_limits', 'fixed_mask', 'department_locked',
+    'room_assigner.subject_kind', 'room_assigner.cost',
+    'evaluator.workload_limits', 'evaluator.availability_limits'
+)
+
+# Segments this process attached to while unpickling, by name: the segment and weak references
+# to the arrays viewing it, kept open until detach_segments() finds none of them in use
+attached = {}
+
+
+def in_use(views):
+    """Whether any weakly referenced array is alive; views derived from one keep it alive.
+
+    Closing a segment does not wait for numpy views of it, which would then
+    read unmapped memory, so segments are only closed once this is False.
+    """
+    return any(view() is not None for view in views)
+
+
+class SharedArrays:
+    """Named numpy arrays laid out in one multiprocessing.shared_memory segment.
+
+    The creating process owns the segment: it unlinks it once every worker is
+    done, crashed or not, and leaving the with block of an owner does so.
+    Workers attach by (name, layout), see the spec property, and get views of
+    the same memory, so nothing is copied however many of them there are.
+    A handle closed while views of its arrays are still in use leaves the
+    memory mapped (at the latest until the process exits).
+    """
+
+    def __init__(self, memory, layout, owner, readonly=False):
+        self.memory = memory
+        self.layout = layout  # key -> (offset, shape, dtype)
+        self.owner = owner
+        self.arrays = {}
+        for key, (offset, shape, dtype) in layout.items():
+            array = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+            array.flags.writeable = not readonly
+            self.arrays[key] = array
+        self.views = [weakref.ref(array) for array in self.arrays.values()]
+
+    @classmethod
+    def create(cls, shapes):
+        """New segment holding an uninitialised array for every key -> (shape, dtype)"""
+        layout, size = {}, 0
+        for key, (shape, dtype) in shapes.items():
+            dtype = np.dtype(dtype)
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            layout[key] = (size, tuple(shape), dtype.str)
+            size += int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        return cls(shared_memory.SharedMemory(create=True, size=max(size, 1)), layout, owner=True)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """New segment holding a copy of every key -> array"""
+        arrays = {key: np.asarray(array) for key, array in arrays.items()}
+        segment = cls.create({key: (array.shape, array.dtype) for key, array in arrays.items()})
+        for key, array in arrays.items():
+            segment.arrays[key][...] = array
+        return segment
+
+    @classmethod
+    def attach(cls, name, layout, readonly=False):
+        return cls(shared_memory.SharedMemory(name=name), layout, owner=False, readonly=readonly)
+
+    @property
+    def spec(self):
+        """(name, layout) a worker attaches with"""
+        return self.memory.name, self.layout
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        """Drop this handle's views and unmap the segment unless other views still use it"""
+        self.arrays = {}
+        if not in_use(self.views):
+            self.memory.close()
+
+    def unlink(self):
+        """Owner only: remove the segment once every process has closed it"""
+        self.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.owner:
+            self.unlink()
+        else:
+            self.close()
+
+
+def problem_arrays(engine):
+    """The PROBLEM_ARRAYS an engine has, by attribute path"""
+    arrays = {}
+    for path in PROBLEM_ARRAYS:
+        try:
+            array = reduce(getattr, path.split('.'), engine)
+        except AttributeError:
+            continue
+        if isinstance(array, np.ndarray):
+            arrays[path] = array
+    return arrays
+
+
+class SegmentPickler(pickle.Pickler):
+    """Pickles arrays held in a segment as references to it instead of their data"""
+
+    def __init__(self, file, segment, arrays):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        name, layout = segment.spec
+        # The very array objects copied into the segment; copies of them are pickled as usual
+        self.references = {id(array): (name,) + layout[key] for key, array in arrays.items()}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, np.ndarray):
+            return self.references.get(id(obj))
+        return None
+
+
+class SegmentUnpickler(pickle.Unpickler):
+    def persistent_load(self, reference):
+        name, offset, shape, dtype = reference
+        if name not in attached:
+            attached[name] = (shared_memory.SharedMemory(name=name), [])
+        memory, views = attached[name]
+        array = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+        array.flags.writeable = False
+        views.append(weakref.ref(array))
+        return array
+
+
+def share_engine(engine):
+    """Move an engine's compiled problem into a new segment.
+
+    Returns the owned segment and the engine pickled with its problem arrays
+    as references to that segment; load_engine() in a worker rebuilds the
+    engine on views of the segment.
+    """
+    arrays = problem_arrays(engine)
+    segment = SharedArrays.from_arrays(arrays)
+    buffer = io.BytesIO()
+    try:
+        SegmentPickler(buffer, segment, arrays).dump(engine)
+    except BaseException:
+        segment.unlink()
+        raise
+    return segment, buffer.getvalue()
+
+
+def load_engine(payload):
+    """Worker side of share_engine(): the engine, its problem arrays attached read-only"""
+    return SegmentUnpickler(io.BytesIO(payload)).load()
+
+
+def detach_segments():
+    """Close the segments load_engine() attached to; returns the names still in use.
+
+    Call once the loaded engines are dropped. Engines hold reference cycles,
+    so they are collected first; a segment some array still views stays
+    attached and is closed by a later call or at process exit.
+    """
+    gc.collect()
+    for name, (memory, views) in list(attached.items()):
+        if not in_use(views):
+            memory.close()
+            del attached[name]
+    return list(attached)
@@ -0,0 +1,62 @@
+# scheduler/termination.py - Stopping rules for a genetic algorithm run
+import time
+
+# Stop reasons, in the order they are checked
+STOPPED = 'stopped'
+TARGET_FITNESS = 'target_fitness'
+HARD_CONSTRAINTS = 'hard_constraints'
+TIME_LIMIT = 'time_limit'
+STAGNATION = 'stagnation'
+GENERATIONS = 'generations'
+
+
+class Termination:
+    """Decides after every generation whether a run should stop and why.
+
+    time_limit is in seconds of wall-clock time; stagnation_generations is the
+    number of generations without any improvement of the best fitness.
+    Unset limits never fire; the generation budget always applies, and a stop
+    requested from outside the run overrides everything.
+    """
+
+    def __init__(self, generations, time_limit=None, stagnation_generations=None, target_fitness=None,
+                 stop_on_hard_constraints=False):
+        self.generations = generations
+        self.time_limit = time_limit
+        self.stagnation_generations = stagnation_generations
+        self.target_fitness = target_fitness
+        self.stop_on_hard_constraints = stop_on_hard_constraints
+        self.started = time.monotonic()
+        self.best_fitness = None
+        self.last_improvement = 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def check(self, generation, best_fitness, hard_constraints_satisfied=False, stop_requested=False):
+        """Stop reason after generation (0-based) has been evaluated, or None to continue"""
+        if self.best_fitness is None or best_fitness > self.best_fitness:
+            self.best_fitness = best_fitness
+            self.last_improvement = generation
+        
+        if stop_requested:
+            return STOPPED
+        if self.target_fitness is not None and best_fitness >= self.target_fitness:
+            return TARGET_FITNESS
+        if self.stop_on_hard_constraints and hard_constraints_satisfied:
+            return HARD_CONSTRAINTS
+        if self.time_limit is not None and self.elapsed() >= self.time_limit:
+            return TIME_LIMIT
+        if self.stagnation_generations and generation - self.last_improvement >= self.stagnation_generations:
+            return STAGNATION
+        if generation + 1 >= self.generations:
+            return GENERATIONS
+        return None
+
+    def stats(self, generation, stop_reason):
+        """Summary of a finished run"""
+        return {
+            'stop_reason': stop_reason,
+            'generations': generation + 1,
+            'elapsed': round(self.elapsed(), 3)
+        }
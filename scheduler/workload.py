@@ -0,0 +1,195 @@
+# scheduler/workload.py - Balanced faculty assignment by min-cost flow
+import heapq
+import numpy as np
+from scheduler.problem import SUBJECT, FACULTY
+
+# Cost of a class no eligible faculty member can take; it keeps the faculty it had
+UNSTAFFED_COST = 10 ** 9
+# Cost of a class given to a member already teaching in its (day, slot), or past their
+# daily limit or weekly workload limit
+DOUBLE_BOOKING_COST = 10 ** 7
+# Cost of each hour beyond a faculty member's leave-adjusted availability
+OVERLOAD_COST = 10 ** 6
+
+
+class MinCostFlow:
+    """Unit augmentations along shortest paths (Dijkstra on reduced costs).
+
+    Each augmentation starts from its own node and stops as soon as the sink
+    is settled; potentials are then raised by min(distance, sink distance),
+    which keeps every residual reduced cost non-negative, so each augmented
+    path is cheapest given the flow routed so far. Unreached nodes rise by
+    the full sink distance, kept implicit by lowering the reached ones instead.
+    """
+
+    def __init__(self):
+        self.graph = []
+        self.potential = []
+
+    def add_node(self, like=None):
+        """New node; one whose arcs lead to node `like` starts with its potential"""
+        self.graph.append([])
+        self.potential.append(0 if like is None else self.potential[like])
+        return len(self.graph) - 1
+
+    def add_edge(self, u, v, capacity, cost):
+        """Add an arc and its residual twin; returns the arc as (node, position)"""
+        self.graph[u].append([v, capacity, cost, len(self.graph[v])])
+        self.graph[v].append([u, 0, -cost, len(self.graph[u]) - 1])
+        return u, len(self.graph[u]) - 1
+
+    def augment(self, source, sink):
+        """Send one unit from source to sink along a cheapest path; returns its cost"""
+        graph, potential = self.graph, self.potential
+        # The source has no residual arcs in, so lifting it clears any negative reduced cost out of it
+        potential[source] = max(potential[v] for v, capacity, _, _ in graph[source] if capacity > 0)
+        distance = {source: 0}
+        previous = {}
+        settled = set()
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u == sink:
+                break
+            pu = potential[u]
+            for position, (v, capacity, cost, _) in enumerate(graph[u]):
+                if capacity <= 0 or v in settled:
+                    continue
+                nd = d + cost + pu - potential[v]
+                if nd < distance.get(v, float('inf')):
+                    distance[v] = nd
+                    previous[v] = (u, position)
+                    heapq.heappush(heap, (nd, v))
+        if sink not in settled:
+            return None
+
+        limit = distance[sink]
+        for v, d in distance.items():
+            if d < limit:
+                potential[v] += d - limit
+
+        cost = 0
+        v = sink
+        while v != source:
+            u, position = previous[v]
+            edge = graph[u][position]
+            edge[1] -= 1
+            graph[v][edge[3]][1] += 1
+            cost += edge[2]
+            v = u
+        return cost
+
+    def flow(self, arc):
+        u, position = arc
+        return self.graph[self.graph[u][position][0]][self.graph[u][position][3]][1]
+
+
+class FacultyAssigner:
+    """Re-staffs every class of a timetable with its times and subjects kept.
+
+    Classes are matched to eligible faculty by a min-cost flow in which a
+    faculty member teaches at most one class per (day, slot) and at most
+    max_hours_per_day classes a day. Each extra hour of a member's week costs
+    more than the last (2h + 1 for the h-th), so the flow minimises the sum
+    of squared loads, i.e. the load variance; hours past the leave-adjusted
+    availability cost OVERLOAD_COST each. A class that can only be staffed
+    by breaking the slot, daily or weekly limits goes, at DOUBLE_BOOKING_COST,
+    to the eligible member whose load that hurts least. Fixed slots naming a faculty
+    member keep them, and a class nobody may teach keeps its faculty.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.problem = engine.problem
+        self.daily_limits = [int(f.get('max_hours_per_day', engine.max_hours_per_faculty)) for f in engine.faculty]
+        availability = list(engine.evaluator.availability_limits) or [float('inf')] * len(engine.faculty)
+        self.weekly_limits = [min(daily * self.problem.num_days, int(available))
+                              if available != float('inf') else daily * self.problem.num_days
+                              for daily, available in zip(self.daily_limits, availability)]
+        self.pinned = {(b, d, s): (subject, faculty)
+                       for b, d, s, subject, faculty, _ in engine.evaluator.compiled_fixed_slots
+                       if s is not None and faculty is not None and faculty >= 0}
+
+    def candidates(self, cell, subject):
+        pinned = self.pinned.get(cell)
+        if pinned and pinned[0] == subject:
+            return [pinned[1]]
+        return self.engine.eligibility.candidates[subject].tolist()
+
+    def assign(self, timetable):
+        """Return a re-staffed copy of a timetable and statistics on the faculty loads"""
+        problem = self.problem
+        result = timetable.copy()
+        sessions = [tuple(cell) for cell in np.argwhere(timetable[..., SUBJECT] >= 0).tolist()]
+        before = np.bincount(timetable[..., FACULTY][timetable[..., FACULTY] >= 0], minlength=problem.num_faculty)
+
+        network = MinCostFlow()
+        sink = network.add_node()
+        faculty_nodes = {}
+        day_nodes = {}
+        slot_nodes = {}
+
+        def faculty_node(f):
+            if f not in faculty_nodes:
+                node = faculty_nodes[f] = network.add_node(like=sink)
+                # Convex unit costs: the h-th hour of the week costs 2h + 1
+                workload_limit = self.daily_limits[f] * problem.num_days
+                for h in range(workload_limit + demand[f]):
+                    network.add_edge(node, sink, 1, 2 * h + 1 + (OVERLOAD_COST if h >= self.weekly_limits[f] else 0) +
+                                     (DOUBLE_BOOKING_COST if h >= workload_limit else 0))
+            return faculty_nodes[f]
+
+        def day_node(f, d):
+            if (f, d) not in day_nodes:
+                target = faculty_node(f)
+                node = day_nodes[f, d] = network.add_node(like=target)
+                network.add_edge(node, target, self.daily_limits[f], 0)
+            return day_nodes[f, d]
+
+        def slot_node(f, d, s):
+            if (f, d, s) not in slot_nodes:
+                target = day_node(f, d)
+                node = slot_nodes[f, d, s] = network.add_node(like=target)
+                network.add_edge(node, target, 1, 0)
+            return slot_nodes[f, d, s]
+
+        options = {cell: self.candidates(cell, int(timetable[cell + (SUBJECT,)])) for cell in sessions}
+        # Classes each member could take, bounding the hours they may be pushed past their limit
+        demand = np.zeros(problem.num_faculty, dtype=np.int64)
+        for candidates in options.values():
+            demand[candidates] += 1
+        arcs = {}
+        unstaffed = 0
+        # Scarce classes first, so cheap paths are rarely rerouted later
+        for cell in sorted(sessions, key=lambda cell: len(options[cell])):
+            b, d, s = cell
+            node = network.add_node()
+            arcs[cell] = [(f, network.add_edge(node, slot_node(f, d, s), 1, 0)) for f in options[cell]]
+            # Bypassing the slot and day nodes breaks the limits they enforce
+            arcs[cell] += [(f, network.add_edge(node, faculty_node(f), 1, DOUBLE_BOOKING_COST))
+                           for f in options[cell]]
+            network.add_edge(node, sink, 1, UNSTAFFED_COST)
+            network.augment(node, sink)
+
+        double_booked = 0
+        for cell, cell_arcs in arcs.items():
+            staffed = [(i, f) for i, (f, arc) in enumerate(cell_arcs) if network.flow(arc)]
+            if staffed:
+                i, result[cell + (FACULTY,)] = staffed[0]
+                double_booked += i >= len(cell_arcs) // 2
+            else:
+                unstaffed += 1
+
+        after = np.bincount(result[..., FACULTY][result[..., FACULTY] >= 0], minlength=problem.num_faculty)
+        return result, {
+            'sessions': len(sessions),
+            'unstaffed': unstaffed,
+            'double_booked': int(double_booked),
+            'load_std_before': round(float(before.std()), 3),
+            'load_std_after': round(float(after.std()), 3),
+            'max_load_before': int(before.max()) if len(before) else 0,
+            'max_load_after': int(after.max()) if len(after) else 0
+        }
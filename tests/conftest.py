@@ -0,0 +1,43 @@
+# tests/conftest.py - Shared fixtures: seeded synthetic instances and engines built on them
+import random
+import numpy as np
+import pytest
+from benchmarks.instances import generate_instance, write_database
+from scheduler.problem import EMPTY
+
+
+@pytest.fixture
+def instance(tmp_path, monkeypatch):
+    """A small feasible institution stored in timetable.db of a fresh working directory"""
+    instance = generate_instance(10, seed=0)
+    write_database(instance, str(tmp_path / 'timetable.db'))
+    monkeypatch.chdir(tmp_path)
+    random.seed(0)
+    np.random.seed(0)
+    return instance
+
+
+@pytest.fixture
+def make_engine(instance):
+    """Build an engine class on the instance, with constraint overrides"""
+    def make(engine_class, **overrides):
+        constraints = dict(instance['constraints'], **overrides)
+        return engine_class(instance['subjects'], instance['faculty'], instance['classrooms'],
+                            instance['batches'], constraints)
+    return make
+
+
+@pytest.fixture
+def random_timetables():
+    """Make timetables of arbitrary (often clashing) genes; every cell is either fully EMPTY or fully set"""
+    return make_random_timetables
+
+
+def make_random_timetables(problem, count, seed=0, empty_fraction=0.3):
+    rng = np.random.default_rng(seed)
+    shape = (count, problem.num_batches, problem.num_days, problem.num_slots)
+    population = np.stack([rng.integers(problem.num_subjects, size=shape),
+                           rng.integers(problem.num_faculty, size=shape),
+                           rng.integers(problem.num_classrooms, size=shape)], axis=-1).astype(np.int32)
+    population[rng.random(shape) < empty_fraction] = EMPTY
+    return population
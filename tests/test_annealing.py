@@ -0,0 +1,35 @@
+# tests/test_annealing.py - Simulated annealing never ends worse than it starts
+import pytest
+from scheduler.annealing import AnnealingTimetable, COOLING_SCHEDULES
+from scheduler.termination import TIME_LIMIT
+
+
+@pytest.mark.parametrize('schedule', sorted(COOLING_SCHEDULES))
+def test_annealing_result_is_no_worse_than_its_start(make_engine, schedule):
+    # An unreachable target, so every run anneals until its time limit, and no polish to hide a worse result
+    engine = make_engine(AnnealingTimetable, time_limit=0.5, annealing_schedule=schedule, annealing_reheats=1,
+                         target_fitness=float('inf'), faculty_balancing=False, local_search_time=0)
+    starts = []
+    initial_population = engine.initial_population
+
+    def record(size):
+        population = initial_population(size)
+        starts.extend(timetable.copy() for timetable in population)
+        return population
+
+    engine.initial_population = record
+    timetable, fitness, run_stats = engine.run()
+    assert len(starts) == 1
+    assert fitness == engine.calculate_fitness(timetable)
+    assert fitness >= engine.calculate_fitness(starts[0])
+
+    assert run_stats['stop_reason'] == TIME_LIMIT
+    assert run_stats['schedule'] == schedule
+    assert run_stats['iterations'] > 0
+    assert 0 <= run_stats['improvements'] <= run_stats['accepted'] <= run_stats['iterations']
+    assert run_stats['reheats'] <= 1 and run_stats['initial_temperature'] > 0
+
+
+def test_annealing_rejects_unknown_schedule(make_engine):
+    with pytest.raises(ValueError, match='Unknown cooling schedule'):
+        make_engine(AnnealingTimetable, annealing_schedule='geometric')
@@ -0,0 +1,41 @@
+# tests/test_cache.py - Fitness memoisation in the GA engines and the legacy app engine
+import copy
+import numpy as np
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.cache import FitnessCache
+from scheduler.legacy import EnhancedGeneticTimetable as LegacyTimetable
+
+
+def test_cache_evicts_least_recently_used():
+    cache = FitnessCache(maxsize=2)
+    keys = [cache.key(np.full((2, 2), i)) for i in range(3)]
+    cache.put(keys[0], 10)
+    cache.put(keys[1], 20)
+    assert cache.get(keys[0]) == 10
+    cache.put(keys[2], 30)
+    assert cache.get(keys[1]) is None
+    assert (cache.get(keys[0]), cache.get(keys[2])) == (10, 30)
+    assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 1
+
+
+def test_legacy_engine_repeat_evaluation_is_a_hit(instance):
+    engine = LegacyTimetable(1, 1, population_size=4, generations=1)
+    chromosome = engine.create_chromosome()
+    fitness = engine.calculate_fitness(chromosome)
+    assert engine.calculate_fitness(copy.deepcopy(chromosome)) == fitness
+    assert (engine.fitness_cache.hits, engine.fitness_cache.misses) == (1, 1)
+    assert list(engine.fitness_cache.entries) == [engine.fitness_cache.key(chromosome)]
+
+
+def test_engine_repeat_evaluation_is_a_hit(make_engine):
+    engine = make_engine(EnhancedGeneticTimetable)
+    population = engine.initial_population(3)
+    fitness = engine.calculate_fitness(population[0])
+    assert engine.calculate_fitness(population[0].copy()) == fitness
+    assert (engine.fitness_cache.hits, engine.fitness_cache.misses) == (1, 1)
+
+    # Duplicates within a population are scored once
+    engine.fitness_cache.clear()
+    scores = engine.evaluate_population(np.stack([population[1], population[2], population[1]]))
+    assert scores[0] == scores[2]
+    assert len(engine.fitness_cache.entries) == 2
@@ -0,0 +1,118 @@
+# tests/test_checkpoint.py - Saving, resuming and invalidating genetic algorithm checkpoints
+import itertools
+import random
+import numpy as np
+import pytest
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.checkpoint import save_checkpoint, load_checkpoint, restore_random_state
+from scheduler.problem import SUBJECT
+
+
+def checkpointed_engine(make_engine, path, generations=6, **overrides):
+    """A small engine checkpointing to path every 3 generations and resuming from it"""
+    engine = make_engine(EnhancedGeneticTimetable, checkpoint_path=str(path), checkpoint_interval=3, resume=True,
+                         local_search_time=0, **overrides)
+    engine.population_size = 10
+    engine.generations = generations
+    return engine
+
+
+def fixed_slot(instance):
+    """A fixed slot of the first batch holding one of its department's lab subjects"""
+    batch = instance['batches'][0]
+    subject = next(s for s in instance['subjects']
+                   if s['department_id'] == batch['department_id'] and s['subject_type'] == 'LAB')
+    return {'batch_id': batch['id'], 'day': 'Tuesday', 'time_slot': '10:00-11:00', 'subject_id': subject['id']}
+
+
+def test_checkpoint_round_trip(make_engine, tmp_path):
+    engine = make_engine(EnhancedGeneticTimetable)
+    population = engine.initial_population(4)
+    path = str(tmp_path / 'run.npz')
+    random.seed(5)
+    np.random.seed(5)
+    save_checkpoint(path, engine.problem, population, population[2], 812.5, 7, rng=engine.rng,
+                    constraints=engine.constraints)
+    expected = (random.random(), np.random.random(), engine.rng.random())
+
+    checkpoint = load_checkpoint(path, engine.problem, engine.constraints)
+    assert np.array_equal(checkpoint['population'], population)
+    assert np.array_equal(checkpoint['best_timetable'], population[2])
+    assert (checkpoint['best_fitness'], checkpoint['generation'], checkpoint['finished']) == (812.5, 7, False)
+    restore_random_state(checkpoint, engine.rng)
+    assert (random.random(), np.random.random(), engine.rng.random()) == expected
+
+
+def test_checkpoint_of_other_constraints_is_not_loaded(make_engine, instance, tmp_path):
+    path = tmp_path / 'run.npz'
+    engine = checkpointed_engine(make_engine, path)
+    save_checkpoint(str(path), engine.problem, engine.initial_population(10), None, 0, 3,
+                    constraints=engine.constraints)
+    assert checkpointed_engine(make_engine, path, time_limit=60).load_resumable_checkpoint() is not None
+
+    for overrides in ({'fixed_slots': [fixed_slot(instance)]}, {'max_classes_per_day': 4},
+                      {'max_hours_per_faculty': 4}):
+        other = checkpointed_engine(make_engine, path, **overrides)
+        with pytest.raises(ValueError):
+            load_checkpoint(str(path), other.problem, other.constraints)
+        assert other.load_resumable_checkpoint() is None
+
+
+def test_resumed_run_continues_the_interrupted_one(make_engine, tmp_path):
+    random.seed(1)
+    np.random.seed(1)
+    uninterrupted = checkpointed_engine(make_engine, tmp_path / 'uninterrupted.npz')
+    for _ in uninterrupted.iter_run():
+        pass
+
+    random.seed(1)
+    np.random.seed(1)
+    interrupted = checkpointed_engine(make_engine, tmp_path / 'interrupted.npz')
+    run = interrupted.iter_run()
+    # Killed during generation 3, after the checkpoint of generation 3 was written
+    assert [progress['generation'] for progress in itertools.islice(run, 4)] == [0, 1, 2, 3]
+    run.close()
+
+    random.seed(2)
+    np.random.seed(2)
+    resumed = checkpointed_engine(make_engine, tmp_path / 'interrupted.npz')
+    assert [progress['generation'] for progress in resumed.iter_run()] == [3, 4, 5]
+
+    expected = load_checkpoint(str(tmp_path / 'uninterrupted.npz'), uninterrupted.problem, uninterrupted.constraints)
+    actual = load_checkpoint(str(tmp_path / 'interrupted.npz'), resumed.problem, resumed.constraints)
+    assert actual['finished'] and actual['generation'] == expected['generation'] == 6
+    assert np.array_equal(actual['population'], expected['population'])
+
+
+def test_resume_places_fixed_slots(make_engine, instance, tmp_path):
+    path = tmp_path / 'run.npz'
+    engine = checkpointed_engine(make_engine, path, fixed_slots=[fixed_slot(instance)])
+    (cell, (subject, _, _)), = engine.fixed_genes.items()
+    population = engine.initial_population(10)
+    population[:, cell[0], cell[1], cell[2]] = -1
+    save_checkpoint(str(path), engine.problem, population, None, 0, 5, constraints=engine.constraints)
+
+    # The last generation ends the run before breeding, so the finished checkpoint holds the resumed population
+    assert [progress['generation'] for progress in engine.iter_run()] == [5]
+    resumed = load_checkpoint(str(path), engine.problem, engine.constraints)['population']
+    assert (resumed[:, cell[0], cell[1], cell[2], SUBJECT] == subject).all()
+    assert (resumed[:, cell[0], cell[1], cell[2]] >= 0).all()
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: data[:len(data) // 2],
+    lambda data: data[:-10],
+    lambda data: b'',
+    lambda data: data[:40] + bytes(50) + data[90:]
+], ids=['truncated', 'no-directory', 'empty', 'corrupt'])
+def test_damaged_checkpoint_is_ignored(make_engine, tmp_path, damage):
+    path = tmp_path / 'run.npz'
+    engine = checkpointed_engine(make_engine, path)
+    save_checkpoint(str(path), engine.problem, engine.initial_population(10), None, 0, 3,
+                    constraints=engine.constraints)
+    path.write_bytes(damage(path.read_bytes()))
+
+    assert engine.load_resumable_checkpoint() is None
+    # The run starts over and replaces the damaged file with a readable one
+    assert [progress['generation'] for progress in engine.iter_run()] == list(range(6))
+    assert load_checkpoint(str(path), engine.problem, engine.constraints)['finished']
@@ -0,0 +1,50 @@
+# tests/test_cp.py - The backtracking engine solves feasible instances and names what it cannot place
+import numpy as np
+from scheduler.cp import ConstraintTimetable, SOLVED, INFEASIBLE
+from scheduler.eligibility import EligibilityIndex
+from scheduler.problem import SUBJECT
+
+
+def test_constraint_search_solves_feasible_instance(make_engine, instance):
+    engine = make_engine(ConstraintTimetable, time_limit=20)
+    timetable, fitness, run_stats = engine.run()
+    assert run_stats['stop_reason'] == SOLVED
+    assert run_stats['unplaced'] == [] and run_stats['placed'] == run_stats['sessions']
+    assert engine.hard_violations(timetable) == 0
+    assert fitness == engine.calculate_fitness(timetable)
+    # Every batch has exactly the weekly classes of each subject of its department
+    problem = engine.problem
+    for batch in instance['batches']:
+        subjects = timetable[problem.batch_index[batch['id']], ..., SUBJECT]
+        counts = np.bincount(subjects[subjects >= 0], minlength=problem.num_subjects)
+        for subject in instance['subjects']:
+            expected = subject['classes_per_week'] if subject['department_id'] == batch['department_id'] else 0
+            assert counts[problem.subject_index[subject['id']]] == expected
+
+
+def test_constraint_search_reports_unplaced_classes(instance):
+    # A theory subject nobody may teach, and two fixed slots claiming the same cell
+    theory = next(s for s in instance['subjects'] if s['subject_type'] == 'THEORY')
+    eligibility = EligibilityIndex([pair for pair in instance['faculty_subjects'] if pair[1] != theory['id']],
+                                   [f['id'] for f in instance['faculty']], [s['id'] for s in instance['subjects']])
+    batch = instance['batches'][0]
+    kept, dropped = [s for s in instance['subjects']
+                     if s['department_id'] == batch['department_id'] and s['id'] != theory['id']][:2]
+    fixed_slots = [{'batch_id': batch['id'], 'day': 'Monday', 'time_slot': '9:00-10:00', 'subject_id': subject['id']}
+                   for subject in (kept, dropped)]
+    constraints = dict(instance['constraints'], fixed_slots=fixed_slots, time_limit=20)
+    engine = ConstraintTimetable(instance['subjects'], instance['faculty'], instance['classrooms'],
+                                 instance['batches'], constraints, eligibility=eligibility)
+    timetable, _, run_stats = engine.run()
+
+    assert run_stats['stop_reason'] == INFEASIBLE
+    department = [b['id'] for b in instance['batches'] if b['department_id'] == theory['department_id']]
+    assert run_stats['unplaced'] == [{'subject': theory['id'], 'batches': department}] * theory['classes_per_week'] + \
+           [{'subject': dropped['id'], 'batches': [batch['id']], 'fixed_slot': True}]
+    # Everything else is placed, and only the fixed slot that lost its cell is a hard violation
+    assert run_stats['placed'] == run_stats['sessions'] - theory['classes_per_week']
+    problem = engine.problem
+    assert not (timetable[..., SUBJECT] == problem.subject_index[theory['id']]).any()
+    b, d, s = problem.batch_index[batch['id']], problem.day_index['Monday'], problem.slot_index['9:00-10:00']
+    assert timetable[b, d, s, SUBJECT] == problem.subject_index[kept['id']]
+    assert engine.hard_violations(timetable) == 1
@@ -0,0 +1,132 @@
+# tests/test_fitness.py - Batched and incremental evaluation agree with the per-timetable fitness
+import numpy as np
+import pytest
+from benchmarks.instances import TIME_SLOTS
+from genetic_algorithm import GeneticTimetable, EnhancedGeneticTimetable
+
+# Five afternoon slots, so runs of classes can exceed the consecutive limit and the daily maximum
+LONG_DAY = {'time_slots': TIME_SLOTS + ['4:00-5:00', '5:00-6:00']}
+ENGINES = [
+    pytest.param(GeneticTimetable, LONG_DAY, id='base'),
+    pytest.param(EnhancedGeneticTimetable, LONG_DAY, id='enhanced'),
+    pytest.param(EnhancedGeneticTimetable, dict(LONG_DAY, shared_theory_genes=False), id='per-batch-theory'),
+    pytest.param(EnhancedGeneticTimetable, dict(LONG_DAY, room_matching=False), id='random-rooms'),
+]
+
+
+def sample_population(engine, random_timetables):
+    """Constructed, mutated and arbitrary timetables, some of them sparse enough to score above zero"""
+    built = engine.initialize_population(8)
+    mutated = np.stack([engine.mutate(timetable) for timetable in built])
+    return np.concatenate([built, mutated, random_timetables(engine.problem, 8, seed=1),
+                           random_timetables(engine.problem, 8, seed=2, empty_fraction=0.97)])
+
+
+@pytest.mark.parametrize('engine_class, overrides', ENGINES)
+def test_population_evaluator_matches_calculate_fitness(make_engine, random_timetables, engine_class, overrides):
+    engine = make_engine(engine_class, **overrides)
+    population = sample_population(engine, random_timetables)
+
+    violations = engine.evaluator.violations(population)
+    for check, _ in engine.fitness_weights:
+        expected = [getattr(engine, 'check_' + check)(timetable) for timetable in population]
+        assert violations[check].tolist() == expected, check
+        # Every check but the placeholder time preferences is exercised
+        assert check == 'time_preferences' or any(expected), check
+    assert engine.evaluator.evaluate(population).tolist() == [engine.calculate_fitness(t) for t in population]
+
+
+@pytest.mark.parametrize('engine_class, overrides', ENGINES)
+def test_evaluate_population_matches_calculate_fitness(make_engine, random_timetables, engine_class, overrides):
+    engine = make_engine(engine_class, **overrides)
+    population = sample_population(engine, random_timetables)
+    # Repeats are answered from the cache and must still agree
+    population = np.concatenate([population, population[::3]])
+
+    expected = [engine.calculate_fitness(timetable) for timetable in population]
+    engine.fitness_cache.clear()
+    assert engine.evaluate_population(population) == expected
+
+
+@pytest.mark.parametrize('engine_class, overrides', ENGINES)
+def test_delta_evaluator_tracks_moves(make_engine, random_timetables, engine_class, overrides):
+    engine = make_engine(engine_class, **overrides)
+    problem = engine.problem
+    rng = np.random.default_rng(3)
+    for timetable in sample_population(engine, random_timetables)[::4]:
+        delta = engine.delta_evaluator(timetable)
+        assert delta.score == engine.calculate_fitness(timetable)
+
+        for _ in range(30):
+            cell = (rng.integers(problem.num_batches), rng.integers(problem.num_days), rng.integers(problem.num_slots))
+            if rng.random() < 0.3:
+                gene = (-1, -1, -1)
+            else:
+                gene = (rng.integers(problem.num_subjects), rng.integers(problem.num_faculty),
+                        rng.integers(problem.num_classrooms))
+            change = delta.apply(*cell, gene)
+            assert delta.score == engine.calculate_fitness(delta.timetable.copy())
+            assert delta.violation_counts() == {check: getattr(engine, 'check_' + check)(delta.timetable)
+                                                for check, _ in engine.fitness_weights}
+            assert change == delta.score - engine.calculate_fitness(_previous(delta, cell))
+
+        delta.rollback()
+        assert np.array_equal(delta.timetable, timetable)
+        assert delta.score == engine.calculate_fitness(timetable)
+
+
+def _previous(delta, cell):
+    """The delta's timetable before its last journalled move (to cell)"""
+    b, d, s, old = delta.journal[-1]
+    assert (b, d, s) == tuple(cell)
+    previous = delta.timetable.copy()
+    previous[b, d, s] = old
+    return previous
+
+
+@pytest.mark.parametrize('engine_class, overrides', ENGINES)
+def test_delta_evaluator_random_operation_sequences(make_engine, random_timetables, engine_class, overrides):
+    engine = make_engine(engine_class, **overrides)
+    problem = engine.problem
+    rng = np.random.default_rng(4)
+
+    def random_cell():
+        return (int(rng.integers(problem.num_batches)), int(rng.integers(problem.num_days)),
+                int(rng.integers(problem.num_slots)))
+
+    def random_gene():
+        if rng.random() < 0.3:
+            return (-1, -1, -1)
+        return (rng.integers(problem.num_subjects), rng.integers(problem.num_faculty),
+                rng.integers(problem.num_classrooms))
+
+    for timetable in sample_population(engine, random_timetables)[::8]:
+        delta = engine.delta_evaluator(timetable)
+        committed = timetable.copy()
+        for _ in range(150):
+            operation = rng.choice(['place', 'apply', 'swap', 'commit', 'rollback', 'revert'],
+                                   p=[0.3, 0.2, 0.2, 0.1, 0.1, 0.1])
+            before = engine.calculate_fitness(delta.timetable.copy())
+            if operation == 'place':
+                delta.place(*random_cell(), random_gene())
+            elif operation == 'apply':
+                change = delta.apply(*random_cell(), random_gene())
+                assert change == engine.calculate_fitness(delta.timetable.copy()) - before
+            elif operation == 'swap':
+                change = delta.swap(random_cell(), random_cell())
+                assert change == engine.calculate_fitness(delta.timetable.copy()) - before
+            elif operation == 'commit':
+                delta.commit()
+                committed = delta.timetable.copy()
+            else:
+                change = delta.rollback() if operation == 'rollback' else delta.revert()
+                assert np.array_equal(delta.timetable, committed)
+                if operation == 'rollback':
+                    assert change == engine.calculate_fitness(committed) - before
+
+            # The running totals are what a full evaluation of the current timetable gives
+            violations = engine.evaluator.violations(delta.timetable[np.newaxis])
+            expected = {check: violations[check].tolist()[0] for check, _ in engine.fitness_weights}
+            assert delta.violation_counts() == expected
+            assert delta.score == engine.evaluator.evaluate(delta.timetable[np.newaxis])[0]
+            assert delta.score == engine.calculate_fitness(delta.timetable.copy())
@@ -0,0 +1,61 @@
+# tests/test_fixed_slots.py - Fixed slots are locked genes no operator changes
+import numpy as np
+import pytest
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.problem import SUBJECT, FACULTY, CLASSROOM
+
+ENGINES = [
+    pytest.param({}, id='enhanced'),
+    pytest.param({'shared_theory_genes': False}, id='per-batch-theory'),
+    pytest.param({'room_matching': False}, id='random-rooms'),
+]
+
+
+def fixed_slots(instance):
+    """A lab naming its faculty member and room, a theory class, and one outside the grid"""
+    batch = instance['batches'][0]
+    department_subjects = [s for s in instance['subjects'] if s['department_id'] == batch['department_id']]
+    lab = next(s for s in department_subjects if s['subject_type'] == 'LAB')
+    theory = next(s for s in department_subjects if s['subject_type'] == 'THEORY')
+    faculty_id = next(f for f, s in instance['faculty_subjects'] if s == lab['id'])
+    room = next(c for c in instance['classrooms'] if c['department_id'] == batch['department_id'] and c['type'] == 'LAB')
+    return [
+        {'batch_id': batch['id'], 'day': 'Monday', 'time_slot': '9:00-10:00', 'subject_id': lab['id'],
+         'faculty_id': faculty_id, 'classroom_id': room['id']},
+        {'batch_id': batch['id'], 'day': 'Wednesday', 'time_slot': '2:00-3:00', 'subject_id': theory['id']},
+        {'batch_id': batch['id'], 'day': 'Friday', 'time_slot': '7:00-8:00', 'subject_id': theory['id']},
+    ]
+
+
+def assert_locked(engine, population):
+    """Every locked cell holds its fixed gene, fully assigned; only the unsatisfiable fixed slot is violated"""
+    for (b, d, s), (subject, faculty, classroom) in engine.fixed_genes.items():
+        cells = population[:, b, d, s]
+        assert (cells[:, SUBJECT] == subject).all()
+        assert (cells[:, FACULTY] == faculty).all() if faculty >= 0 else (cells[:, FACULTY] >= 0).all()
+        assert (cells[:, CLASSROOM] == classroom).all() if classroom >= 0 else (cells[:, CLASSROOM] >= 0).all()
+    assert [engine.check_fixed_slots(timetable) for timetable in population] == [1] * len(population)
+
+
+@pytest.mark.parametrize('overrides', ENGINES)
+def test_operators_keep_fixed_slots(make_engine, instance, overrides):
+    engine = make_engine(EnhancedGeneticTimetable, fixed_slots=fixed_slots(instance), **overrides)
+    department = engine.problem.batch_department[0]
+    shared = engine.problem.department_batches[department] if engine.shared_theory_genes else [0]
+    assert len(engine.fixed_genes) == 1 + len(shared)
+
+    population = engine.initial_population(12)
+    assert_locked(engine, population)
+    for _ in range(20):
+        parents = engine.tournament_selection(engine.evaluate_population(population), len(population))
+        population = engine.breed(population, parents.reshape(-1, 2), crossover_rate=1.0, mutation_rate=1.0)
+        assert_locked(engine, population)
+    assert_locked(engine, np.stack([engine.mutate(population[0]) for _ in range(200)]))
+
+
+@pytest.mark.parametrize('overrides', ENGINES)
+def test_place_fixed_slots_writes_locked_genes(make_engine, instance, overrides):
+    engine = make_engine(EnhancedGeneticTimetable, fixed_slots=fixed_slots(instance), **overrides)
+    timetable = engine.place_fixed_slots(engine.problem.empty_timetable())
+    assert_locked(engine, timetable[np.newaxis])
+    assert (timetable[..., SUBJECT] >= 0).sum() == len(engine.fixed_genes)
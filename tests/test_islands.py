@@ -0,0 +1,69 @@
+# tests/test_islands.py - Migration between islands and the round in which they all stop
+import os
+import numpy as np
+import pytest
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.islands import migration_sources, exchange_migrants
+from scheduler.termination import STOPPED, GENERATIONS
+
+
+def test_migration_sources():
+    assert [migration_sources(island, 4, 'ring') for island in range(4)] == [[3], [0], [1], [2]]
+    assert migration_sources(1, 4, 'full') == [0, 2, 3]
+
+
+@pytest.mark.parametrize('topology', ['ring', 'full'])
+def test_exchange_migrants_replaces_the_worst_with_the_best_arrivals(topology):
+    rng = np.random.default_rng(0)
+    num_islands, size, migration_size = 3, 6, 2
+    # Every row holds its own (island, row) so copies can be traced back
+    population = np.stack(np.meshgrid(np.arange(num_islands), np.arange(size), indexing='ij'), axis=-1)
+    messages = {}
+    for island in range(num_islands):
+        fitness = rng.permutation(size) * 10.0 + island
+        order = np.argsort(fitness).tolist()
+        emigrants, worst = order[-migration_size:], order[:migration_size]
+        messages[island] = ('migrate', fitness.max(), emigrants, fitness[emigrants].tolist(), worst)
+    before = population.copy()
+
+    arrivals = exchange_migrants(population, messages, topology, migration_size)
+    for island in range(num_islands):
+        offered = sorted((fitness, (source, row)) for source in migration_sources(island, num_islands, topology)
+                         for row, fitness in zip(messages[source][2], messages[source][3]))[-migration_size:]
+        assert arrivals[island] == [fitness for fitness, _ in offered]
+        free = messages[island][4]
+        assert [tuple(population[island, row].tolist()) for row in free] == [origin for _, origin in offered]
+        # Rows other than the free ones, emigrants included, are untouched
+        kept = [row for row in range(size) if row not in free]
+        assert np.array_equal(population[island, kept], before[island, kept])
+
+
+def test_islands_stop_in_the_same_round(make_engine, tmp_path):
+    checkpoint_path = str(tmp_path / 'checkpoints' / 'islands.npz')
+    engine = make_engine(EnhancedGeneticTimetable, faculty_balancing=False, local_search_time=0,
+                         checkpoint_path=checkpoint_path, resume=True)
+    engine.population_size, engine.generations = 16, 100
+    progress = []
+
+    def callback(report):
+        progress.append(report)
+        return len(progress) == 2
+
+    timetable, fitness, run_stats = engine.run_islands(2, migration_interval=3, seed=0, callback=callback)
+    # Both islands got the stop at their second migration, after generation 6 of 100
+    assert [report['generation'] for report in progress] == [2, 5]
+    assert run_stats['stop_reason'] == STOPPED and run_stats['generations'] == 6
+    assert fitness == engine.calculate_fitness(timetable)
+    assert fitness >= max(report['best_fitness'] for report in progress)
+    assert not engine.stop_requested
+    # Island runs are neither checkpointed nor resumed
+    assert run_stats['resumable'] is False and run_stats['resumed_from'] == 0
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_islands_run_their_generations(make_engine):
+    engine = make_engine(EnhancedGeneticTimetable, faculty_balancing=False, local_search_time=0)
+    engine.population_size, engine.generations = 12, 5
+    timetable, fitness, run_stats = engine.run_islands(3, migration_interval=2, topology='full', seed=1)
+    assert run_stats['stop_reason'] == GENERATIONS and run_stats['generations'] == 5
+    assert fitness == engine.calculate_fitness(timetable)
@@ -0,0 +1,103 @@
+# tests/test_jobs.py - Generating every department in one job, and the progress events of jobs
+import json
+import multiprocessing
+import time
+import pytest
+import scheduler.decompose
+from config import Config
+from utils.jobs import (InstitutionRun, JobDispatcher, connect, job_events, in_job_worker, RUNNING, COMPLETED,
+                        CANCELLED, EVENTS_RETRY, WORKER_NAME)
+
+PARAMS = {'name': 'All', 'max_classes_per_day': 6, 'time_limit': 0.5}
+
+
+@pytest.fixture
+def institution(instance, monkeypatch):
+    """An InstitutionRun solving departments one after another in this process"""
+    monkeypatch.setattr(Config, 'GA_DEPARTMENT_PROCESSES', 1)
+    monkeypatch.setattr(Config, 'GA_LOCAL_SEARCH_TIME', 0)
+    conn = connect()
+    yield InstitutionRun(conn.cursor(), PARAMS)
+    conn.close()
+
+
+def test_institution_run_solves_every_department(institution, instance):
+    progress = []
+    departments, _, _ = institution.run(callback=progress.append)
+
+    assert [(department_id, semester) for department_id, semester, *_ in departments] == institution.groups
+    assert [p['solved'] for p in progress] == list(range(1, len(institution.groups) + 1))
+    batches = set()
+    for engine, (_, _, timetable, fitness, _) in zip(institution.engines, departments):
+        assert set(timetable) == set(engine.problem.batch_ids)
+        assert fitness == engine.calculate_fitness(engine.problem.encode(timetable))
+        batches.update(timetable)
+    assert batches == {batch['id'] for batch in instance['batches']}
+
+
+def test_stopped_institution_run_keeps_solved_departments(institution):
+    assert len(institution.groups) > 1
+    departments, _, _ = institution.run(callback=lambda progress: institution.stop())
+    assert [(department_id, semester) for department_id, semester, *_ in departments] == institution.groups[:1]
+
+
+
+def test_cancelled_institution_run_skips_reconciliation(institution, monkeypatch):
+    def reconcile(*args, **kwargs):
+        raise AssertionError('a cancelled run was reconciled')
+    monkeypatch.setattr(scheduler.decompose, 'reconcile', reconcile)
+    checks = []
+
+    def cancelled():
+        checks.append(len(checks))
+        return True
+    assert institution.run(cancelled=cancelled) == ([], [], {'cancelled': True})
+    assert checks == [0]
+
+
+def test_job_workers_are_spawned_and_do_not_dispatch(monkeypatch):
+    assert JobDispatcher(1).context.get_start_method() == 'spawn'
+    assert not in_job_worker()
+    # A spawned worker imports the app, and with it the blueprint that would start a dispatcher
+    monkeypatch.setattr(multiprocessing.current_process(), 'name', f'{WORKER_NAME}-7')
+    assert in_job_worker()
+
+@pytest.fixture
+def add_job(instance):
+    """Insert a generation job with a status and progress; returns its id"""
+    conn = connect()
+    conn.execute('''CREATE TABLE generation_jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, params TEXT NOT NULL,
+                    status TEXT NOT NULL, submitted_by INTEGER, progress TEXT, timetable_id INTEGER, result TEXT,
+                    error TEXT, attempts INTEGER DEFAULT 0, cancel_requested INTEGER DEFAULT 0,
+                    stop_requested INTEGER DEFAULT 0)''')
+
+    def add(status, progress=None, result=None):
+        cursor = conn.execute('INSERT INTO generation_jobs (params, status, progress, result) VALUES (?, ?, ?, ?)',
+                              (json.dumps(PARAMS), status, json.dumps(progress), json.dumps(result)))
+        conn.commit()
+        return cursor.lastrowid
+    yield add
+    conn.close()
+
+
+def test_job_events_close_and_resume_after_last_event(add_job):
+    job_id = add_job(RUNNING, {'generation': 4, 'best_fitness': 900.0})
+    # A stream past its duration closes without a final event, so the client reconnects
+    events = list(job_events(job_id, duration=0))
+    assert events == [f"retry: {EVENTS_RETRY}\n\n",
+                      f"id: 4\nevent: progress\ndata: {json.dumps({'generation': 4, 'best_fitness': 900.0})}\n\n"]
+    # ... sending Last-Event-ID 4, so generation 4 is not sent again
+    started = time.monotonic()
+    assert list(job_events(job_id, sent=4, duration=1)) == [f"retry: {EVENTS_RETRY}\n\n"]
+    assert 1 <= time.monotonic() - started < 2
+
+
+def test_job_events_end_with_the_outcome(add_job):
+    completed = add_job(COMPLETED, {'generation': 9}, {'fitness_score': 950.0})
+    *_, progress, done = job_events(completed, sent=4, duration=60, result=lambda job: dict(job['result'], url='/t'))
+    assert progress.startswith('id: 9\nevent: progress\n')
+    assert done == f"event: done\ndata: {json.dumps({'fitness_score': 950.0, 'url': '/t'})}\n\n"
+
+    *_, failed = job_events(add_job(CANCELLED), duration=60)
+    error = {'error': 'Generation was cancelled', 'status': CANCELLED}
+    assert failed == f"event: failed\ndata: {json.dumps(error)}\n\n"
@@ -0,0 +1,56 @@
+# tests/test_pareto.py - Non-dominated sorting, crowding distance and the NSGA-II engine
+import numpy as np
+from scheduler.pareto import ParetoTimetable, non_dominated_fronts, crowding_distance
+
+
+def dominates(a, b):
+    return bool((a <= b).all() and (a < b).any())
+
+
+def test_non_dominated_fronts():
+    objectives = np.array([[1, 5], [2, 3], [4, 1], [3, 4], [5, 5], [2, 3]])
+    assert [front.tolist() for front in non_dominated_fronts(objectives)] == [[0, 1, 2, 5], [3], [4]]
+
+
+def test_non_dominated_fronts_match_pairwise_dominance():
+    objectives = np.random.default_rng(0).integers(0, 6, size=(60, 3))
+    fronts = non_dominated_fronts(objectives)
+    assert sorted(np.concatenate(fronts).tolist()) == list(range(len(objectives)))
+    for k, front in enumerate(fronts):
+        later = np.concatenate(fronts[k:])
+        # Nothing in this or a later front dominates a member; something in the front before does
+        assert not any(dominates(objectives[j], objectives[i]) for i in front for j in later)
+        if k:
+            assert all(any(dominates(objectives[j], objectives[i]) for j in fronts[k - 1]) for i in front)
+
+
+def test_crowding_distance():
+    distance = crowding_distance([[1, 5], [2, 3], [4, 1], [2, 3]])
+    assert np.isinf(distance[[0, 2]]).all()
+    assert np.allclose(distance[[1, 3]], [1 / 3 + 1 / 2, 2 / 3 + 1 / 2])
+    assert np.isinf(crowding_distance([[1, 2], [2, 1]])).all()
+    # A constant objective adds nothing
+    assert np.allclose(crowding_distance([[0, 7], [1, 7], [3, 7]])[1], 1.0)
+
+
+def test_survivors_keep_the_least_total_penalty(make_engine):
+    engine = make_engine(ParetoTimetable)
+    # The first front is rows 0-3; row 0 lies between the extremes but has the least hard plus soft penalty
+    objectives = np.array([[2, 2, 1], [1, 9, 0], [9, 1, 0], [3, 3, 0], [4, 3, 0], [5, 5, 5]], dtype=float)
+    assert sorted(engine.survivors(objectives, 3).tolist()) == [0, 1, 2]
+    assert sorted(engine.survivors(objectives, 5).tolist()) == [0, 1, 2, 3, 4]
+
+
+def test_best_fitness_never_drops(make_engine, random_timetables, capsys):
+    engine = make_engine(ParetoTimetable, local_search_time=0)
+    engine.population_size = 12
+    engine.generations = 8
+    # Sparse timetables score above zero, so individuals' fitness differs
+    engine.initial_population = lambda size: random_timetables(engine.problem, size, seed=1, empty_fraction=0.97)
+    # Survivors come in no particular order; reversed, the best of the last population is not where it was
+    survivors = engine.survivors
+    engine.survivors = lambda objectives, size: survivors(objectives, size)[::-1]
+    progress = list(engine.iter_run())
+    best = [p['best_fitness'] for p in progress]
+    assert best == sorted(best)
+    assert f"Generation 0: Best Fitness = {best[0]}," in capsys.readouterr().out
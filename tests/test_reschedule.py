@@ -0,0 +1,83 @@
+# tests/test_reschedule.py - Rescheduling changes only the classes a change affects
+import sqlite3
+import numpy as np
+import pytest
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.problem import FACULTY
+from scheduler.reschedule import reschedule
+from utils.generation import save_timetable, save_changed_slots
+
+
+def busiest_faculty(timetable):
+    """Index of the faculty member teaching the most classes"""
+    faculty = timetable[..., FACULTY]
+    return int(np.bincount(faculty[faculty >= 0]).argmax())
+
+
+def saved_slots(cursor, timetable_id):
+    cursor.execute('''SELECT batch_id, day, time_slot, id, subject_id, faculty_id, classroom_id
+                      FROM timetable_slots WHERE timetable_id = ?''', (timetable_id,))
+    return {tuple(row[:3]): tuple(row[3:]) for row in cursor.fetchall()}
+
+
+@pytest.mark.parametrize('days', [['Tuesday'], []], ids=['one-day', 'whole-week'])
+def test_reschedule_leaves_unaffected_batches_and_days(make_engine, days):
+    engine = make_engine(EnhancedGeneticTimetable, fixed_slots=[], local_search_time=0)
+    problem = engine.problem
+    timetable = engine.initial_population(1)[0]
+    f = busiest_faculty(timetable)
+    lost = timetable[..., FACULTY] == f
+    if days:
+        lost[:, [d for d in range(problem.num_days) if problem.days[d] not in days]] = False
+    assert lost.any() and not lost.all(axis=(1, 2)).any()
+
+    result, fitness, changed, _ = reschedule(engine, timetable, [(problem.faculty_ids[f], days)], time_limit=1)
+    assert fitness == engine.calculate_fitness(result)
+    assert not (result[:, lost.any(axis=(0, 2)), :, FACULTY] == f).any()
+    assert changed == [tuple(cell) for cell in np.argwhere((result != timetable).any(axis=-1)).tolist()]
+    # Batches and days without a class of the lost faculty member are byte-identical
+    for b in np.flatnonzero(~lost.any(axis=(1, 2))).tolist():
+        assert result[b].tobytes() == timetable[b].tobytes()
+    for d in np.flatnonzero(~lost.any(axis=(0, 2))).tolist():
+        assert result[:, d].tobytes() == timetable[:, d].tobytes()
+    # Elsewhere only the lost classes and the slots next to them may change
+    near = lost.copy()
+    near[:, :, 1:] |= lost[:, :, :-1]
+    near[:, :, :-1] |= lost[:, :, 1:]
+    assert all(near[cell] for cell in changed)
+
+
+def test_reschedule_writes_back_only_changed_slots(make_engine):
+    engine = make_engine(EnhancedGeneticTimetable, fixed_slots=[], local_search_time=0)
+    problem = engine.problem
+    timetable = engine.initial_population(1)[0]
+    conn = sqlite3.connect('timetable.db')
+    cursor = conn.cursor()
+    cursor.executescript('''
+        CREATE TABLE timetables (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, department_id INTEGER,
+                                 semester INTEGER, fitness_score REAL, generated_by INTEGER, stop_reason TEXT,
+                                 generations_run INTEGER, profile TEXT);
+        CREATE TABLE timetable_slots (id INTEGER PRIMARY KEY AUTOINCREMENT, timetable_id INTEGER, batch_id INTEGER,
+                                      day TEXT, time_slot TEXT, subject_id INTEGER, faculty_id INTEGER,
+                                      classroom_id INTEGER);
+    ''')
+    timetable_id = save_timetable(cursor, 'Week', 1, 1, problem.decode(timetable), 0,
+                                  {'stop_reason': 'generations', 'generations': 1}, 1)
+    conn.commit()
+    assert np.array_equal(engine.load_timetable(timetable_id), timetable)
+    before = saved_slots(cursor, timetable_id)
+
+    f = busiest_faculty(timetable)
+    result, _, changed, _ = reschedule(engine, timetable, [(problem.faculty_ids[f], [])], time_limit=1)
+    assert changed
+    updated = save_changed_slots(cursor, timetable_id, problem, result, changed)
+    conn.commit()
+    after = saved_slots(cursor, timetable_id)
+    conn.close()
+
+    assert len(updated) == len(changed)
+    rewritten = {(problem.batch_ids[b], problem.days[d], problem.time_slots[s]) for b, d, s in changed}
+    # Rows of unchanged cells are the very rows saved before, not rewritten copies
+    assert {key: row for key, row in after.items() if key not in rewritten} == \
+           {key: row for key, row in before.items() if key not in rewritten}
+    assert np.array_equal(engine.load_timetable(timetable_id), result)
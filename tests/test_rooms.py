@@ -0,0 +1,67 @@
+# tests/test_rooms.py - Min-cost room matching and the classrooms it assigns
+import itertools
+import numpy as np
+import pytest
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.problem import SUBJECT, CLASSROOM
+from scheduler.rooms import min_cost_assignment, LAB_SESSION, THEORY_SESSION
+
+
+@pytest.mark.parametrize('integer', [True, False], ids=['ties', 'real'])
+def test_min_cost_assignment_matches_brute_force(integer):
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        rows = int(rng.integers(1, 6))
+        columns = int(rng.integers(rows, 7))
+        cost = rng.integers(0, 4, size=(rows, columns)).astype(float) if integer else rng.random((rows, columns))
+        assignment = min_cost_assignment(cost)
+        assert len(set(assignment.tolist())) == rows
+        best = min(cost[range(rows), list(columns_)].sum() for columns_ in itertools.permutations(range(columns), rows))
+        assert np.isclose(cost[range(rows), assignment].sum(), best)
+
+
+def shortage(engine, timetable):
+    """Room clashes no assignment can avoid: classes of a kind beyond the rooms of that kind, per (day, slot)"""
+    kinds = engine.room_assigner.session_kind[timetable[..., SUBJECT]]
+    clashes = 0
+    for kind in (THEORY_SESSION, LAB_SESSION):
+        sessions = (kinds == kind).sum(axis=0)
+        clashes += int(np.maximum(sessions - len(engine.room_assigner.rooms_of_kind[kind]), 0).sum())
+    return clashes
+
+
+def test_room_matching_never_adds_classroom_conflicts(make_engine, random_timetables):
+    engine = make_engine(EnhancedGeneticTimetable, fixed_slots=[])
+    assigner = engine.room_assigner
+    lab_rooms = set(assigner.rooms_of_kind[LAB_SESSION].tolist())
+    population = np.concatenate([random_timetables(engine.problem, 10, seed=5, empty_fraction=empty_fraction)
+                                 for empty_fraction in (0.3, 0.8, 0.95)])
+    for timetable in population:
+        matched = assigner.assign(timetable.copy())
+        conflicts = engine.check_classroom_conflicts(matched)
+        assert conflicts == shortage(engine, timetable)
+        assert conflicts <= engine.check_classroom_conflicts(timetable)
+        # Every class has a room of the type it needs; subjects, staff and empty cells are left as they were
+        scheduled = matched[..., SUBJECT] >= 0
+        is_lab = engine.problem.subject_is_lab[matched[..., SUBJECT][scheduled]]
+        assert [room in lab_rooms for room in matched[..., CLASSROOM][scheduled].tolist()] == is_lab.tolist()
+        assert np.array_equal(matched[..., :CLASSROOM], timetable[..., :CLASSROOM])
+        assert (matched[~scheduled] == timetable[~scheduled]).all()
+
+    for timetable in engine.initial_population(5):
+        assert engine.check_classroom_conflicts(timetable) == shortage(engine, timetable)
+
+
+def test_room_matching_keeps_pinned_classrooms(make_engine, instance):
+    batch = instance['batches'][0]
+    lab = next(s for s in instance['subjects']
+               if s['department_id'] == batch['department_id'] and s['subject_type'] == 'LAB')
+    room = next(c for c in instance['classrooms'] if c['type'] == 'LAB')
+    fixed = {'batch_id': batch['id'], 'day': 'Monday', 'time_slot': '9:00-10:00', 'subject_id': lab['id'],
+             'classroom_id': room['id']}
+    engine = make_engine(EnhancedGeneticTimetable, fixed_slots=[fixed])
+    problem = engine.problem
+    b, d, s = problem.batch_index[batch['id']], problem.day_index['Monday'], problem.slot_index['9:00-10:00']
+    for timetable in engine.initial_population(5):
+        assert timetable[b, d, s, CLASSROOM] == problem.classroom_index[room['id']]
+        assert engine.room_assigner.assign(timetable.copy())[b, d, s, CLASSROOM] == timetable[b, d, s, CLASSROOM]
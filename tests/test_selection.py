@@ -0,0 +1,80 @@
+# tests/test_selection.py - Batched elitism, tournament selection and crossover
+import numpy as np
+import pytest
+from genetic_algorithm import EnhancedGeneticTimetable
+
+
+class RecordingGenerator:
+    """A NumPy generator that keeps every array its integers() draws"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.draws = []
+
+    def integers(self, *args, **kwargs):
+        draw = self.rng.integers(*args, **kwargs)
+        self.draws.append(draw.copy())
+        return draw
+
+    def random(self, *args, **kwargs):
+        return self.rng.random(*args, **kwargs)
+
+
+def test_elite_indices_are_the_fittest_including_ties(make_engine):
+    engine = make_engine(EnhancedGeneticTimetable)
+    rng = np.random.default_rng(0)
+    for fitness in [rng.integers(0, 4, size=12), rng.random(12), np.zeros(5), rng.integers(-3, 0, size=9) * 1.5]:
+        for count in range(len(fitness) + 2):
+            elite = engine.elite_indices(fitness, count).tolist()
+            assert len(elite) == len(set(elite)) == min(count, len(fitness))
+            # The chosen scores are the count largest, and every score left out is no larger than each chosen one
+            assert sorted(fitness[elite].tolist()) == sorted(fitness.tolist())[len(fitness) - len(elite):]
+            rest = np.delete(fitness, elite)
+            if elite and len(rest):
+                assert rest.max() <= fitness[elite].min()
+
+
+@pytest.mark.parametrize('size, tournament_size', [(20, 3), (4, 4), (2, 3)])
+def test_tournament_winners_are_the_fittest_of_their_draws(make_engine, size, tournament_size):
+    engine = make_engine(EnhancedGeneticTimetable)
+    engine.rng = RecordingGenerator(np.random.default_rng(1))
+    fitness = np.random.default_rng(2).integers(0, 5, size=size) * 1.0
+    winners = engine.tournament_selection(fitness, 50, tournament_size)
+
+    # Replay the draws: rows drawing an individual twice take the next draw, while contestants can be distinct
+    draws = iter([draw for draw in engine.rng.draws if draw.size])
+    contestants = next(draws).copy()
+    assert contestants.shape == (50, tournament_size)
+    while tournament_size <= size:
+        redraw = [i for i, row in enumerate(contestants.tolist()) if len(set(row)) < tournament_size]
+        if not redraw:
+            break
+        contestants[redraw] = next(draws)
+    assert next(draws, None) is None
+    for winner, row in zip(winners.tolist(), contestants):
+        assert winner == row[fitness[row].argmax()]
+        assert fitness[winner] == fitness[row].max()
+
+
+@pytest.mark.parametrize('crossover_rate', [1.0, 0.5, 0.0])
+def test_crossover_children_only_contain_parent_genes(make_engine, random_timetables, crossover_rate):
+    engine = make_engine(EnhancedGeneticTimetable)
+    population = random_timetables(engine.problem, 6, seed=4)
+    parents = np.random.default_rng(3).integers(len(population), size=(20, 2))
+    children = engine.crossover_pairs(population, parents, crossover_rate)
+    assert children.shape == (2 * len(parents),) + population.shape[1:]
+    crossed = 0
+    for (first, second), child1, child2 in zip(parents.tolist(), children[::2], children[1::2]):
+        parent1, parent2 = population[first], population[second]
+        # Each child is its own parent up to one day and the other parent from it on; the pair is complementary
+        from_second = [not np.array_equal(child1[:, d], parent1[:, d]) for d in range(engine.problem.num_days)]
+        point = from_second.index(True) if any(from_second) else engine.problem.num_days
+        assert np.array_equal(child1[:, :point], parent1[:, :point])
+        assert np.array_equal(child1[:, point:], parent2[:, point:])
+        assert np.array_equal(child2[:, :point], parent2[:, :point])
+        assert np.array_equal(child2[:, point:], parent1[:, point:])
+        crossed += first != second and point < engine.problem.num_days
+    if crossover_rate == 0:
+        assert crossed == 0
+    elif crossover_rate == 1:
+        assert crossed == sum(first != second for first, second in parents.tolist())
@@ -0,0 +1,36 @@
+# tests/test_shared.py - Engines shared with workers through shared memory segments
+import os
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler import shared
+from scheduler.shared import share_engine, load_engine, detach_segments, problem_arrays
+
+
+def test_shared_engine_round_trip_and_unlink(make_engine, random_timetables):
+    engine = make_engine(EnhancedGeneticTimetable)
+    segment, payload = share_engine(engine)
+    name = segment.spec[0]
+    try:
+        loaded = load_engine(payload)
+        assert name in shared.attached
+        arrays = problem_arrays(loaded)
+        assert arrays.keys() == problem_arrays(engine).keys()
+        for path, array in problem_arrays(engine).items():
+            assert np.array_equal(arrays[path], array) and not arrays[path].flags.writeable
+        population = random_timetables(engine.problem, 4, seed=6)
+        assert np.array_equal(loaded.evaluate_population(population), engine.evaluate_population(population))
+
+        # A segment stays attached while an array views it, and is closed once nothing does
+        kept = arrays.pop('eligibility.matrix')
+        del loaded, arrays
+        assert detach_segments() == [name]
+        assert np.array_equal(kept, engine.eligibility.matrix)
+        del kept
+        assert detach_segments() == [] and not shared.attached
+    finally:
+        segment.unlink()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+    assert not os.path.exists(os.path.join('/dev/shm', name.lstrip('/')))
@@ -0,0 +1,108 @@
+# tests/test_workload.py - Min-cost flow faculty balancing and the staff it assigns
+import itertools
+import numpy as np
+from genetic_algorithm import EnhancedGeneticTimetable
+from scheduler.problem import SUBJECT, FACULTY, EMPTY
+from scheduler.workload import MinCostFlow, FacultyAssigner
+
+
+def test_min_cost_flow_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        tasks = int(rng.integers(1, 5))
+        workers = int(rng.integers(1, 4))
+        task_costs = rng.integers(0, 10, size=(tasks, workers))
+        unit_costs = [rng.integers(0, 10, size=int(rng.integers(1, 3))) for _ in range(workers)]
+        unstaffed_cost = 50
+
+        network = MinCostFlow()
+        sink = network.add_node()
+        worker_nodes = [network.add_node(like=sink) for _ in range(workers)]
+        for w, costs in enumerate(unit_costs):
+            for cost in costs.tolist():
+                network.add_edge(worker_nodes[w], sink, 1, cost)
+        arcs = []
+        total = 0
+        # Tasks arrive one at a time, as FacultyAssigner adds its classes
+        for t in range(tasks):
+            node = network.add_node()
+            arcs.append([network.add_edge(node, worker_nodes[w], 1, int(task_costs[t, w])) for w in range(workers)])
+            network.add_edge(node, sink, 1, unstaffed_cost)
+            total += network.augment(node, sink)
+
+        def cost(assignment):
+            """Cost of giving task t to worker assignment[t] (None leaves it unstaffed), or None if over capacity"""
+            loads = [sorted(costs.tolist()) for costs in unit_costs]
+            value = 0
+            for t, w in enumerate(assignment):
+                if w is None:
+                    value += unstaffed_cost
+                elif not loads[w]:
+                    return None
+                else:
+                    value += int(task_costs[t, w]) + loads[w].pop(0)
+            return value
+
+        best = min(value for value in map(cost, itertools.product([None] + list(range(workers)), repeat=tasks))
+                   if value is not None)
+        assert total == best
+        # The flow on the arcs is an assignment of that cost
+        assignment = [next((w for w, arc in enumerate(task_arcs) if network.flow(arc)), None) for task_arcs in arcs]
+        assert all(sum(network.flow(arc) for arc in task_arcs) <= 1 for task_arcs in arcs)
+        assert cost(assignment) == best
+
+
+def limit_excess(assigner, timetable):
+    """Classes beyond a faculty member's max_hours_per_day, and beyond one per (day, slot)"""
+    problem = assigner.problem
+    faculty = timetable[..., FACULTY]
+    staffed = faculty >= 0
+    per_slot = np.zeros((problem.num_faculty, problem.num_days, problem.num_slots), dtype=np.int64)
+    np.add.at(per_slot, (faculty[staffed],) + tuple(np.nonzero(staffed)[1:]), 1)
+    per_day = per_slot.sum(axis=2)
+    daily = np.maximum(per_day - np.array(assigner.daily_limits).reshape(-1, 1), 0).sum()
+    return int(daily), int(np.maximum(per_slot - 1, 0).sum())
+
+
+def staffable(assigner, timetable):
+    """Copy of a timetable without the classes whose faculty is ineligible or past their slot/daily limits"""
+    timetable = timetable.copy()
+    taken = set()
+    hours = {}
+    for b, d, s in np.argwhere(timetable[..., SUBJECT] >= 0).tolist():
+        f = int(timetable[b, d, s, FACULTY])
+        if f not in assigner.candidates((b, d, s), int(timetable[b, d, s, SUBJECT])) or (f, d, s) in taken or \
+                hours.get((f, d), 0) >= assigner.daily_limits[f]:
+            timetable[b, d, s] = EMPTY
+            continue
+        taken.add((f, d, s))
+        hours[f, d] = hours.get((f, d), 0) + 1
+    return timetable
+
+
+def test_faculty_balancing_keeps_eligibility_and_daily_limits(make_engine, random_timetables):
+    engine = make_engine(EnhancedGeneticTimetable)
+    assert engine.faculty_balancing
+    assigner = FacultyAssigner(engine)
+    candidates = engine.eligibility.candidates
+    population = np.concatenate([engine.initial_population(5), random_timetables(engine.problem, 5, seed=3)])
+    for timetable in population:
+        balanced, stats = assigner.assign(timetable)
+        # Only faculty are changed, and every class some member may teach is given an eligible one
+        assert np.array_equal(np.delete(balanced, FACULTY, axis=-1), np.delete(timetable, FACULTY, axis=-1))
+        for b, d, s in np.argwhere(balanced[..., SUBJECT] >= 0).tolist():
+            subject = balanced[b, d, s, SUBJECT]
+            if len(candidates[subject]) and (b, d, s) not in assigner.pinned:
+                assert balanced[b, d, s, FACULTY] in candidates[subject]
+        for (b, d, s), (subject, faculty) in assigner.pinned.items():
+            if balanced[b, d, s, SUBJECT] == subject:
+                assert balanced[b, d, s, FACULTY] == faculty
+        # Limits are only broken by the classes reported double-booked, one excess each at most
+        daily, clashes = limit_excess(assigner, balanced)
+        assert max(daily, clashes) <= stats['double_booked']
+
+        # A timetable that can be staffed within the limits is staffed within them
+        feasible = staffable(assigner, timetable)
+        balanced, stats = assigner.assign(feasible)
+        assert stats['double_booked'] == stats['unstaffed'] == 0
+        assert limit_excess(assigner, balanced) == (0, 0)
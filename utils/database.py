@@ -91,6 +91,9 @@ def init_database():
             semester INTEGER,
             fitness_score REAL CHECK(fitness_score BETWEEN 0 AND 1),
             generated_by INTEGER,
+            stop_reason TEXT,
+            generations_run INTEGER,
+            profile TEXT,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (department_id) REFERENCES departments (id),
@@ -98,6 +101,28 @@ def init_database():
         )
         ''',
         '''
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued' CHECK(status IN ('queued', 'running', 'completed', 'failed', 'cancelled')),
+            submitted_by INTEGER,
+            progress TEXT,
+            timetable_id INTEGER,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER DEFAULT 0,
+            cancel_requested INTEGER DEFAULT 0,
+            stop_requested INTEGER DEFAULT 0,
+            worker_pid INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME,
+            finished_at DATETIME,
+            heartbeat_at DATETIME,
+            FOREIGN KEY (submitted_by) REFERENCES users (id),
+            FOREIGN KEY (timetable_id) REFERENCES timetables (id)
+        )
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS timetable_slots (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             timetable_id INTEGER,
@@ -0,0 +1,103 @@
+# utils/generation.py - Shared setup and storage of timetable generation runs
+import os
+import json
+from config import Config
+
+# Weekly grid every generated timetable uses
+SCHEDULE_DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+SCHEDULE_TIME_SLOTS = ['9:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-1:00', '1:00-2:00', '2:00-3:00', '3:00-4:00']
+LUNCH_BREAK = '12:00-1:00'
+
+def load_generation_data(cursor, department_id, semester):
+    """Subjects, batches, faculty and classrooms a department/semester timetable is built from"""
+    cursor.execute('SELECT * FROM subjects WHERE department_id = ?', (department_id,))
+    subjects_data = [dict(row) for row in cursor.fetchall()]
+    
+    cursor.execute('SELECT * FROM batches WHERE department_id = ? AND semester = ?', (department_id, semester))
+    batches_data = [dict(row) for row in cursor.fetchall()]
+    
+    cursor.execute('SELECT * FROM faculty')
+    faculty_data = [dict(row) for row in cursor.fetchall()]
+    
+    cursor.execute('SELECT * FROM classrooms')
+    classrooms_data = [dict(row) for row in cursor.fetchall()]
+    
+    return subjects_data, batches_data, faculty_data, classrooms_data
+
+def generation_constraints(department_id, semester, max_classes_per_day, fixed_slots=(), time_limit=None,
+                           warm_start_id=None, checkpoint_name=None):
+    """Constraints dict for one department/semester generation run.
+
+    A run given a checkpoint_name (unique to it, e.g. its job's) checkpoints
+    to that file and resumes from it when interrupted; other runs do neither.
+    """
+    return {
+        'days': SCHEDULE_DAYS,
+        'time_slots': SCHEDULE_TIME_SLOTS,
+        'lunch_break': LUNCH_BREAK,
+        'max_classes_per_day': int(max_classes_per_day),
+        'max_hours_per_faculty': 8,
+        'max_classes_per_day_per_batch': int(max_classes_per_day),
+        'fixed_slots': list(fixed_slots),
+        'time_limit': time_limit or None,
+        'stagnation_generations': Config.GA_STAGNATION_GENERATIONS or None,
+        'stop_on_hard_constraints': Config.GA_STOP_ON_HARD_CONSTRAINTS == 'True',
+        'fitness_cache_size': Config.GA_FITNESS_CACHE_SIZE,
+        'local_search_time': Config.GA_LOCAL_SEARCH_TIME,
+        'memetic_top_k': Config.GA_MEMETIC_TOP_K,
+        'faculty_balancing': Config.GA_FACULTY_BALANCING == 'True',
+        'annealing_schedule': Config.GA_ANNEALING_SCHEDULE,
+        'annealing_reheats': Config.GA_ANNEALING_REHEATS,
+        'pareto_front_size': Config.GA_PARETO_FRONT_SIZE,
+        'checkpoint_path': os.path.join(Config.GA_CHECKPOINT_DIR, f'{checkpoint_name}.npz') if checkpoint_name else None,
+        'checkpoint_interval': Config.GA_CHECKPOINT_INTERVAL,
+        'resume': bool(checkpoint_name),
+        'warm_start_timetable_id': warm_start_id,
+        'profile': Config.GA_PROFILE == 'True'
+    }
+
+def save_timetable(cursor, name, department_id, semester, timetable, fitness_score, run_stats, user_id):
+    """Insert a decoded timetable and its non-empty slots; returns the new timetable id"""
+    profile = json.dumps(run_stats['profile']) if 'profile' in run_stats else None
+    cursor.execute(
+        "INSERT INTO timetables (name, department_id, semester, fitness_score, generated_by, stop_reason, generations_run, profile) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (name, department_id, semester, fitness_score, user_id,
+         run_stats['stop_reason'], run_stats['generations'], profile)
+    )
+    
+    timetable_id = cursor.lastrowid
+    
+    for batch_id, days in timetable.items():
+        for day, time_slots in days.items():
+            for time_slot, slot_data in time_slots.items():
+                if slot_data:  # Only save non-empty slots
+                    cursor.execute(
+                        "INSERT INTO timetable_slots (timetable_id, batch_id, day, time_slot, subject_id, faculty_id, classroom_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (timetable_id, batch_id, day, time_slot, slot_data['subject_id'], slot_data['faculty_id'], slot_data['classroom_id'])
+                    )
+    return timetable_id
+
+def save_changed_slots(cursor, timetable_id, problem, timetable, changed):
+    """Rewrite only the changed (batch, day, slot) cells of a saved timetable; returns the slots written"""
+    updated_slots = []
+    for batch_idx, day_idx, slot_idx in changed:
+        batch_id = problem.batch_ids[batch_idx]
+        day = problem.days[day_idx]
+        time_slot = problem.time_slots[slot_idx]
+        cursor.execute('DELETE FROM timetable_slots WHERE timetable_id = ? AND batch_id = ? AND day = ? AND time_slot = ?',
+                       (timetable_id, batch_id, day, time_slot))
+
+        subject, faculty, classroom = timetable[batch_idx, day_idx, slot_idx].tolist()
+        slot_data = None
+        if subject >= 0:
+            slot_data = {
+                'subject_id': problem.subject_ids[subject],
+                'faculty_id': problem.faculty_ids[faculty] if faculty >= 0 else None,
+                'classroom_id': problem.classroom_ids[classroom] if classroom >= 0 else None
+            }
+            cursor.execute(
+                "INSERT INTO timetable_slots (timetable_id, batch_id, day, time_slot, subject_id, faculty_id, classroom_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (timetable_id, batch_id, day, time_slot, slot_data['subject_id'], slot_data['faculty_id'], slot_data['classroom_id'])
+            )
+        updated_slots.append({'batch_id': batch_id, 'day': day, 'time_slot': time_slot, 'slot': slot_data})
+    return updated_slots
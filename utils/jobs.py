@@ -0,0 +1,494 @@
+# utils/jobs.py - Queue of background timetable generation jobs
+"""Generation jobs are rows of the generation_jobs table.
+
+A job solves one department/semester, or every one of them when its
+department_id and semester are ALL. A submitted job is 'queued'; the dispatcher thread of each app process
+claims queued jobs while fewer than GA_JOB_WORKERS are 'running' and solves
+each in its own worker process, which records progress and a heartbeat on
+the row until it is 'completed', 'failed' or 'cancelled'. A running job
+whose worker died, or whose heartbeat went stale because the app was
+restarted, is queued again (resuming from its checkpoint) until it has
+used GA_JOB_MAX_ATTEMPTS.
+"""
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+from utils.generation import load_generation_data, generation_constraints, save_timetable
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+ALL = 'all'  # department_id and semester of a job generating every department/semester
+
+HEARTBEAT_INTERVAL = 1  # seconds between a worker's progress/heartbeat writes
+EVENTS_POLL_INTERVAL = 0.5  # seconds between an event stream's reads of its job
+EVENTS_RETRY = 1000  # milliseconds a client waits before reopening a closed event stream
+DISPATCH_INTERVAL = 1  # seconds between dispatcher passes
+WORKER_NAME = 'generation-job'  # worker processes are named WORKER_NAME-<job id>
+
+
+class JobLimitError(Exception):
+    """The submitting user already has the maximum number of unfinished jobs"""
+
+
+def connect():
+    # Workers and dispatchers write concurrently, so wait on locks instead of failing
+    conn = sqlite3.connect('timetable.db', timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def job_dict(row):
+    """A job row with its JSON columns decoded"""
+    job = dict(row)
+    for column in ('params', 'progress', 'result'):
+        job[column] = json.loads(job[column]) if job[column] else None
+    job['cancel_requested'] = bool(job['cancel_requested'])
+    job['stop_requested'] = bool(job['stop_requested'])
+    return job
+
+
+def submit_job(user_id, params):
+    """Queue a generation job and return its id.
+
+    params holds name, department_id, semester, max_classes_per_day, islands,
+    time_limit, fixed_slots and warm_start_id; a job generating every
+    department/semester only needs name, max_classes_per_day and time_limit
+    with department_id and semester ALL. Raises JobLimitError when the user
+    already has GA_JOBS_PER_USER queued or running jobs.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    # Count and insert in one statement so concurrent submits cannot overshoot the limit
+    cursor.execute('''INSERT INTO generation_jobs (params, status, submitted_by)
+                      SELECT ?, ?, ? WHERE (SELECT COUNT(*) FROM generation_jobs
+                                            WHERE submitted_by = ? AND status IN (?, ?)) < ?''',
+                   (json.dumps(params), QUEUED, user_id, user_id, QUEUED, RUNNING, Config.GA_JOBS_PER_USER))
+    job_id = cursor.lastrowid if cursor.rowcount else None
+    conn.commit()
+    conn.close()
+    if job_id is None:
+        raise JobLimitError(f'At most {Config.GA_JOBS_PER_USER} generation jobs may be queued or running per user')
+    ensure_dispatcher().wake()
+    return job_id
+
+
+def get_job(job_id):
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM generation_jobs WHERE id = ?', (job_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return job_dict(row) if row else None
+
+
+def request_cancel(job_id):
+    """Cancel a queued job now, or ask a running one to stop without saving; returns the job"""
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute('''UPDATE generation_jobs SET status = ?, finished_at = CURRENT_TIMESTAMP
+                      WHERE id = ? AND status = ?''', (CANCELLED, job_id, QUEUED))
+    cursor.execute('UPDATE generation_jobs SET cancel_requested = 1 WHERE id = ? AND status = ?',
+                   (job_id, RUNNING))
+    conn.commit()
+    conn.close()
+    return get_job(job_id)
+
+
+def request_stop(job_id):
+    """Ask a running job to finish early and save the best timetable so far; returns the job"""
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute('UPDATE generation_jobs SET stop_requested = 1 WHERE id = ? AND status = ?',
+                   (job_id, RUNNING))
+    conn.commit()
+    conn.close()
+    return get_job(job_id)
+
+
+def job_events(job_id, sent=-1, duration=None, result=None):
+    """Server-Sent Events of a job: 'progress' per generation after sent, then 'done' or 'failed'.
+
+    The stream closes after duration seconds (the GA_EVENTS_STREAM_SECONDS
+    default); the client's EventSource then reconnects with Last-Event-ID,
+    the generation it received last, to continue where it left off, so no
+    connection holds a server thread for a whole run. result maps a
+    completed job to its 'done' data.
+    """
+    deadline = time.monotonic() + (Config.GA_EVENTS_STREAM_SECONDS if duration is None else duration)
+    yield f"retry: {EVENTS_RETRY}\n\n"
+    while True:
+        job = get_job(job_id)
+        progress = job['progress']
+        if progress and progress['generation'] > sent:
+            sent = progress['generation']
+            yield f"id: {sent}\nevent: progress\ndata: {json.dumps(progress)}\n\n"
+        if job['status'] == COMPLETED:
+            yield f"event: done\ndata: {json.dumps(result(job) if result else job['result'])}\n\n"
+            return
+        if job['status'] in FINISHED:
+            error = job['error'] or 'Generation was cancelled'
+            yield f"event: failed\ndata: {json.dumps({'error': error, 'status': job['status']})}\n\n"
+            return
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(EVENTS_POLL_INTERVAL)
+
+
+def build_engine(cursor, params, checkpoint_name=None):
+    from scheduler.engines import DEFAULT_ENGINE, create_engine
+    subjects_data, batches_data, faculty_data, classrooms_data = load_generation_data(
+        cursor, params['department_id'], params['semester'])
+    constraints = generation_constraints(params['department_id'], params['semester'],
+                                         params['max_classes_per_day'], params['fixed_slots'],
+                                         params['time_limit'], params['warm_start_id'], checkpoint_name)
+    # Jobs queued before engines were selectable ran the genetic algorithm
+    return create_engine(params.get('engine', DEFAULT_ENGINE), subjects_data, faculty_data, classrooms_data,
+                         batches_data, constraints)
+
+
+class InstitutionRun:
+    """Every department/semester solved concurrently, then merged and reconciled.
+
+    Departments are solved in a process pool; the merged institution-wide
+    timetable has its shared classroom and faculty clashes repaired by
+    re-solving only the affected days of the clashing batches. Like an engine
+    it reports progress to a callback and can be stopped: a stopped run
+    reconciles and keeps the departments solved so far.
+    """
+
+    def __init__(self, cursor, params, checkpoint_name=None):
+        from genetic_algorithm import EnhancedGeneticTimetable
+        from scheduler.decompose import combined_batches
+        cursor.execute('SELECT DISTINCT department_id, semester FROM batches ORDER BY department_id, semester')
+        self.groups = [(row['department_id'], row['semester']) for row in cursor.fetchall()]
+        if not self.groups:
+            raise ValueError('No batches to generate timetables for')
+
+        self.engines, batch_groups, all_subjects = [], [], {}
+        for department_id, semester in self.groups:
+            subjects_data, batches_data, faculty_data, classrooms_data = load_generation_data(
+                cursor, department_id, semester)
+            name = f'{checkpoint_name}_department_{department_id}_semester_{semester}' if checkpoint_name else None
+            self.engines.append(EnhancedGeneticTimetable(
+                subjects=subjects_data,
+                faculty=faculty_data,
+                classrooms=classrooms_data,
+                batches=batches_data,
+                constraints=generation_constraints(department_id, semester, params['max_classes_per_day'],
+                                                   time_limit=params['time_limit'], checkpoint_name=name)
+            ))
+            batch_groups.append(batches_data)
+            all_subjects.update((subject['id'], subject) for subject in subjects_data)
+
+        self.institution = EnhancedGeneticTimetable(
+            subjects=list(all_subjects.values()),
+            faculty=faculty_data,
+            classrooms=classrooms_data,
+            batches=combined_batches(batch_groups),
+            constraints=generation_constraints(ALL, ALL, params['max_classes_per_day'])
+        )
+        self.stop_requested = False
+
+    def stop(self):
+        self.stop_requested = True
+        for engine in self.engines:
+            engine.stop()  # reaches departments solved in this process
+
+    def run(self, callback=None, cancelled=None):
+        """Solve and reconcile; returns the solved departments and the reconciliation's changed cells and stats.
+
+        Each solved department is a (department_id, semester, decoded
+        timetable, fitness, run_stats) tuple. After each department the
+        callback gets a progress dict counting solved departments as
+        generations, with the best and mean fitness among them. When
+        cancelled() is true once the solves finish, nothing would be saved,
+        so reconciliation is skipped and no departments are returned.
+        """
+        from scheduler.decompose import iter_solve_departments, merge_timetables, reconcile
+        start = time.time()
+        solved = {}
+        for index, result in iter_solve_departments(self.engines, Config.GA_DEPARTMENT_PROCESSES or None,
+                                                    stopped=lambda: self.stop_requested):
+            solved[index] = result
+            if callback:
+                scores = [fitness for _, fitness, _ in solved.values()]
+                callback({
+                    'generation': len(solved) - 1,
+                    'best_fitness': float(max(scores)),
+                    'mean_fitness': float(sum(scores) / len(scores)),
+                    'elapsed': round(time.time() - start, 3),
+                    'solved': len(solved),
+                    'departments': len(self.engines)
+                })
+
+        if cancelled is not None and cancelled():
+            print("Generation cancelled; skipping reconciliation")
+            return [], [], {'cancelled': True}
+
+        indices = sorted(solved)
+        decoded = [self.engines[i].problem.decode(solved[i][0]) for i in indices]
+        merged, changed, reconcile_stats = reconcile(self.institution, merge_timetables(self.institution, decoded),
+                                                     time_limit=Config.GA_RECONCILE_TIME)
+        merged = self.institution.problem.decode(merged)
+        print(f"Reconciliation changed {len(changed)} classes: {reconcile_stats}")
+
+        departments = []
+        for i in indices:
+            engine = self.engines[i]
+            timetable = {batch_id: merged[batch_id] for batch_id in engine.problem.batch_ids}
+            fitness_score = engine.calculate_fitness(engine.problem.encode(timetable))
+            departments.append(self.groups[i] + (timetable, fitness_score, solved[i][2]))
+        return departments, changed, reconcile_stats
+
+
+def save_institution(cursor, params, departments, changed, reconcile_stats, user_id):
+    """Save an InstitutionRun's timetables, one per department/semester; returns the job result"""
+    timetable_ids = []
+    for department_id, semester, timetable, fitness_score, run_stats in departments:
+        timetable_ids.append(save_timetable(cursor, f"{params['name']} (Dept {department_id}, Sem {semester})",
+                                            department_id, semester, timetable, fitness_score, run_stats, user_id))
+    return {
+        'timetable_ids': timetable_ids,
+        'reconciled_classes': len(changed),
+        'clashes_left': reconcile_stats.get('clashes_after', 0)
+    }
+
+
+def save_pareto_front(cursor, params, engine, run_stats, timetable_id, user_id):
+    """Save the trade-offs of a multi-objective run besides its best timetable; returns one summary per option.
+
+    The best timetable, already saved as timetable_id, is the first option;
+    the others are saved as "<name> (option n)".
+    """
+    options = []
+    for option, member in enumerate(run_stats['pareto_front'], 1):
+        if option > 1:
+            timetable_id = save_timetable(cursor, f"{params['name']} (option {option})", params['department_id'],
+                                          params['semester'], engine.problem.decode(member['timetable']),
+                                          member['fitness'], run_stats, user_id)
+        options.append({
+            'timetable_id': timetable_id,
+            'fitness_score': member['fitness'],
+            'hard_violations': member['hard_violations'],
+            'objectives': member['objectives']
+        })
+    return options
+
+
+def cancel_requested(cursor, job_id):
+    cursor.execute('SELECT cancel_requested FROM generation_jobs WHERE id = ?', (job_id,))
+    return bool(cursor.fetchone()['cancel_requested'])
+
+
+def in_job_worker():
+    """Whether this is a job's worker process, which re-imports the app when spawned"""
+    return multiprocessing.current_process().name.startswith(WORKER_NAME + '-')
+
+
+def heartbeat(job_id, engine, latest, finished):
+    """Worker thread: publish the latest progress, refresh the heartbeat and pass on stop/cancel requests"""
+    conn = connect()
+    cursor = conn.cursor()
+    while not finished.wait(HEARTBEAT_INTERVAL):
+        progress = latest[0]
+        cursor.execute('''UPDATE generation_jobs SET heartbeat_at = CURRENT_TIMESTAMP,
+                          progress = COALESCE(?, progress) WHERE id = ?''',
+                       (json.dumps(progress) if progress else None, job_id))
+        cursor.execute('SELECT cancel_requested, stop_requested FROM generation_jobs WHERE id = ?', (job_id,))
+        flags = cursor.fetchone()
+        conn.commit()
+        if flags['cancel_requested'] or flags['stop_requested']:
+            engine.stop()
+    conn.close()
+
+
+def run_job(job_id):
+    """Worker process entry point: solve one claimed job and store its outcome"""
+    if hasattr(os, 'nice') and Config.GA_JOB_NICENESS:
+        # Keep the web server responsive while jobs use every core they are given
+        os.nice(Config.GA_JOB_NICENESS)
+    conn = connect()
+    cursor = conn.cursor()
+    finished = threading.Event()
+    try:
+        cursor.execute('SELECT params, submitted_by FROM generation_jobs WHERE id = ?', (job_id,))
+        job = cursor.fetchone()
+        params = json.loads(job['params'])
+        # A requeued job resumes from the checkpoints its earlier attempt left
+        if params['department_id'] == ALL:
+            engine = InstitutionRun(cursor, params, checkpoint_name=f'job_{job_id}')
+        else:
+            engine = build_engine(cursor, params, checkpoint_name=f'job_{job_id}')
+
+        latest = [None]
+
+        def record_progress(progress):
+            latest[0] = progress
+
+        threading.Thread(target=heartbeat, args=(job_id, engine, latest, finished), daemon=True).start()
+        if params['department_id'] == ALL:
+            outcome = engine.run(callback=record_progress, cancelled=lambda: cancel_requested(cursor, job_id))
+        elif params['islands'] > 1:
+            timetable, fitness_score, run_stats = engine.run_islands(
+                params['islands'],
+                migration_interval=Config.GA_MIGRATION_INTERVAL,
+                migration_size=Config.GA_MIGRATION_SIZE,
+                topology=Config.GA_MIGRATION_TOPOLOGY,
+                callback=record_progress
+            )
+        else:
+            timetable, fitness_score, run_stats = engine.run(callback=record_progress)
+        finished.set()
+
+        if cancel_requested(cursor, job_id):
+            cursor.execute('''UPDATE generation_jobs SET status = ?, finished_at = CURRENT_TIMESTAMP
+                              WHERE id = ?''', (CANCELLED, job_id))
+        else:
+            if params['department_id'] == ALL:
+                result = save_institution(cursor, params, *outcome, job['submitted_by'])
+                timetable_id = result['timetable_ids'][0] if result['timetable_ids'] else None
+            else:
+                timetable_id = save_timetable(cursor, params['name'], params['department_id'], params['semester'],
+                                              engine.problem.decode(timetable), fitness_score, run_stats,
+                                              job['submitted_by'])
+                result = {
+                    'fitness_score': fitness_score,
+                    'stop_reason': run_stats['stop_reason'],
+                    'generations': run_stats['generations']
+                }
+                if 'pareto_front' in run_stats:
+                    result['pareto_front'] = save_pareto_front(cursor, params, engine, run_stats, timetable_id,
+                                                               job['submitted_by'])
+            cursor.execute('''UPDATE generation_jobs SET status = ?, timetable_id = ?, result = ?,
+                              progress = COALESCE(?, progress), finished_at = CURRENT_TIMESTAMP WHERE id = ?''',
+                           (COMPLETED, timetable_id, json.dumps(result),
+                            json.dumps(latest[0]) if latest[0] else None, job_id))
+        conn.commit()
+    except Exception as e:
+        finished.set()
+        conn.rollback()
+        cursor.execute('''UPDATE generation_jobs SET status = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+                          WHERE id = ?''', (FAILED, str(e), job_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class JobDispatcher(threading.Thread):
+    """Starts worker processes for queued jobs and requeues the jobs of workers that died"""
+
+    def __init__(self, max_workers=None):
+        super().__init__(name='generation-job-dispatcher', daemon=True)
+        self.max_workers = max_workers or Config.GA_JOB_WORKERS
+        self.workers = {}  # job id -> worker process started by this dispatcher
+        self.wakeup = threading.Event()
+        # Workers start from a fresh interpreter: forking copies the app's threads' locks mid-use
+        self.context = multiprocessing.get_context('spawn')
+
+    def wake(self):
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            try:
+                self.dispatch()
+            except sqlite3.Error as e:
+                print(f"Generation job dispatch failed: {e}")
+            self.wakeup.wait(DISPATCH_INTERVAL)
+            self.wakeup.clear()
+
+    def dispatch(self):
+        conn = connect()
+        cursor = conn.cursor()
+        self.reap(cursor)
+        self.requeue_stale(cursor)
+        conn.commit()
+        while self.claim_and_start(conn):
+            pass
+        conn.close()
+
+    def retry_or_fail(self, cursor, job_id, error):
+        """A running job lost its worker: queue it again unless it was cancelled or used all its attempts"""
+        cursor.execute('SELECT attempts, cancel_requested FROM generation_jobs WHERE id = ? AND status = ?',
+                       (job_id, RUNNING))
+        job = cursor.fetchone()
+        if job is None:
+            return
+        if job['cancel_requested']:
+            cursor.execute('''UPDATE generation_jobs SET status = ?, worker_pid = NULL,
+                              finished_at = CURRENT_TIMESTAMP WHERE id = ?''', (CANCELLED, job_id))
+        elif job['attempts'] < Config.GA_JOB_MAX_ATTEMPTS:
+            print(f"Requeuing generation job {job_id}: {error}")
+            cursor.execute('UPDATE generation_jobs SET status = ?, worker_pid = NULL WHERE id = ?',
+                           (QUEUED, job_id))
+        else:
+            cursor.execute('''UPDATE generation_jobs SET status = ?, error = ?, worker_pid = NULL,
+                              finished_at = CURRENT_TIMESTAMP WHERE id = ?''', (FAILED, error, job_id))
+
+    def reap(self, cursor):
+        """Collect finished workers; a job they left running crashed its worker"""
+        for job_id, process in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del self.workers[job_id]
+            self.retry_or_fail(cursor, job_id, f'Worker exited with code {process.exitcode}')
+
+    def requeue_stale(self, cursor):
+        """Jobs of workers this process does not own (e.g. from before a restart) that stopped heartbeating"""
+        cursor.execute('''SELECT id FROM generation_jobs WHERE status = ?
+                          AND COALESCE(heartbeat_at, started_at) < datetime('now', ?)''',
+                       (RUNNING, f'-{Config.GA_JOB_HEARTBEAT_TIMEOUT} seconds'))
+        for row in cursor.fetchall():
+            if row['id'] not in self.workers:
+                self.retry_or_fail(cursor, row['id'], 'Worker stopped responding')
+
+    def claim_and_start(self, conn):
+        """Claim the oldest queued job if a worker slot is free and start its process; False when none"""
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM generation_jobs WHERE status = ? ORDER BY id LIMIT 1', (QUEUED,))
+        job = cursor.fetchone()
+        if job is None:
+            return False
+        job_id = job['id']
+        # One statement, so dispatchers in several app processes respect the same global limit
+        cursor.execute('''UPDATE generation_jobs SET status = ?, attempts = attempts + 1,
+                              started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+                          WHERE id = ? AND status = ?
+                          AND (SELECT COUNT(*) FROM generation_jobs WHERE status = ?) < ?''',
+                       (RUNNING, job_id, QUEUED, RUNNING, self.max_workers))
+        claimed = cursor.rowcount
+        conn.commit()
+        if not claimed:
+            # Either every slot is busy or another dispatcher took the job; try again next pass
+            return False
+
+        process = self.context.Process(target=run_job, args=(job_id,), name=f'{WORKER_NAME}-{job_id}')
+        process.start()
+        self.workers[job_id] = process
+        cursor.execute('UPDATE generation_jobs SET worker_pid = ? WHERE id = ?', (process.pid, job_id))
+        conn.commit()
+        return True
+
+
+dispatcher = None
+dispatcher_lock = threading.Lock()
+
+
+def ensure_dispatcher():
+    """The process-wide dispatcher, started on first use"""
+    global dispatcher
+    with dispatcher_lock:
+        if dispatcher is None:
+            dispatcher = JobDispatcher()
+            dispatcher.start()
+    return dispatcher